@@ -0,0 +1,205 @@
+"""
+Batch Selections for the YouTube Video Manager
+==============================================
+Picks many videos at once, for the batch delete and batch update
+commands. A selection is written as one line of text:
+
+    3, 7-12, 20               video numbers and ranges, as the menu shows them
+    id 5, 17, 30-40           stable video IDs and ranges of IDs
+    duration < 60             a duration condition: <, <=, >, >= or =, with
+                              any duration format (60, 1:00, 1m)
+    name contains draft       names containing a text (ignoring case)
+    name starts with Intro    names starting with a text (ignoring case)
+
+Conditions can be combined with 'and':
+    duration >= 1h and name contains live
+
+Only an 'and' followed by another condition (name, duration or time)
+joins two conditions, so 'name contains rock and roll' looks for
+"rock and roll". A name text can also be put in double quotes, e.g.
+name contains "salt and time" and duration < 5m.
+
+The selection returns stable video IDs, not positions: the caller looks
+the positions up again under the storage lock, as edit_video() does, so
+edits made meanwhile by another process cannot shift the selection.
+
+Duration conditions are answered from the duration index (O(log n + k))
+when one is given; everything else is one pass over the collection.
+"""
+
+import re
+
+from video_record import parse_duration
+
+
+# "3, 7-12" and "id 5, 30-40": comma-separated numbers and ranges
+NUMBER_LIST = re.compile(r'\d+(\s*-\s*\d+)?(\s*,\s*\d+(\s*-\s*\d+)?)*')
+ID_LIST = re.compile(r'ids?\s*:?\s*(?P<list>.+)', re.IGNORECASE)
+
+# One condition of a predicate
+DURATION_CONDITION = re.compile(r'(?:duration|time)\s*(?P<op><=|>=|<|>|=)\s*(?P<value>.+)',
+                                re.IGNORECASE)
+NAME_CONDITION = re.compile(r'name\s+(?P<op>contains|starts\s+with)\s+(?P<text>.+)',
+                            re.IGNORECASE)
+# 'and' only joins conditions where another one follows
+AND = re.compile(r'\s+and\s+(?=(?:name|duration|time)\b)', re.IGNORECASE)
+
+
+def split_conditions(text):
+    """
+    Splits 'duration < 60 and name contains x' into its conditions.
+
+    An 'and' inside double quotes is part of a name text.
+
+    Args:
+        text (str): Conditions joined with 'and'
+
+    Returns:
+        list: The conditions' text
+    """
+    conditions = []
+    start = 0
+    for match in AND.finditer(text):
+        if text.count('"', 0, match.start()) % 2 == 0:
+            conditions.append(text[start:match.start()])
+            start = match.end()
+    conditions.append(text[start:])
+    return conditions
+
+
+def parse_ranges(text):
+    """
+    Expands '3, 7-12, 20' into (first, last) pairs.
+
+    Args:
+        text (str): Comma-separated numbers and ranges
+
+    Returns:
+        list: (first, last) tuples, both included
+
+    Raises:
+        ValueError: If the text is not a list of numbers and ranges, or
+            a range runs backwards
+    """
+    if not NUMBER_LIST.fullmatch(text.strip()):
+        raise ValueError(f"Invalid list '{text}' (try 3, 7-12, 20)")
+    ranges = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        first = int(first)
+        last = int(last) if last else first
+        if last < first:
+            raise ValueError(f"Invalid range '{part.strip()}'")
+        ranges.append((first, last))
+    return ranges
+
+
+def parse_conditions(text):
+    """
+    Turns 'duration < 60 and name contains x' into a duration interval
+    and a list of name tests.
+
+    Args:
+        text (str): Conditions joined with 'and'
+
+    Returns:
+        tuple: (lowest duration, first duration excluded or None, list
+            of functions name -> bool)
+
+    Raises:
+        ValueError: If a condition is not understood
+    """
+    low, high = 0, None
+    name_tests = []
+    for condition in split_conditions(text.strip()):
+        if parsed := DURATION_CONDITION.fullmatch(condition):
+            seconds = parse_duration(parsed['value'])
+            # Every condition narrows the interval [low, high)
+            match parsed['op']:
+                case '<':
+                    bounds = (0, seconds)
+                case '<=':
+                    bounds = (0, seconds + 1)
+                case '>':
+                    bounds = (seconds + 1, None)
+                case '>=':
+                    bounds = (seconds, None)
+                case '=':
+                    bounds = (seconds, seconds + 1)
+            low = max(low, bounds[0])
+            if bounds[1] is not None:
+                high = bounds[1] if high is None else min(high, bounds[1])
+        elif parsed := NAME_CONDITION.fullmatch(condition):
+            needle = parsed['text'].strip()
+            if len(needle) >= 2 and needle[0] == needle[-1] == '"':
+                needle = needle[1:-1]
+            needle = needle.casefold()
+            if parsed['op'].lower() == 'contains':
+                name_tests.append(lambda name, needle=needle: needle in name.casefold())
+            else:
+                name_tests.append(lambda name, needle=needle: name.casefold().startswith(needle))
+        else:
+            raise ValueError(f"Invalid condition '{condition}' "
+                             "(try 'duration < 60' or 'name contains draft')")
+    return low, high, name_tests
+
+
+def select_videos(videos, text, duration_index=None):
+    """
+    Finds the videos a selection refers to.
+
+    Args:
+        videos (Playlist): Video collection
+        text (str): Selection, see the module docstring
+        duration_index (SortedIndex): Index keyed by (duration, ...) to
+            answer duration conditions without a full scan
+
+    Returns:
+        list: IDs of the selected videos, in playlist order
+
+    Raises:
+        ValueError: If the selection is invalid or a number is out of range
+    """
+    text = text.strip()
+    if not text:
+        raise ValueError("Nothing selected")
+    if NUMBER_LIST.fullmatch(text):
+        positions = set()
+        for first, last in parse_ranges(text):
+            if first < 1 or last > len(videos):
+                raise ValueError(f"Video numbers go from 1 to {len(videos)}")
+            positions.update(range(first - 1, last))
+        return [videos[position].id for position in sorted(positions)]
+    if parsed := ID_LIST.fullmatch(text):
+        ranges = parse_ranges(parsed['list'])
+        if sum(last - first + 1 for first, last in ranges) > len(videos):
+            # Wide ranges ('id 1-999999999'): one pass over the collection
+            # is cheaper than looking up every ID they contain
+            return [video.id for video in videos
+                    if any(first <= video.id <= last for first, last in ranges)]
+        found = {}
+        for first, last in ranges:
+            for video_id in range(first, last + 1):
+                # IDs that are not (or no longer) in use are skipped
+                position = videos.position_of(video_id)
+                if position is not None:
+                    found[position] = video_id
+        return [found[position] for position in sorted(found)]
+
+    low, high, name_tests = parse_conditions(text)
+    if high is not None and duration_index is not None:
+        if high <= low:
+            return []
+        _, candidates = duration_index.between(videos, (low,), (high,))
+        found = {}
+        for video in candidates:
+            if all(test(video.name) for test in name_tests):
+                # IDs that are no longer in use are skipped
+                position = videos.position_of(video.id)
+                if position is not None:
+                    found[position] = video.id
+        # The index is in duration order; the caller expects playlist order
+        return [found[position] for position in sorted(found)]
+    return [video.id for video in videos
+            if video.time >= low and (high is None or video.time < high)
+            and all(test(video.name) for test in name_tests)]
@@ -0,0 +1 @@
+"""Benchmarks for the YouTube Video Manager - run with python -m benchmarks.<name>."""
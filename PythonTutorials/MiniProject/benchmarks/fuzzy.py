@@ -0,0 +1,94 @@
+"""
+Fuzzy Search Benchmark
+======================
+Builds the trigram index over synthetic titles and measures fuzzy query
+latency with misspelled queries, for several collection sizes.
+
+Run from the MiniProject directory:
+    python -m benchmarks.fuzzy
+    python -m benchmarks.fuzzy --sizes 10000,1000000,10000000
+
+The 10M size needs several GB of RAM; the default stops at 1M.
+"""
+
+import argparse
+import random
+import time
+
+from fuzzy_index import TrigramIndex
+from metrics import percentile
+from video_record import Video
+
+
+WORDS = ('python', 'java', 'rust', 'golang', 'kotlin', 'swift', 'docker', 'linux',
+         'react', 'django', 'flask', 'pandas', 'numpy', 'testing', 'async', 'design',
+         'patterns', 'beginner', 'advanced', 'crash', 'course', 'tutorial', 'tips',
+         'interview', 'project', 'build', 'deploy', 'database', 'security', 'cloud')
+
+SYLLABLES = ('ka', 'lo', 'mi', 'ra', 'te', 'zu', 'ven', 'dor', 'pli', 'sha', 'qua', 'brix',
+             'nel', 'tor', 'fy', 'gra', 'hum', 'jel', 'wix', 'ost', 'ump', 'cer', 'div', 'yan')
+
+
+def vocabulary(rng, size=20000):
+    """Common words plus made-up ones, like the long tail of real titles."""
+    words = set(WORDS)
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def synthetic_titles(count, rng):
+    """Yields titles like 'Python Kaloven Tutorial Brixdor #123'."""
+    words = vocabulary(rng)
+    for number in range(count):
+        picked = [rng.choice(WORDS)] + rng.sample(words, rng.randint(2, 4))
+        yield ' '.join(word.capitalize() for word in picked) + f" #{number}"
+
+
+def misspell(title, rng):
+    """Introduces one typo: a swapped, dropped or replaced letter."""
+    position = rng.randrange(1, len(title) - 1)
+    match rng.randrange(3):
+        case 0:
+            return title[:position - 1] + title[position] + title[position - 1] + title[position + 1:]
+        case 1:
+            return title[:position] + title[position + 1:]
+        case _:
+            return title[:position] + rng.choice('abcdefghijklmnopqrstuvwxyz') + title[position + 1:]
+
+
+def run(size, queries, rng):
+    """Builds an index of the given size and times the queries."""
+    videos = [Video(title, 60) for title in synthetic_titles(size, rng)]
+    index = TrigramIndex()
+    started = time.perf_counter()
+    index.build(videos)
+    build_seconds = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(queries):
+        # Users type the title (without its number), with a typo in it
+        title = rng.choice(videos).name
+        query = misspell(title.rsplit(' #', 1)[0], rng)
+        started = time.perf_counter()
+        index.search(videos, query, limit=50)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    print(f"{size:>12,}{build_seconds:>10.1f}s"
+          f"{percentile(latencies, 0.5) * 1000:>12.2f}{percentile(latencies, 0.99) * 1000:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fuzzy search latency benchmark')
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help='comma-separated collection sizes')
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(42)
+    print(f"{'titles':>12}{'build':>11}{'p50 ms':>12}{'p99 ms':>12}")
+    for size in (int(size) for size in args.sizes.split(',')):
+        run(size, args.queries, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Memory Benchmark: dict vs Video record
+======================================
+Measures how many bytes each video takes in memory when stored as a
+plain {'name': ..., 'time': ...} dictionary versus a Video record with
+__slots__ and interned strings.
+
+Run from the MiniProject directory:
+    python -m benchmarks.memory [number of videos]
+"""
+
+import json
+import random
+import sys
+import tracemalloc
+
+from video_record import Video
+
+
+def synthetic_json(count):
+    """
+    Builds a JSON array like youtube.txt with realistic repetition.
+
+    Durations repeat a lot and some titles appear more than once,
+    which is what interning takes advantage of.
+    """
+    rng = random.Random(42)
+    titles = [f"Python tutorial part {i}" for i in range(count // 4 + 1)]
+    return json.dumps([
+        {'name': rng.choice(titles), 'time': f"{rng.randint(1, 59)}:{rng.randint(0, 59):02d}"}
+        for _ in range(count)
+    ])
+
+
+def measure(build, text):
+    """
+    Returns the bytes allocated by build(text), including the parsed strings.
+
+    Args:
+        build: Function that turns the JSON text into a list of videos
+        text (str): JSON array text
+
+    Returns:
+        int: Bytes still allocated after building the list
+    """
+    tracemalloc.start()
+    videos = build(text)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del videos
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    text = synthetic_json(count)
+    as_dicts = measure(json.loads, text)
+    as_records = measure(lambda data: [Video.from_dict(item) for item in json.loads(data)], text)
+    print(f"{count:,} videos")
+    print(f"{'representation':<20}{'total MB':>12}{'bytes/video':>14}")
+    for label, size in (('dict', as_dicts), ('Video (__slots__)', as_records)):
+        print(f"{label:<20}{size / 1e6:>12.1f}{size / count:>14.0f}")
+    print(f"reduction: {1 - as_records / as_dicts:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Operation Benchmark Suite
+=========================
+Times the main youtube_manager operations on synthetic collections and
+records how much memory each one needs at its peak:
+
+- load_data          load the collection (until every video is loaded)
+- list_all_videos    show the first page of the list
+- add_video          add one video through the menu function
+- delete_video       delete a video from the middle through the menu function
+- save_data_helper   rewrite the whole collection (compaction)
+
+The menu functions run unchanged: input() is answered from a script and
+everything they print goes to os.devnull, so only the work is timed.
+Each operation runs --repeat times; the median and the first (cold) run
+are reported. Peak memory is measured in a second pass with tracemalloc,
+because tracing would slow down the timed pass.
+
+Results can be written as JSON and later runs compared against them:
+an operation that got slower (or needs more memory) by more than
+--threshold is flagged as a regression, and the exit status is 1.
+
+Run from the MiniProject directory:
+    python -m benchmarks.operations
+    python -m benchmarks.operations --sizes 1000,10000,100000 --output baseline.json
+    python -m benchmarks.operations --sizes 1000,10000,100000 --compare baseline.json
+    python -m benchmarks.operations --sizes 10000000 --repeat 1 --backend sqlite
+
+Files are written to a temporary directory. 1M videos and more need
+several GB of RAM.
+"""
+
+import argparse
+import builtins
+import importlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+
+from benchmarks.synthetic import synthetic_videos
+from serializers import write_snapshot
+
+
+OPERATIONS = ('load_data', 'list_all_videos', 'add_video', 'delete_video', 'save_data_helper')
+
+# Copy of the app's files every run starts from
+SEED_DIR = 'seed'
+
+
+@contextmanager
+def scripted_input(answers):
+    """Answers input() prompts from a list instead of the keyboard."""
+    answers = iter(answers)
+    original = builtins.input
+    builtins.input = lambda prompt='': next(answers)
+    try:
+        yield
+    finally:
+        builtins.input = original
+
+
+def copy_app_files(source, target):
+    """Replaces the app's files (youtube.*) in 'target' with those in 'source'."""
+    for path in os.listdir(target):
+        if path.startswith('youtube.'):
+            path = os.path.join(target, path)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+    for path in os.listdir(source):
+        if path.startswith('youtube.'):
+            if os.path.isdir(os.path.join(source, path)):
+                shutil.copytree(os.path.join(source, path), os.path.join(target, path))
+            else:
+                shutil.copy(os.path.join(source, path), target)
+
+
+def write_seed(size):
+    """
+    Creates the files of a synthetic collection of 'size' videos.
+
+    Backends other than JSON migrate youtube.txt on their first load;
+    that happens here once, so the timed loads only load.
+    """
+    videos = synthetic_videos(size)
+    shutil.rmtree(SEED_DIR, ignore_errors=True)
+    os.mkdir(SEED_DIR)
+    copy_app_files(SEED_DIR, '.')  # Clears the files of the previous size
+    with open('youtube.txt', 'wb') as file:
+        write_snapshot(videos, file)
+    del videos
+    import youtube_manager
+    len(importlib.reload(youtube_manager).load_data())
+    copy_app_files('.', SEED_DIR)
+
+
+def fresh_manager():
+    """
+    Restores the seed files and imports youtube_manager anew, so the
+    storage backend and the indexes start from scratch.
+    """
+    copy_app_files(SEED_DIR, '.')
+    import youtube_manager
+    return importlib.reload(youtube_manager)
+
+
+def operation_steps(manager):
+    """
+    Yields (operation name, function) in the order they are run.
+
+    The functions share one collection: loading comes first, saving last.
+    """
+    state = {}
+
+    def load():
+        state['videos'] = manager.load_data()
+        len(state['videos'])  # Loading runs in the background; wait for it
+
+    def pages():
+        # The page prompt only appears when there is more than one page
+        return ['q'] if len(state['videos']) > manager.PAGE_SIZE else []
+
+    def list_page():
+        with scripted_input(pages()):
+            manager.list_all_videos(state['videos'])
+
+    def add():
+        with scripted_input(['Benchmark video', '4:20']):
+            manager.add_video(state['videos'])
+
+    def delete():
+        middle = str(len(state['videos']) // 2 + 1)
+        with scripted_input(pages() + [middle]):
+            manager.delete_video(state['videos'])
+
+    def save():
+        manager.save_data_helper(state['videos'])
+
+    yield from zip(OPERATIONS, (load, list_page, add, delete, save))
+
+
+def timing_pass(repeat):
+    """
+    Runs every operation and times each call.
+
+    Returns:
+        dict: operation -> list of seconds, in call order
+    """
+    timings = {name: [] for name in OPERATIONS}
+    for _ in range(repeat):
+        manager = fresh_manager()
+        for name, function in operation_steps(manager):
+            started = time.perf_counter()
+            function()
+            timings[name].append(time.perf_counter() - started)
+    return timings
+
+
+def memory_pass():
+    """
+    Runs every operation once under tracemalloc.
+
+    Returns:
+        dict: operation -> peak bytes allocated above what was in use before
+    """
+    manager = fresh_manager()
+    peaks = {}
+    tracemalloc.start()
+    try:
+        for name, function in operation_steps(manager):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            function()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks[name] = peak - before
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def benchmark(size, repeat, memory):
+    """
+    Benchmarks every operation on a collection of 'size' videos.
+
+    Args:
+        size (int): Number of videos
+        repeat (int): Runs per operation (each on a freshly loaded collection)
+        memory (bool): Also measure peak memory
+
+    Returns:
+        list: One result dict per operation
+    """
+    write_seed(size)
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        timings = timing_pass(repeat)
+        peaks = memory_pass() if memory else {}
+    return [{
+        'size': size,
+        'operation': name,
+        'seconds': statistics.median(timings[name]),
+        'first_seconds': timings[name][0],
+        'peak_bytes': peaks.get(name),
+    } for name in OPERATIONS]
+
+
+def compare(results, baseline, threshold, min_delta):
+    """
+    Finds the results that are worse than the baseline.
+
+    Args:
+        results (list): Result dicts of this run
+        baseline (dict): Contents of an earlier --output file
+        threshold (float): Allowed slowdown/growth, e.g. 0.2 for 20%
+        min_delta (float): Time differences below this many seconds are
+            treated as noise
+
+    Returns:
+        dict: (size, operation) -> list of messages
+    """
+    previous = {(result['size'], result['operation']): result for result in baseline['results']}
+    regressions = {}
+    for result in results:
+        old = previous.get((result['size'], result['operation']))
+        if old is None:
+            continue
+        messages = []
+        if result['seconds'] > old['seconds'] * (1 + threshold) \
+                and result['seconds'] - old['seconds'] > min_delta:
+            messages.append(f"time {change(old['seconds'], result['seconds'])}")
+        if result['peak_bytes'] and old.get('peak_bytes') and \
+                result['peak_bytes'] > old['peak_bytes'] * (1 + threshold):
+            messages.append(f"memory {change(old['peak_bytes'], result['peak_bytes'])}")
+        if messages:
+            regressions[result['size'], result['operation']] = messages
+    return regressions
+
+
+def change(old, new):
+    """Formats the relative change between two numbers, e.g. '+35%'."""
+    return f"{(new - old) / old:+.0%}" if old else 'new'
+
+
+def print_results(results, regressions):
+    print(f"\n{'size':>10}  {'operation':<18}{'median ms':>11}{'first ms':>11}{'peak MB':>10}")
+    for result in results:
+        peak = result['peak_bytes']
+        line = (f"{result['size']:>10,}  {result['operation']:<18}"
+                f"{result['seconds'] * 1000:>11.2f}{result['first_seconds'] * 1000:>11.2f}"
+                f"{peak / 1e6 if peak is not None else float('nan'):>10.1f}")
+        messages = regressions.get((result['size'], result['operation']))
+        if messages:
+            line += "   REGRESSION: " + ", ".join(messages)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='youtube_manager operation benchmarks')
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='comma-separated collection sizes (up to 10000000)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs per operation (default 5)')
+    parser.add_argument('--backend', default='json',
+                        help='storage backend (json, sqlite, binary, segmented)')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the tracemalloc pass')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='slowdown counted as a regression (default 0.2 = 20%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.1,
+                        help='ignore time differences smaller than this (noise)')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    output = os.path.abspath(args.output) if args.output else None
+
+    # youtube_manager reads the backend when it is imported
+    os.environ['YOUTUBE_STORAGE'] = args.backend
+    os.environ.pop('YOUTUBE_DEDUP', None)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        for size in (int(size) for size in args.sizes.split(',')):
+            print(f"Benchmarking {size:,} videos ...", file=sys.stderr)
+            results += benchmark(size, args.repeat, not args.no_memory)
+
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms / 1000) \
+        if baseline else {}
+    print_results(results, regressions)
+    if output:
+        with open(output, 'w') as file:
+            json.dump({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'backend': args.backend,
+                'repeat': args.repeat,
+                'results': results,
+            }, file, indent=2)
+        print(f"\nResults written to {output}")
+    if regressions:
+        print(f"\n{len(regressions)} regressions against {args.compare}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Snapshot Serializer Benchmark
+=============================
+Saves and loads synthetic collections with every snapshot format from
+serializers.py and prints load time, save time and file size. The first
+row is the plain json.dump()/json.load() of dictionaries, for reference.
+
+Files are written to a temporary directory.
+
+Run from the MiniProject directory:
+    python -m benchmarks.serializers
+    python -m benchmarks.serializers --sizes 10000,1000000 --formats json,marshal
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import synthetic_videos
+from serializers import SNAPSHOT_FORMATS, read_snapshot, write_snapshot
+from video_record import Video
+
+
+BASELINE = 'json.dump (dicts)'
+
+
+def save(videos, path, fmt):
+    if fmt == BASELINE:
+        with open(path, 'w') as file:
+            json.dump([video.to_dict() for video in videos], file)
+        return
+    with open(path, 'wb') as file:
+        write_snapshot(videos, file, fmt)
+
+
+def load(path, fmt):
+    if fmt == BASELINE:
+        with open(path, 'r') as file:
+            return [Video.from_dict(data) for data in json.load(file)]
+    with open(path, 'rb') as file:
+        return list(read_snapshot(file))
+
+
+def timed(function, *args):
+    """Returns (seconds, result) of one call."""
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snapshot serializer benchmark')
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help='comma-separated collection sizes')
+    parser.add_argument('--formats', default=','.join(SNAPSHOT_FORMATS),
+                        help='comma-separated snapshot formats')
+    args = parser.parse_args()
+    formats = [BASELINE] + args.formats.split(',')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'youtube.txt')
+        for size in (int(size) for size in args.sizes.split(',')):
+            videos = synthetic_videos(size)
+            print(f"\n{size:,} videos")
+            print(f"{'format':<20}{'load s':>10}{'save s':>10}{'size MB':>10}")
+            for fmt in formats:
+                save_seconds, _ = timed(save, videos, path, fmt)
+                load_seconds, loaded = timed(load, path, fmt)
+                if loaded != videos:
+                    raise RuntimeError(f"{fmt} did not round-trip")
+                print(f"{fmt:<20}{load_seconds:>10.3f}{save_seconds:>10.3f}"
+                      f"{os.path.getsize(path) / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
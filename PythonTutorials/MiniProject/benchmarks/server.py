@@ -0,0 +1,103 @@
+"""
+Load Benchmark for the JSON API Server
+======================================
+Starts the server in-process on a free local port, seeds it with
+synthetic videos and hammers it with many concurrent clients. Each client
+keeps one connection open and sends a mix of list, search and add
+requests. Reports requests/sec and latency percentiles.
+
+Runs in a temporary directory, so your own youtube.txt is never touched.
+
+Run from the MiniProject directory:
+    python -m benchmarks.server --clients 50 --requests 200 --videos 10000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.synthetic import WORDS, synthetic_videos
+from metrics import percentile
+
+
+async def client(port, requests, rng, latencies):
+    """
+    One simulated client: 70% list, 20% search, 10% add.
+
+    Args:
+        port (int): Server port
+        requests (int): Number of requests to send
+        rng (random.Random): Random source for this client
+        latencies (list): Collects the latency of every request in seconds
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for number in range(requests):
+        roll = rng.random()
+        if roll < 0.7:
+            request = {'op': 'list', 'page': rng.randint(1, 50)}
+        elif roll < 0.9:
+            word = rng.choice(WORDS)
+            request = {'op': 'search', 'prefix': word[:rng.randint(1, len(word))]}
+        else:
+            request = {'op': 'add', 'name': f"client video {number}", 'time': rng.randint(1, 3600)}
+        started = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b'\n')
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - started)
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run(clients, requests, videos):
+    # Imported after changing directory, so storage files land in the temp dir
+    import youtube_manager
+    from serializers import write_snapshot
+    from server import run_server
+
+    with open('youtube.txt', 'wb') as file:
+        write_snapshot(synthetic_videos(videos), file)
+    collection = youtube_manager.load_data()
+
+    ready = asyncio.get_running_loop().create_future()
+    server_task = asyncio.create_task(run_server(port=0, videos=collection, ready=ready))
+    port = await ready
+
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(client(port, requests, random.Random(seed), latencies)
+                           for seed in range(clients)))
+    elapsed = time.perf_counter() - started
+    server_task.cancel()
+    try:
+        await server_task
+    except asyncio.CancelledError:
+        pass
+
+    latencies.sort()
+    print(f"{clients} clients x {requests} requests against {videos:,} videos")
+    print(f"requests/sec: {len(latencies) / elapsed:,.0f}")
+    for label, fraction in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99)):
+        print(f"{label} latency:  {percentile(latencies, fraction) * 1000:.2f} ms")
+    print(f"max latency:  {latencies[-1] * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=200, help='requests per client')
+    parser.add_argument('--videos', type=int, default=10_000, help='videos to seed')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        asyncio.run(run(args.clients, args.requests, args.videos))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Synthetic Collections for the Benchmarks
+========================================
+Every benchmark that needs made-up videos takes them from here, so they
+all measure the same kind of collection and it is defined only once.
+
+Titles are built from a small set of words; title lengths and durations
+follow distributions written as text:
+    fixed:30            always 30
+    uniform:10:80       any value from 10 to 80
+    normal:40:15        mean 40, standard deviation 15
+    lognormal:6.5:1.0   e^normal(6.5, 1.0) - long-tailed, like real durations
+    exponential:600     mean 600
+"""
+
+import random
+
+from video_record import Video
+
+
+# Words titles are made of
+WORDS = ('Python', 'Rust', 'Docker', 'Linux', 'Django', 'Pandas', 'Async', 'Testing',
+         'tutorial', 'crash', 'course', 'tips', 'deep', 'dive', 'Q&A', 'live', 'coding',
+         'for', 'beginners', 'advanced', 'part', 'how', 'to', 'build', 'an', 'API')
+
+# Longest title generated, whatever the distribution says
+MAX_TITLE_LENGTH = 200
+
+# Title lengths (characters) and durations (seconds) used by default
+DEFAULT_TITLE_LENGTH = 'normal:40:15'
+DEFAULT_DURATION = 'lognormal:6.5:1.0'
+
+
+class Distribution:
+    """
+    A random number source described by text, e.g. 'lognormal:6.5:1.0'.
+
+    Args:
+        spec (str): Kind and parameters, see the module docstring
+
+    Raises:
+        ValueError: If the kind is unknown or the parameters do not fit it
+    """
+
+    KINDS = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exponential': 1}
+
+    def __init__(self, spec):
+        kind, *params = spec.split(':')
+        if self.KINDS.get(kind) != len(params):
+            raise ValueError(f"Invalid distribution '{spec}' (try {', '.join(self.KINDS)}, "
+                             "e.g. normal:40:15)")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(param) for param in params]
+
+    def sample(self, rng):
+        """Draws one value, rounded to a whole number of at least 0."""
+        match self.kind:
+            case 'fixed':
+                value = self.params[0]
+            case 'uniform':
+                value = rng.uniform(*self.params)
+            case 'normal':
+                value = rng.gauss(*self.params)
+            case 'lognormal':
+                value = rng.lognormvariate(*self.params)
+            case 'exponential':
+                value = rng.expovariate(1 / self.params[0])
+        return max(0, round(value))
+
+
+def make_title(rng, lengths):
+    """Builds a title of words whose length follows 'lengths' (at least 1 character)."""
+    length = min(MAX_TITLE_LENGTH, max(1, lengths.sample(rng)))
+    words = []
+    size = -1
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length].strip() or rng.choice(WORDS)
+
+
+def synthetic_videos(count, lengths=DEFAULT_TITLE_LENGTH, durations=DEFAULT_DURATION, seed=42):
+    """
+    Creates a synthetic collection with IDs 1..count.
+
+    Args:
+        count (int): Number of videos
+        lengths (str): Title length distribution in characters
+        durations (str): Duration distribution in seconds
+        seed (int): Random seed, so runs are repeatable
+
+    Returns:
+        list: Video records
+    """
+    lengths, durations = Distribution(lengths), Distribution(durations)
+    rng = random.Random(seed)
+    return [Video(make_title(rng, lengths), durations.sample(rng), id=number)
+            for number in range(1, count + 1)]
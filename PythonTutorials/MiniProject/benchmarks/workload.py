@@ -0,0 +1,399 @@
+"""
+Mixed Multi-User Workload
+=========================
+Simulates many people using the app at the same time, to size a
+deployment with realistic traffic instead of one operation at a time.
+
+1. A synthetic collection is generated. Title lengths and durations
+   follow configurable distributions (see benchmarks/synthetic.py):
+       fixed:30            always 30
+       uniform:10:80       any value from 10 to 80
+       normal:40:15        mean 40, standard deviation 15
+       lognormal:6.5:1.0   e^normal(6.5, 1.0) - long-tailed, like real durations
+       exponential:600     mean 600
+2. Every simulated user is its own process running the app's menu
+   functions (list_all_videos, add_video, update_video, delete_video)
+   on the shared files, exactly like several copies of the app. input()
+   is answered from a script and the output goes to os.devnull. Before
+   every operation a user picks up the others' edits with sync_data(),
+   as the menu does.
+3. Each user picks its next operation from the mix (e.g.
+   list=50,add=20,update=20,delete=10), optionally after a think time.
+
+The report shows throughput and p50/p90/p99/max latency per operation,
+then a timeline with the throughput, the p99 latency and the size of
+the app's files (snapshot, journal, ...) for every interval, so growth
+and compactions are visible over time.
+
+Runs in a temporary directory, so your own youtube.txt is never touched.
+
+Run from the MiniProject directory:
+    python -m benchmarks.workload
+    python -m benchmarks.workload --users 16 --seconds 30 --videos 100000
+    python -m benchmarks.workload --mix list=80,add=10,update=5,delete=5 --think-ms 50
+    python -m benchmarks.workload --duration exponential:300 --title-length uniform:5:100
+    python -m benchmarks.workload --users 1 --backend sqlite --output workload.json
+
+Several users need the json or sqlite backend: the binary and segmented
+files are meant for one process at a time (see "Several Processes at
+Once" in the README).
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from bisect import bisect_left
+from contextlib import redirect_stdout
+
+from benchmarks.operations import scripted_input
+from benchmarks.synthetic import (DEFAULT_DURATION, DEFAULT_TITLE_LENGTH, Distribution,
+                                  make_title, synthetic_videos)
+from metrics import percentile
+from serializers import write_snapshot
+
+
+OPERATIONS = ('list', 'add', 'update', 'delete')
+
+DEFAULT_MIX = 'list=50,add=20,update=20,delete=10'
+
+
+def parse_mix(text):
+    """
+    Turns 'list=50,add=20,update=20,delete=10' into weights.
+
+    Args:
+        text (str): Comma-separated operation=weight pairs
+
+    Returns:
+        dict: operation -> weight (operations left out get 0)
+
+    Raises:
+        ValueError: If an operation is unknown or every weight is 0
+    """
+    weights = dict.fromkeys(OPERATIONS, 0.0)
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in weights:
+            raise ValueError(f"Unknown operation '{name}' (choose from {', '.join(OPERATIONS)})")
+        weights[name] = float(weight)
+    if sum(weights.values()) <= 0:
+        raise ValueError(f"Invalid mix '{text}': every weight is 0")
+    return weights
+
+
+def file_sizes():
+    """Returns the size in bytes of every app file (youtube.*) in the current directory."""
+    sizes = {}
+    for path in os.listdir('.'):
+        if not path.startswith('youtube.') or path.endswith('.tmp'):
+            continue
+        try:
+            if os.path.isdir(path):
+                sizes[path] = sum(os.path.getsize(os.path.join(path, name))
+                                  for name in os.listdir(path))
+            else:
+                sizes[path] = os.path.getsize(path)
+        except FileNotFoundError:
+            pass  # Replaced by a save just now
+    return sizes
+
+
+def simulated_user(number, settings, ready, start, deadline, results):
+    """
+    One user: loads the collection, then runs operations until the deadline.
+
+    Runs in its own process. Every operation is reported as
+    (seconds since the start, operation, latency in seconds, ok).
+
+    Args:
+        number (int): User number (also its random seed)
+        settings (dict): mix, lengths and durations specs, think_ms, seconds
+        ready (Queue): Gets (number, load seconds) once the user has loaded
+        start (Event): Set by the driver when every user is ready
+        deadline (Value): Wall-clock time at which to stop
+        results (Queue): Gets (number, samples, first errors) at the end
+    """
+    import youtube_manager as manager
+
+    rng = random.Random(number)
+    weights = parse_mix(settings['mix'])
+    lengths = Distribution(settings['lengths'])
+    durations = Distribution(settings['durations'])
+    samples = []
+    errors = []
+
+    def pages(videos):
+        # Number of pages list_all_videos will offer (the prompt only appears for 2+)
+        return max(1, -(-len(videos) // manager.PAGE_SIZE))
+
+    def browse(videos):
+        # Look at the first page, jump to a random one, then leave
+        total = pages(videos)
+        answers = [str(rng.randint(1, total)), 'q'] if total > 1 else []
+        with scripted_input(answers):
+            manager.list_all_videos(videos)
+
+    def add(videos):
+        with scripted_input([make_title(rng, lengths), str(durations.sample(rng))]):
+            manager.add_video(videos)
+
+    def update(videos):
+        answers = ['q'] if pages(videos) > 1 else []
+        answers += [str(rng.randint(1, max(1, len(videos)))),
+                    make_title(rng, lengths), str(durations.sample(rng))]
+        with scripted_input(answers):
+            manager.update_video(videos)
+
+    def delete(videos):
+        answers = ['q'] if pages(videos) > 1 else []
+        answers.append(str(rng.randint(1, max(1, len(videos)))))
+        with scripted_input(answers):
+            manager.delete_video(videos)
+
+    actions = {'list': browse, 'add': add, 'update': update, 'delete': delete}
+    names = [name for name in OPERATIONS if weights[name] > 0]
+    chances = [weights[name] for name in names]
+
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        started = time.perf_counter()
+        videos = manager.load_data()
+        len(videos)  # Loading runs in the background; wait for it
+        ready.put((number, time.perf_counter() - started))
+        start.wait()
+        began = deadline.value - settings['seconds']
+        while time.time() < deadline.value:
+            if settings['think_ms']:
+                time.sleep(rng.expovariate(1000 / settings['think_ms']))
+            name = rng.choices(names, chances)[0]
+            for operation, action in (('sync', manager.sync_data), (name, actions[name])):
+                at = time.time() - began
+                started = time.perf_counter()
+                try:
+                    action(videos)
+                    ok = True
+                except Exception as error:  # Keep going; the report counts it
+                    ok = False
+                    if len(errors) < 5:
+                        errors.append(f"{operation}: {error!r}")
+                samples.append((at, operation, time.perf_counter() - started, ok))
+        manager.flush_data(videos)
+    results.put((number, samples, errors))
+
+
+def summarize(samples, elapsed):
+    """
+    Computes throughput and latency percentiles per operation.
+
+    Args:
+        samples (list): (at, operation, latency, ok) tuples of every user
+        elapsed (float): Length of the run in seconds
+
+    Returns:
+        list: One dict per operation, plus 'all' for the user operations
+    """
+    by_operation = {}
+    for _, operation, latency, ok in samples:
+        by_operation.setdefault(operation, []).append((latency, ok))
+    by_operation['all'] = [(latency, ok) for _, operation, latency, ok in samples
+                           if operation != 'sync']
+    rows = []
+    for operation in ('sync',) + OPERATIONS + ('all',):
+        calls = by_operation.get(operation)
+        if not calls:
+            continue
+        latencies = sorted(latency for latency, _ in calls)
+        rows.append({
+            'operation': operation,
+            'calls': len(calls),
+            'errors': sum(not ok for _, ok in calls),
+            'ops_per_second': len(calls) / elapsed,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p90_ms': percentile(latencies, 0.90) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000,
+        })
+    return rows
+
+
+def timeline(samples, growth):
+    """
+    Splits the run at the file size samples: throughput, p99 latency and
+    file sizes of every interval.
+
+    Args:
+        samples (list): (at, operation, latency, ok) tuples of every user
+        growth (list): (at, {file: bytes}) samples taken by the driver
+
+    Returns:
+        list: One dict per size sample, with the operations since the previous one
+    """
+    started = sorted((at, latency) for at, operation, latency, _ in samples
+                     if operation != 'sync')
+    times = [at for at, _ in started]
+    rows = []
+    previous = 0.0
+    for at, sizes in growth:
+        window = started[bisect_left(times, previous):bisect_left(times, at)]
+        latencies = sorted(latency for _, latency in window)
+        rows.append({
+            'seconds': at,
+            'ops_per_second': len(latencies) / (at - previous) if at > previous else 0.0,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'files': sizes,
+            'total_bytes': sum(sizes.values()),
+        })
+        previous = at
+    return rows
+
+
+def run(args):
+    """
+    Seeds the collection, runs the users and samples the file sizes.
+
+    Returns:
+        dict: The report (see print_report)
+    """
+    videos = synthetic_videos(args.videos, args.title_length, args.duration)
+    with open('youtube.txt', 'wb') as file:
+        write_snapshot(videos, file)
+    del videos
+    # Backends other than JSON migrate youtube.txt on their first load;
+    # do it once here instead of in every user at the same time
+    import youtube_manager
+    len(youtube_manager.load_data())
+
+    # 'spawn' gives every user a fresh interpreter, like a separate app
+    context = multiprocessing.get_context('spawn')
+    ready, results = context.Queue(), context.Queue()
+    start, deadline = context.Event(), context.Value('d', 0.0)
+    settings = {'mix': args.mix, 'lengths': args.title_length,
+                'durations': args.duration, 'think_ms': args.think_ms,
+                'seconds': args.seconds}
+    users = [context.Process(target=simulated_user,
+                             args=(number, settings, ready, start, deadline, results))
+             for number in range(args.users)]
+    for user in users:
+        user.start()
+    load_seconds = sorted(ready.get()[1] for _ in users)
+
+    growth = [(0.0, file_sizes())]
+    began = time.time()
+    deadline.value = began + args.seconds
+    start.set()
+    next_sample = args.interval
+    while time.time() < deadline.value:
+        time.sleep(max(0.0, began + next_sample - time.time()))
+        growth.append((next_sample, file_sizes()))
+        next_sample += args.interval
+
+    samples, errors = [], []
+    for _ in users:
+        _, user_samples, user_errors = results.get()
+        samples += user_samples
+        errors += user_errors
+    for user in users:
+        user.join()
+    growth.append((time.time() - began, file_sizes()))  # After the last flush
+    elapsed = max(at + latency for at, _, latency, _ in samples) if samples else args.seconds
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': args.backend,
+        'users': args.users,
+        'videos': args.videos,
+        'seconds': elapsed,
+        'mix': parse_mix(args.mix),
+        'title_length': args.title_length,
+        'duration': args.duration,
+        'think_ms': args.think_ms,
+        'load_p50_ms': percentile(load_seconds, 0.5) * 1000,
+        'operations': summarize(samples, elapsed),
+        'timeline': timeline(samples, growth),
+        'errors': errors,
+    }
+
+
+def print_report(report):
+    print(f"{report['users']} users, {report['videos']:,} videos, {report['backend']} backend, "
+          f"{report['seconds']:.1f} s (load p50 {report['load_p50_ms']:.0f} ms)")
+    print(f"mix {', '.join(f'{name}={weight:g}' for name, weight in report['mix'].items())}, "
+          f"titles {report['title_length']}, durations {report['duration']}, "
+          f"think time {report['think_ms']:g} ms")
+
+    print(f"\n{'operation':<11}{'calls':>8}{'errors':>8}{'ops/s':>9}{'p50 ms':>9}"
+          f"{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for row in report['operations']:
+        print(f"{row['operation']:<11}{row['calls']:>8,}{row['errors']:>8}"
+              f"{row['ops_per_second']:>9.1f}{row['p50_ms']:>9.2f}{row['p90_ms']:>9.2f}"
+              f"{row['p99_ms']:>9.2f}{row['max_ms']:>9.2f}")
+
+    files = sorted({name for row in report['timeline'] for name in row['files']})
+    print(f"\n{'seconds':>8}{'ops/s':>9}{'p99 ms':>9}" + "".join(f"{name:>20}" for name in files)
+          + f"{'total bytes':>14}")
+    for row in report['timeline']:
+        print(f"{row['seconds']:>8.1f}{row['ops_per_second']:>9.1f}{row['p99_ms']:>9.2f}"
+              + "".join(f"{row['files'].get(name, 0):>20,}" for name in files)
+              + f"{row['total_bytes']:>14,}")
+
+    if report['errors']:
+        print("\nFirst errors:")
+        for error in report['errors']:
+            print(f"  {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=8, help='simulated users (processes)')
+    parser.add_argument('--seconds', type=float, default=10, help='length of the run')
+    parser.add_argument('--videos', type=int, default=10_000, help='videos to seed')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f'operation weights (default {DEFAULT_MIX})')
+    parser.add_argument('--title-length', default=DEFAULT_TITLE_LENGTH,
+                        help=f'title length distribution in characters (default {DEFAULT_TITLE_LENGTH})')
+    parser.add_argument('--duration', default=DEFAULT_DURATION,
+                        help=f'duration distribution in seconds (default {DEFAULT_DURATION})')
+    parser.add_argument('--think-ms', type=float, default=0,
+                        help='mean pause between a user\'s operations (default 0)')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='seconds between timeline rows (default 1)')
+    parser.add_argument('--backend', default='json',
+                        help='storage backend (json, sqlite, binary, segmented)')
+    parser.add_argument('--output', help='also write the report to this JSON file')
+    args = parser.parse_args()
+    try:
+        # Fail here rather than in every user
+        for spec in (args.title_length, args.duration):
+            Distribution(spec)
+        parse_mix(args.mix)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.backend not in ('json', 'sqlite') and args.users > 1:
+        # Only the JSON and SQLite backends lock and pick up other processes' edits
+        parser.error(f"the {args.backend} backend is for one process at a time; "
+                     "use --users 1 (or the json or sqlite backend)")
+    output = os.path.abspath(args.output) if args.output else None
+
+    # youtube_manager reads these when it is imported (here and in every user)
+    os.environ['YOUTUBE_STORAGE'] = args.backend
+    os.environ.pop('YOUTUBE_DEDUP', None)
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        print(f"Running {args.users} users for {args.seconds:g} s ...", file=sys.stderr)
+        report = run(args)
+    print_report(report)
+    if output:
+        with open(output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"\nReport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+Binary Record Storage for the YouTube Video Manager
+===================================================
+An optional storage format built for random access:
+
+- youtube.bin  : a small header followed by fixed-size slots, one per video;
+                 the header also keeps the largest video ID ever stored,
+                 so the ID of a deleted video is never given out again
+- youtube.heap : the video names (UTF-8), one after another (string heap)
+
+Every slot has the same size, so the slot of video N sits at a known
+byte offset. Both files are memory-mapped: updating or deleting a video
+only touches the bytes of its own slot (and, for a new name, the end of
+the heap), never the rest of the collection. An update that keeps the
+name - a new duration, or a move - points at the name already in the heap.
+
+Deleted slots and names no slot points at any more are dead space; the
+header counts the dead heap bytes. Once dead space is more than
+COMPACT_RATIO of both files (and at least COMPACT_MIN_BYTES), the next
+recorded edit compacts them, as save() does.
+
+Loading is zero-copy: opening the files only maps them into memory.
+A record is decoded from its slot only when it is actually used,
+e.g. when it is displayed - as long as no video has an order key; the
+first move or insert-at reads every record once (see playlist.py).
+
+Slot layout (36 bytes, little-endian):
+    name offset in heap (8) | name length (4) | duration seconds (4) |
+    video ID (8) | order key (8, NaN = none) | flags (1) | padding (3)
+
+The 4-byte duration is why parse_duration() rejects anything longer
+than video_record.MAX_DURATION, whichever backend is in use.
+
+Older files - version 1 (20-byte slots without ID and order key),
+version 2 (no largest ID in the header) and version 3 (no dead heap
+bytes in the header) - are upgraded once when they are loaded.
+"""
+
+import math
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import MutableSequence
+from contextlib import nullcontext
+
+from video_record import MIGRATE_FIX, Video, check_parsed
+
+
+SLOT_FILE = 'youtube.bin'
+HEAP_FILE = 'youtube.heap'
+
+MAGIC = b'YTVB'
+VERSION = 4
+# magic | version | reserved | number of slots | number of deleted slots |
+# largest video ID ever stored | heap bytes no slot points at
+HEADER = struct.Struct('<4sHHQQQQ')
+SLOT = struct.Struct('<QIIQdB3x')
+DELETED = 1
+
+# Header and slot layout of each older version, see upgrade_files()
+HEADER_V2 = struct.Struct('<4sHHQQ')
+HEADER_V3 = struct.Struct('<4sHHQQQ')
+SLOT_V1 = struct.Struct('<QIIB3x')
+OLD_LAYOUTS = {1: (HEADER_V2, SLOT_V1), 2: (HEADER_V2, SLOT), 3: (HEADER_V3, SLOT)}
+
+# Compact once dead space (deleted slots, unused names) is more than this
+# fraction of both files together, and at least COMPACT_MIN_BYTES
+COMPACT_RATIO = 0.5
+COMPACT_MIN_BYTES = 1024 * 1024
+
+
+def pack_slot(offset, length, video):
+    """Packs one live slot (a missing ID is 0, a missing order key NaN)."""
+    order = math.nan if video.order is None else video.order
+    return SLOT.pack(offset, length, video.time, video.id or 0, order, 0)
+
+
+class BinaryVideoList(MutableSequence):
+    """
+    List-like view over the memory-mapped slot file.
+
+    Deleting marks the slot with the DELETED flag instead of moving the
+    following slots on disk. List positions skip deleted slots: while
+    nothing is deleted, position N is simply slot N; after the first
+    delete a compact array of live slot numbers maps positions to slots.
+    """
+
+    def __init__(self, slot_file=SLOT_FILE, heap_file=HEAP_FILE):
+        self.slot_file = slot_file
+        self.heap_file = heap_file
+        self.open()
+
+    def open(self):
+        """Opens and maps both files (creating empty ones if needed)."""
+        if not os.path.exists(self.slot_file):
+            with open(self.slot_file, 'wb') as file:
+                file.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0, 0, 0))
+            open(self.heap_file, 'wb').close()
+        self.slots = open(self.slot_file, 'r+b')
+        self.heap = open(self.heap_file, 'r+b')
+        self.slot_map = mmap.mmap(self.slots.fileno(), 0)
+        self.heap_map = self._map_heap()
+        (magic, version, _, self.slot_count, self.deleted,
+         self.highest_id, self.dead_names) = HEADER.unpack_from(self.slot_map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.slot_file} is not a video record file")
+        self.live = None
+        if self.deleted:
+            self._build_live()
+
+    def close(self):
+        """Unmaps and closes both files."""
+        self.slot_map.close()
+        if self.heap_map is not None:
+            self.heap_map.close()
+        self.slots.close()
+        self.heap.close()
+
+    def _map_heap(self):
+        """Maps the heap file (an empty file cannot be mapped)."""
+        size = os.fstat(self.heap.fileno()).st_size
+        return mmap.mmap(self.heap.fileno(), 0) if size else None
+
+    def _build_live(self):
+        """Lists the live slot numbers, reading only each slot's flag byte."""
+        flags_at = HEADER.size + SLOT.size - 4
+        flags = self.slot_map[flags_at::SLOT.size][:self.slot_count]
+        self.live = array('Q', (slot for slot, flag in enumerate(flags) if not flag & DELETED))
+
+    def _slot(self, index):
+        """Converts a list position (negative allowed) into a slot number."""
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('video index out of range')
+        return index if self.live is None else self.live[index]
+
+    def _write_header(self):
+        HEADER.pack_into(self.slot_map, 0, MAGIC, VERSION, 0, self.slot_count,
+                         self.deleted, self.highest_id, self.dead_names)
+
+    def _add_name(self, name):
+        """Appends a name to the heap and returns (offset, length)."""
+        data = name.encode('utf-8')
+        self.heap.seek(0, os.SEEK_END)
+        offset = self.heap.tell()
+        self.heap.write(data)
+        self.heap.flush()
+        if self.heap_map is not None:
+            self.heap_map.close()
+        self.heap_map = self._map_heap()
+        return offset, len(data)
+
+    def decode(self, slot):
+        """
+        Decodes the Video stored in one slot.
+
+        Args:
+            slot (int): Slot number
+
+        Returns:
+            Video: The decoded record
+        """
+        offset, length, seconds, video_id, order, _ = SLOT.unpack_from(
+            self.slot_map, HEADER.size + slot * SLOT.size)
+        name = self.heap_map[offset:offset + length].decode('utf-8') if length else ''
+        return Video(name, seconds, video_id or None, None if math.isnan(order) else order)
+
+    def __len__(self):
+        return self.slot_count - self.deleted
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.decode(self._slot(index))
+
+    def _name_at(self, slot):
+        """Returns (offset, length) of the name a slot points at."""
+        return struct.unpack_from('<QI', self.slot_map, HEADER.size + slot * SLOT.size)
+
+    def __setitem__(self, index, video):
+        slot = self._slot(index)
+        offset, length = old_offset, old_length = self._name_at(slot)
+        data = video.name.encode('utf-8')
+        if self.heap_map is None or self.heap_map[old_offset:old_offset + old_length] != data:
+            # A new name: the old one becomes dead space
+            offset, length = self._add_name(video.name)
+            self.dead_names += old_length
+            self._write_header()
+        self.slot_map[HEADER.size + slot * SLOT.size:
+                      HEADER.size + (slot + 1) * SLOT.size] = pack_slot(offset, length, video)
+        self.slot_map.flush()
+
+    def __delitem__(self, index):
+        position = index + len(self) if index < 0 else index
+        slot = self._slot(position)
+        if self.live is None:
+            self.live = array('Q', range(self.slot_count))
+        del self.live[position]
+        flags_at = HEADER.size + slot * SLOT.size + SLOT.size - 4
+        self.slot_map[flags_at] |= DELETED
+        self.deleted += 1
+        self.dead_names += self._name_at(slot)[1]
+        self._write_header()
+        self.slot_map.flush()
+
+    def dead_bytes(self):
+        """Returns how many bytes of both files hold deleted slots or unused names."""
+        return self.deleted * SLOT.size + self.dead_names
+
+    def file_bytes(self):
+        """Returns the size of both files together."""
+        heap_size = len(self.heap_map) if self.heap_map is not None else 0
+        return HEADER.size + self.slot_count * SLOT.size + heap_size
+
+    def __iter__(self):
+        slots = range(self.slot_count) if self.live is None else self.live
+        for slot in slots:
+            yield self.decode(slot)
+
+    def append(self, video):
+        self.extend([video])
+
+    def extend(self, videos):
+        # All new slots (and names) are written with one write per file
+        slots = bytearray()
+        names = bytearray()
+        self.heap.seek(0, os.SEEK_END)
+        heap_end = self.heap.tell()
+        for video in videos:
+            data = video.name.encode('utf-8')
+            slots += pack_slot(heap_end + len(names), len(data), video)
+            names += data
+            self.highest_id = max(self.highest_id, video.id or 0)
+        if not slots:
+            return
+        self.heap.write(names)
+        self.heap.flush()
+        first = self.slot_count
+        # Right after the last counted slot, overwriting any half-written tail
+        self.slots.seek(HEADER.size + first * SLOT.size)
+        self.slots.write(slots)
+        self.slots.flush()
+        self.slot_map.close()
+        self.slot_map = mmap.mmap(self.slots.fileno(), 0)
+        if self.heap_map is not None:
+            self.heap_map.close()
+        self.heap_map = self._map_heap()
+        self.slot_count += len(slots) // SLOT.size
+        if self.live is not None:
+            self.live.extend(range(first, self.slot_count))
+        self._write_header()
+        self.slot_map.flush()
+
+    def insert(self, index, video):
+        if index >= len(self):
+            self.append(video)
+            return
+        position = max(index + len(self) if index < 0 else index, 0)
+        slot = self._slot(position)
+        offset, length = self._add_name(video.name)
+        # Unlike an update or delete, this moves every following slot
+        # (including deleted ones) one slot further into the file
+        start = HEADER.size + slot * SLOT.size
+        end = HEADER.size + self.slot_count * SLOT.size
+        self.slot_map.close()
+        self.slots.truncate(end + SLOT.size)
+        self.slot_map = mmap.mmap(self.slots.fileno(), 0)
+        self.slot_map.move(start + SLOT.size, start, end - start)
+        self.slot_map[start:start + SLOT.size] = pack_slot(offset, length, video)
+        self.slot_count += 1
+        self.highest_id = max(self.highest_id, video.id or 0)
+        if self.live is not None:
+            self.live = array('Q', (later + 1 if later >= slot else later for later in self.live))
+            self.live.insert(position, slot)
+        self._write_header()
+        self.slot_map.flush()
+
+    def last_id(self):
+        """Returns the largest video ID ever stored, even if deleted since."""
+        return self.highest_id
+
+    def has_order_keys(self):
+        """
+        Tells whether any slot has an explicit order key. Like
+        _build_live(), it reads only two bytes per slot: the top bytes of
+        the order key, which are f8 7f for a missing key (NaN). Deleted
+        slots are included, which can only make the answer cautious.
+        """
+        end = HEADER.size + self.slot_count * SLOT.size
+        low = self.slot_map[HEADER.size + 30:end:SLOT.size]
+        high = self.slot_map[HEADER.size + 31:end:SLOT.size]
+        return low.count(0xf8) != len(low) or high.count(0x7f) != len(high)
+
+
+def write_files(videos, slot_file, heap_file, last_id=0):
+    """
+    Writes a fresh, compact pair of files (no deleted slots, no old names).
+
+    Args:
+        videos: Iterable of Video records
+        slot_file (str): Path of the slot file to create
+        heap_file (str): Path of the heap file to create
+        last_id (int): Largest video ID ever stored, if larger than any
+            of these videos' IDs (deleted videos keep their IDs used)
+
+    Returns:
+        int: Number of videos written
+    """
+    count = 0
+    offset = 0
+    with open(slot_file, 'wb') as slots, open(heap_file, 'wb') as heap:
+        slots.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0, 0, 0))
+        for video in videos:
+            data = video.name.encode('utf-8')
+            slots.write(pack_slot(offset, len(data), video))
+            heap.write(data)
+            offset += len(data)
+            count += 1
+            last_id = max(last_id, video.id or 0)
+        slots.seek(0)
+        slots.write(HEADER.pack(MAGIC, VERSION, 0, count, 0, last_id, 0))
+        for file in (slots, heap):
+            file.flush()
+            os.fsync(file.fileno())
+    return count
+
+
+def upgrade_files(slot_file, heap_file):
+    """
+    Rewrites files of an older version in the current format (once, on load).
+
+    Version 1 slots have no IDs: live videos get IDs by position, like
+    in the other backends. Version 2 headers have no largest ID: it is
+    taken from the slots, deleted ones included. Version 3 headers do
+    not count dead heap bytes; the rewrite leaves none.
+
+    Args:
+        slot_file (str): Slot file to check
+        heap_file (str): Its heap file
+    """
+    with open(slot_file, 'rb') as file:
+        data = file.read()
+    # Every version starts with the same fields
+    magic, version, _, slot_count, _ = HEADER_V2.unpack_from(data, 0)
+    if magic != MAGIC or version not in OLD_LAYOUTS:
+        return
+    header, layout = OLD_LAYOUTS[version]
+    with open(heap_file, 'rb') as file:
+        heap = file.read()
+    videos = []
+    last_id = header.unpack_from(data, 0)[5] if version >= 3 else 0
+    for fields in layout.iter_unpack(data[header.size:header.size + slot_count * layout.size]):
+        offset, length, seconds, flags = fields[0], fields[1], fields[2], fields[-1]
+        if version == 1:
+            video_id, order = len(videos) + 1, math.nan
+        else:
+            video_id, order = fields[3], fields[4]
+            last_id = max(last_id, video_id)
+        if not flags & DELETED:
+            name = heap[offset:offset + length].decode('utf-8')
+            videos.append(Video(name, seconds, video_id or None,
+                                None if math.isnan(order) else order))
+    write_files(videos, slot_file + '.tmp', heap_file + '.tmp', last_id)
+    os.replace(heap_file + '.tmp', heap_file)
+    os.replace(slot_file + '.tmp', slot_file)
+
+
+class BinaryStorage:
+    """
+    Stores the collection in the fixed-width binary record format.
+
+    Edits go straight to the mapped slots, so record() only checks
+    whether it is time to compact. save() compacts: it writes new files
+    without deleted slots and unused names, and swaps them in with an
+    atomic rename. Positions stay the same, as they skip deleted slots.
+    """
+
+    def __init__(self, slot_file=SLOT_FILE, heap_file=HEAP_FILE, migrate_from=None):
+        self.slot_file = slot_file
+        self.heap_file = heap_file
+        # JSON storage to import from the first time the files are created
+        self.migrate_from = migrate_from
+        # Bytes written by save(), see io_stats()
+        self.written_bytes = 0
+
+    def load(self):
+        """
+        Maps the record files; nothing is decoded until it is used.
+
+        Returns:
+            BinaryVideoList: List-like view over the stored videos
+        """
+        if not os.path.exists(self.slot_file) and self.migrate_from is not None:
+            videos = self.migrate_from.load()
+            check_parsed(videos, f"migrate {self.migrate_from.data_file}", MIGRATE_FIX)
+            count = write_files(videos, self.slot_file, self.heap_file, videos.last_id())
+            print(f"Migrated {count} videos from {self.migrate_from.data_file}")
+        elif os.path.exists(self.slot_file):
+            upgrade_files(self.slot_file, self.heap_file)
+        return BinaryVideoList(self.slot_file, self.heap_file)
+
+    def save(self, videos):
+        """
+        Rewrites both files compactly and swaps them in atomically.
+
+        Args:
+            videos (list): Video collection to write
+        """
+        write_files(videos, self.slot_file + '.tmp', self.heap_file + '.tmp', videos.last_id())
+        self.written_bytes += (os.path.getsize(self.slot_file + '.tmp')
+                               + os.path.getsize(self.heap_file + '.tmp'))
+        mapped = isinstance(videos, BinaryVideoList)
+        if mapped:
+            # Files that are still mapped cannot be replaced on Windows
+            videos.close()
+        os.replace(self.heap_file + '.tmp', self.heap_file)
+        os.replace(self.slot_file + '.tmp', self.slot_file)
+        if mapped:
+            videos.open()
+
+    def record(self, videos, record):
+        """
+        The list operation already wrote the slot; this only compacts
+        the files once too much of them is dead space (see COMPACT_RATIO).
+
+        Args:
+            videos (BinaryVideoList): Collection (already modified)
+            record (dict): Journal record describing the change (unused)
+        """
+        if videos.dead_bytes() > max(COMPACT_MIN_BYTES, COMPACT_RATIO * videos.file_bytes()):
+            self.save(videos)
+
+    def record_batch(self, videos, records):
+        """extend() already wrote the slots; compacts like record()."""
+        self.record(videos, None)
+
+    def flush(self):
+        """Nothing to do - slot writes are flushed as they happen."""
+
+    def commit_stats(self):
+        """Slot writes are not batched, so there is nothing to report."""
+        return {}
+
+    def io_stats(self):
+        """
+        Returns the bytes written by compactions. Edits and reads go
+        through the memory map and are not counted (read_bytes stays 0).
+
+        Returns:
+            dict: read_bytes, written_bytes
+        """
+        return {'read_bytes': 0, 'written_bytes': self.written_bytes}
+
+    def locked(self):
+        """Only one process at a time should use these files (no lock)."""
+        return nullcontext()
+
+    def has_changes(self):
+        """Other processes' edits are not tracked for this backend."""
+        return False
+
+    def changes(self):
+        """Nothing to merge, see has_changes()."""
+        return []
@@ -0,0 +1,197 @@
+"""
+Bulk Import / Export for the YouTube Video Manager
+==================================================
+Non-interactive loading and dumping of the video collection, used by the
+'import' and 'export' commands of youtube_manager.py.
+
+Supported formats:
+- CSV   : header row 'name,time', one video per row
+- JSONL : one JSON object {"name": ..., "time": ...} per line
+
+Files are streamed row by row and written to storage in batches, so the
+input file is never held in memory as a whole.
+"""
+
+import csv
+import json
+import sys
+import time
+from contextlib import nullcontext
+from itertools import islice
+
+from video_record import Video
+
+
+# How many rows are validated and committed to storage at once
+IMPORT_BATCH_SIZE = 10000
+
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(path, fmt=None):
+    """
+    Works out the file format from an explicit choice or the file extension.
+
+    Args:
+        path (str): File path ('-' means stdin/stdout)
+        fmt (str): Explicit format, or None to guess from the extension
+
+    Returns:
+        str: 'csv' or 'jsonl'
+    """
+    if fmt is None:
+        if path.endswith('.csv'):
+            fmt = 'csv'
+        elif path.endswith(('.jsonl', '.ndjson')):
+            fmt = 'jsonl'
+        else:
+            raise ValueError(f"Cannot tell the format of '{path}', "
+                             f"use --format {'/'.join(FORMATS)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', choose one of: {', '.join(FORMATS)}")
+    return fmt
+
+
+def open_file(path, mode):
+    """Opens a file for streaming, with '-' meaning stdin or stdout."""
+    if path == '-':
+        return open((sys.stdin if 'r' in mode else sys.stdout).fileno(),
+                    mode, newline='', closefd=False)
+    return open(path, mode, newline='')
+
+
+def read_rows(file, fmt):
+    """
+    Yields the raw rows of an import file one at a time.
+
+    Args:
+        file: Open text file
+        fmt (str): 'csv' or 'jsonl'
+
+    Yields:
+        tuple: (line number, parsed row or None if the line is unreadable)
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError:
+                yield line_number, None
+
+
+def validate_row(row):
+    """
+    Checks one imported row and turns it into a Video record.
+
+    Args:
+        row: Parsed CSV/JSONL row
+
+    Returns:
+        Video: The validated video
+
+    Raises:
+        ValueError: If the row is not an object, name/time are missing
+            or the time is not a valid duration
+    """
+    if not isinstance(row, dict):
+        raise ValueError('row is not an object')
+    name = row.get('name')
+    duration = row.get('time')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("missing 'name'")
+    if duration is None or not str(duration).strip():
+        raise ValueError("missing 'time'")
+    return Video(name.strip(), str(duration).strip())
+
+
+def import_videos(videos, storage, path, fmt=None, batch_size=IMPORT_BATCH_SIZE,
+                  exclusive=nullcontext):
+    """
+    Streams videos from a CSV/JSONL file into the collection.
+
+    Rows are validated and committed in batches of batch_size: each batch
+    is added to the list and persisted with one storage write. Invalid
+    rows are skipped and reported. At the end the storage is compacted
+    once, instead of after every batch. Each batch is added while holding
+    exclusive(), so other running copies of the app are not overwritten.
+
+    Args:
+        videos (list): Video collection to add to
+        storage: Storage backend (see storage.py)
+        path (str): File to read, or '-' for stdin
+        fmt (str): 'csv', 'jsonl' or None to guess from the extension
+        batch_size (int): Number of rows per commit
+        exclusive: Function returning the context manager to hold while
+            a batch is added (see youtube_manager.exclusive_access)
+
+    Returns:
+        tuple: (number of imported videos, number of skipped rows)
+    """
+    fmt = detect_format(path, fmt)
+    # The backend's own list, below the Playlist (if 'videos' is one)
+    store = getattr(videos, 'store', videos)
+    imported = skipped = 0
+    started = time.perf_counter()
+    with open_file(path, 'r') as file:
+        rows = read_rows(file, fmt)
+        while batch := list(islice(rows, batch_size)):
+            valid = []
+            for line_number, row in batch:
+                try:
+                    valid.append(validate_row(row))
+                except ValueError as error:
+                    skipped += 1
+                    print(f"Skipping line {line_number}: {error}", file=sys.stderr)
+            with exclusive():
+                videos.extend(valid)  # One store write; gives every new video the next free ID
+                storage.record_batch(store, [{'op': 'add', 'video': video} for video in valid])
+            imported += len(valid)
+    storage.save(store)
+    report('Imported', imported, time.perf_counter() - started)
+    if skipped:
+        print(f"Skipped {skipped} invalid rows", file=sys.stderr)
+    return imported, skipped
+
+
+def export_videos(videos, path, fmt=None):
+    """
+    Streams the whole collection out to a CSV/JSONL file.
+
+    Args:
+        videos (list): Video collection to export
+        path (str): File to write, or '-' for stdout
+        fmt (str): 'csv', 'jsonl' or None to guess from the extension
+
+    Returns:
+        int: Number of exported videos
+    """
+    fmt = detect_format(path, fmt)
+    exported = 0
+    started = time.perf_counter()
+    with open_file(path, 'w') as file:
+        if fmt == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(['name', 'time'])
+            for video in videos:
+                writer.writerow([video.name, video.time])
+                exported += 1
+        else:
+            for video in videos:
+                file.write(json.dumps(video.to_dict()) + '\n')
+                exported += 1
+    report('Exported', exported, time.perf_counter() - started)
+    return exported
+
+
+def report(action, rows, elapsed):
+    """Prints the row count and throughput of a bulk operation."""
+    rate = rows / elapsed if elapsed > 0 else 0
+    # Goes to stderr so it never mixes with data exported to stdout
+    print(f"{action} {rows} videos in {elapsed:.2f}s ({rate:,.0f} rows/sec)",
+          file=sys.stderr)
@@ -0,0 +1,237 @@
+"""
+Duplicate Detection for the YouTube Video Manager
+=================================================
+Two videos are duplicates when their names match after normalizing
+(case and extra spaces are ignored) and their durations are equal.
+
+Checking a new video is O(1) and never scans the collection:
+
+1. A Bloom filter answers "definitely new" for almost every new video.
+   It is a bit array where each key sets a few bits chosen by hashing;
+   if any of the key's bits is 0, the key was never added. It takes
+   about 10 bits per video and is saved to youtube.bloom on exit, so the
+   next run can check adds without reading the collection at all.
+   The file is stamped like youtube.durations (number of videos and
+   storage version), and removed as soon as the collection changes, so
+   a run that crashes or never uses the filter cannot leave one behind
+   that misses videos.
+2. Only when the filter says "maybe" (a real duplicate, or a ~1% false
+   positive) is the hash index consulted: a dict from key to the number
+   of videos with that key, built from the collection on first need.
+
+A Bloom filter cannot forget a key, so deletes leave their bits set.
+That only adds false positives, which the hash index then rules out.
+"""
+
+import hashlib
+import os
+import struct
+from contextlib import suppress
+
+
+BLOOM_FILE = 'youtube.bloom'
+
+# ~1% false positives: 10 bits per expected video and 7 hash functions
+BITS_PER_VIDEO = 10
+HASH_COUNT = 7
+# Room for this many times the current collection before the filter fills up
+GROWTH_FACTOR = 2
+MIN_CAPACITY = 10000
+
+# magic | number of videos covered | storage version (-1: none) | number of bits |
+# number of hashes
+BLOOM_HEADER = struct.Struct('<4sQqQB')
+BLOOM_MAGIC = b'YTB2'
+
+
+def normalize_name(name):
+    """
+    Normalizes a name for duplicate checks: case-folded, single spaces.
+
+    Args:
+        name (str): Video name
+
+    Returns:
+        str: e.g. '  Python   BASICS ' -> 'python basics'
+    """
+    return ' '.join(name.casefold().split())
+
+
+def duplicate_key(video):
+    """Returns the (normalized name, duration) pair that identifies duplicates."""
+    return normalize_name(video.name), video.time
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over duplicate keys.
+
+    Uses blake2b instead of hash(), because hash() of a string changes
+    from run to run and the filter is saved to disk.
+    """
+
+    def __init__(self, bits, hashes=HASH_COUNT, data=None):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = bytearray((bits + 7) // 8) if data is None else data
+
+    @classmethod
+    def for_capacity(cls, count):
+        """Creates an empty filter sized for 'count' videos."""
+        return cls(max(count, MIN_CAPACITY) * BITS_PER_VIDEO)
+
+    def _positions(self, key):
+        """Yields the bit positions of a key (double hashing)."""
+        name, seconds = key
+        digest = hashlib.blake2b(f"{name}\0{seconds}".encode('utf-8'), digest_size=16).digest()
+        first, second = struct.unpack('<QQ', digest)
+        for number in range(self.hashes):
+            yield (first + number * second) % self.bits
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.data[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.data[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+
+class DuplicateIndex:
+    """
+    Hash index of duplicate keys with a Bloom filter in front.
+
+    Follows the same add/remove protocol as the other indexes. 'changed'
+    remembers that the collection changed since the saved filter was
+    written, which then no longer describes it.
+    """
+
+    def __init__(self, bloom_file=BLOOM_FILE):
+        self.bloom_file = bloom_file
+        self.built = False
+        self.keys = {}      # duplicate key -> number of videos with that key
+        self.bloom = None   # BloomFilter once loaded or built
+        self.changed = False
+
+    def build(self, videos):
+        """
+        Builds the hash index (and a fresh filter) from the whole collection.
+
+        Args:
+            videos (list): Video collection to index
+        """
+        self.keys = {}
+        self.bloom = BloomFilter.for_capacity(GROWTH_FACTOR * len(videos))
+        self.built = True
+        for video in videos:
+            self.add(video)
+
+    def add(self, video):
+        """
+        Adds one video to the filter and, once built, the hash index.
+
+        Args:
+            video (Video): Video to index
+        """
+        self._mark_changed()
+        if self.bloom is None:
+            return
+        key = duplicate_key(video)
+        self.bloom.add(key)
+        if self.built:
+            self.keys[key] = self.keys.get(key, 0) + 1
+
+    def remove(self, video):
+        """
+        Removes one video from the hash index (the filter keeps its bits).
+
+        Args:
+            video (Video): Video equal to the indexed one
+        """
+        self._mark_changed()
+        if self.bloom is None:
+            return
+        if not self.built:
+            return
+        key = duplicate_key(video)
+        remaining = self.keys.get(key, 0) - 1
+        if remaining > 0:
+            self.keys[key] = remaining
+        else:
+            self.keys.pop(key, None)
+
+    def _mark_changed(self):
+        """Removes the saved filter at the first change (see the module docstring)."""
+        if not self.changed:
+            self.changed = True
+            with suppress(FileNotFoundError):
+                os.remove(self.bloom_file)
+
+    def is_duplicate(self, videos, video, stamp):
+        """
+        Tells whether a video with the same name and duration exists.
+
+        Args:
+            videos (list): Video collection (read only when the filter
+                is missing or says "maybe")
+            video (Video): Video about to be added
+            stamp (dict): Describes the collection, see load()
+
+        Returns:
+            bool: True if it would be a duplicate
+        """
+        if self.bloom is None and not self.load(stamp):
+            self.build(videos)
+        key = duplicate_key(video)
+        if key not in self.bloom:
+            return False  # Definitely new - no need for the hash index
+        if not self.built:
+            self.build(videos)
+        return key in self.keys
+
+    def load(self, stamp):
+        """
+        Loads the saved filter if it describes this collection.
+
+        Args:
+            stamp (dict): e.g. {'count': 1000, 'version': 52}; the file
+                must have been saved with the same stamp
+
+        Returns:
+            bool: True if the filter was loaded
+        """
+        try:
+            with open(self.bloom_file, 'rb') as file:
+                magic, count, version, bits, hashes = BLOOM_HEADER.unpack(
+                    file.read(BLOOM_HEADER.size))
+                data = bytearray(file.read())
+        except (FileNotFoundError, struct.error):
+            return False
+        saved_stamp = {'count': count, 'version': None if version < 0 else version}
+        if magic != BLOOM_MAGIC or saved_stamp != stamp or len(data) != (bits + 7) // 8:
+            return False
+        self.bloom = BloomFilter(bits, hashes, data)
+        return True
+
+    def save(self, stamp):
+        """
+        Saves the filter for the next run (called on exit).
+
+        Without a filter in use, a saved one is deleted if the collection
+        changed, because it no longer knows every video.
+
+        Args:
+            stamp (dict): Describes the collection, see load()
+        """
+        if self.bloom is None:
+            if self.changed:
+                with suppress(FileNotFoundError):
+                    os.remove(self.bloom_file)
+            return
+        version = -1 if stamp['version'] is None else stamp['version']
+        temp_file = self.bloom_file + '.tmp'
+        with open(temp_file, 'wb') as file:
+            file.write(BLOOM_HEADER.pack(BLOOM_MAGIC, stamp['count'], version,
+                                         self.bloom.bits, self.bloom.hashes))
+            file.write(self.bloom.data)
+        os.replace(temp_file, self.bloom_file)
@@ -0,0 +1,291 @@
+"""
+Duration Percentiles and Histogram for the YouTube Video Manager
+================================================================
+Answers "what is the median / p90 / p99 duration?" and "how many videos
+are under a minute, 1-5 minutes, ...?" without sorting the collection.
+
+Percentiles come from a quantile sketch in the style of DDSketch:
+durations are counted in buckets whose bounds grow by a constant factor
+(gamma), so every bucket's midpoint is within RELATIVE_ACCURACY (1%) of
+any duration in it. A day has under 600 such buckets, whatever the size
+of the collection. A percentile is found by walking the buckets in
+order until enough videos are counted. Estimates are kept between the
+smallest and largest duration seen, so a collection whose videos all
+last an hour reports exactly 1:00:00, not the bucket's midpoint.
+
+Unlike t-digest or KLL sketches, a bucket sketch can also *forget* a
+value - deleting a video just lowers one bucket count - so it stays
+exact under add, update and delete. Two sketches with the same accuracy
+merge by adding their counts.
+
+The histogram uses fixed buckets (HISTOGRAM_EDGES) and is kept up to
+date the same way.
+
+Both are saved to youtube.durations on exit, together with the number
+of videos and the storage version they describe; the next run uses the
+file as long as the collection still matches, and otherwise rebuilds
+them with one pass over the videos. The first edit deletes the file:
+for most backends the stamp is only the number of videos, which an
+update does not change, so a file left behind by a crash would
+otherwise still look current.
+"""
+
+import json
+import math
+import os
+from bisect import bisect_right
+from contextlib import suppress
+
+
+ANALYTICS_FILE = 'youtube.durations'
+
+# Percentile estimates are within 1% of the true duration
+RELATIVE_ACCURACY = 0.01
+
+# Histogram bucket bounds in seconds: <1m, 1-5m, 5-10m, 10-20m, 20-30m,
+# 30-60m, 1-2h and 2h or more
+HISTOGRAM_EDGES = (60, 300, 600, 1200, 1800, 3600, 7200)
+
+# Percentiles shown by default
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative accuracy (DDSketch style).
+
+    Value v > 0 is counted in bucket ceil(log(v) / log(gamma)), which
+    covers (gamma^(k-1), gamma^k]; zeros are counted on their own.
+
+    'low' and 'high' are the smallest and largest value added. Removing
+    a value leaves them alone: they may then be looser than the values
+    left, but never cut an estimate off wrongly.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}  # bucket number -> count
+        self.zeros = 0
+        self.count = 0
+        self.low = None
+        self.high = None
+
+    def _bucket(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def add(self, value, count=1):
+        """Counts a value (a negative count removes it again)."""
+        self.count += count
+        if count > 0:
+            self.low = value if self.low is None else min(self.low, value)
+            self.high = value if self.high is None else max(self.high, value)
+        if value <= 0:
+            self.zeros += count
+            return
+        bucket = self._bucket(value)
+        remaining = self.buckets.get(bucket, 0) + count
+        if remaining:
+            self.buckets[bucket] = remaining
+        else:
+            del self.buckets[bucket]
+
+    def remove(self, value):
+        """Forgets a value that was added before."""
+        self.add(value, -1)
+
+    def merge(self, other):
+        """
+        Adds the counts of another sketch to this one.
+
+        Args:
+            other (QuantileSketch): Sketch with the same accuracy
+
+        Raises:
+            ValueError: If the accuracies differ (the buckets would not line up)
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Only sketches with the same accuracy can be merged')
+        for bucket, count in other.buckets.items():
+            remaining = self.buckets.get(bucket, 0) + count
+            if remaining:
+                self.buckets[bucket] = remaining
+            else:
+                del self.buckets[bucket]
+        self.zeros += other.zeros
+        self.count += other.count
+        for value in (other.low, other.high):
+            if value is not None:
+                self.low = value if self.low is None else min(self.low, value)
+                self.high = value if self.high is None else max(self.high, value)
+
+    def quantile(self, fraction):
+        """
+        Estimates the value below which 'fraction' of the values fall.
+
+        Args:
+            fraction (float): Between 0 and 1, e.g. 0.9 for p90
+
+        Returns:
+            float: The estimate (within the relative accuracy, and between
+                the smallest and largest value seen), or 0 if empty
+        """
+        if self.count <= 0:
+            return 0
+        rank = fraction * (self.count - 1)
+        seen = self.zeros
+        if seen > rank:
+            return 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                break
+        # Midpoint of the bucket, in the relative sense
+        estimate = 2 * self.gamma ** bucket / (self.gamma + 1)
+        return min(max(estimate, self.low), self.high)
+
+    def to_dict(self):
+        return {'relative_accuracy': self.relative_accuracy, 'zeros': self.zeros,
+                'count': self.count, 'low': self.low, 'high': self.high, 'buckets': [[bucket, count] for bucket, count
+                                                 in sorted(self.buckets.items())]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'])
+        sketch.zeros = data['zeros']
+        sketch.count = data['count']
+        sketch.low = data['low']
+        sketch.high = data['high']
+        sketch.buckets = {bucket: count for bucket, count in data['buckets']}
+        return sketch
+
+
+class DurationAnalytics:
+    """
+    Duration percentiles (QuantileSketch) plus a fixed-bucket histogram.
+
+    Follows the same protocol as the other indexes: built on first use
+    (or loaded from youtube.durations), then kept up to date by add()
+    and remove(). 'changed' remembers edits made before that, which a
+    saved file would not know about.
+    """
+
+    def __init__(self, analytics_file=ANALYTICS_FILE):
+        self.analytics_file = analytics_file
+        self.built = False
+        self.changed = False
+        self.sketch = QuantileSketch()
+        self.histogram = [0] * (len(HISTOGRAM_EDGES) + 1)
+
+    def build(self, videos):
+        """
+        Counts every video of the collection (first use only).
+
+        Args:
+            videos (list): Video collection
+        """
+        self.sketch = QuantileSketch()
+        self.histogram = [0] * (len(HISTOGRAM_EDGES) + 1)
+        self.built = True
+        for video in videos:
+            self.add(video)
+
+    def add(self, video):
+        """
+        Counts one added video.
+
+        Args:
+            video (Video): Added video
+        """
+        self._mark_changed()
+        if not self.built:
+            return
+        self.sketch.add(video.time)
+        self.histogram[bisect_right(HISTOGRAM_EDGES, video.time)] += 1
+
+    def remove(self, video):
+        """
+        Forgets one deleted (or replaced) video.
+
+        Args:
+            video (Video): Removed video
+        """
+        self._mark_changed()
+        if not self.built:
+            return
+        self.sketch.remove(video.time)
+        self.histogram[bisect_right(HISTOGRAM_EDGES, video.time)] -= 1
+
+    def _mark_changed(self):
+        """Removes the saved file at the first change (see the module docstring)."""
+        if not self.changed:
+            self.changed = True
+            with suppress(FileNotFoundError):
+                os.remove(self.analytics_file)
+
+    def summary(self, videos, stamp, fractions=PERCENTILES):
+        """
+        Returns the percentiles and the histogram.
+
+        Args:
+            videos (list): Video collection (read only if neither built
+                nor saved)
+            stamp (dict): Describes the collection, see load()
+            fractions (tuple): Percentiles to estimate, e.g. (0.5, 0.9)
+
+        Returns:
+            dict: count, percentiles {fraction: seconds} and histogram,
+                a list of (low, high or None, count)
+        """
+        if not self.built and (self.changed or not self.load(stamp)):
+            self.build(videos)
+        lows = (0,) + HISTOGRAM_EDGES
+        highs = HISTOGRAM_EDGES + (None,)
+        return {
+            'count': self.sketch.count,
+            'percentiles': {fraction: self.sketch.quantile(fraction) for fraction in fractions},
+            'histogram': list(zip(lows, highs, self.histogram)),
+        }
+
+    def load(self, stamp):
+        """
+        Loads the saved sketch and histogram if they describe this collection.
+
+        Args:
+            stamp (dict): e.g. {'count': 1000, 'version': 52}; the file
+                must have been saved with the same stamp
+
+        Returns:
+            bool: True if the file was loaded
+        """
+        try:
+            with open(self.analytics_file) as file:
+                data = json.load(file)
+            if (data['stamp'] != stamp or data['edges'] != list(HISTOGRAM_EDGES)
+                    or data['sketch']['relative_accuracy'] != RELATIVE_ACCURACY):
+                return False
+            self.sketch = QuantileSketch.from_dict(data['sketch'])
+            self.histogram = data['histogram']
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return False
+        self.built = True
+        return True
+
+    def save(self, stamp):
+        """
+        Saves the sketch and histogram for the next run (called on exit).
+
+        Without them in use there is nothing to save; a file that no
+        longer describes the collection was deleted at the first change.
+
+        Args:
+            stamp (dict): Describes the collection, see load()
+        """
+        if not self.built:
+            return
+        temp_file = self.analytics_file + '.tmp'
+        with open(temp_file, 'w') as file:
+            json.dump({'stamp': stamp, 'edges': list(HISTOGRAM_EDGES),
+                       'sketch': self.sketch.to_dict(), 'histogram': self.histogram}, file)
+        os.replace(temp_file, self.analytics_file)
@@ -0,0 +1,110 @@
+"""
+Running Duration Statistics for the YouTube Video Manager
+=========================================================
+Keeps total, count, longest and shortest duration up to date as videos
+are added, updated and deleted, so showing the statistics never has to
+look at the whole collection again.
+"""
+
+
+class DurationStats:
+    """
+    Running aggregates over video durations (in seconds).
+
+    Like the search index, it is filled on first use and then updated
+    incrementally. Besides the running total it keeps how many videos
+    have each distinct duration; that is what makes deleting the current
+    longest or shortest video cheap - only the distinct durations are
+    looked at, never the videos themselves.
+    """
+
+    def __init__(self):
+        self.built = False
+        self.count = 0
+        self.total = 0
+        self.duration_counts = {}
+        self._longest = None
+        self._shortest = None
+
+    def build(self, videos):
+        """
+        Computes the aggregates from the whole collection (first use only).
+
+        Args:
+            videos (list): Video collection
+        """
+        self.built = True
+        self.count = self.total = 0
+        self.duration_counts = {}
+        self._longest = self._shortest = None
+        for video in videos:
+            self.add(video)
+
+    def add(self, video):
+        """
+        Adds one video's duration to the aggregates.
+
+        Args:
+            video (Video): Added video
+        """
+        if not self.built:
+            return
+        seconds = video.time
+        self.count += 1
+        self.total += seconds
+        self.duration_counts[seconds] = self.duration_counts.get(seconds, 0) + 1
+        if self._longest is not None and seconds > self._longest:
+            self._longest = seconds
+        if self._shortest is not None and seconds < self._shortest:
+            self._shortest = seconds
+        if self.count == 1:
+            self._longest = self._shortest = seconds
+
+    def remove(self, video):
+        """
+        Removes one video's duration from the aggregates.
+
+        Args:
+            video (Video): Deleted (or replaced) video
+        """
+        if not self.built:
+            return
+        seconds = video.time
+        remaining = self.duration_counts.get(seconds, 0) - 1
+        if remaining < 0:
+            return
+        self.count -= 1
+        self.total -= seconds
+        if remaining:
+            self.duration_counts[seconds] = remaining
+        else:
+            del self.duration_counts[seconds]
+            # Recomputed from the distinct durations on the next request
+            if seconds == self._longest:
+                self._longest = None
+            if seconds == self._shortest:
+                self._shortest = None
+
+    def summary(self, videos):
+        """
+        Returns the current statistics.
+
+        Args:
+            videos (list): Video collection (used to build on first use)
+
+        Returns:
+            dict: count, total, mean, longest and shortest (in seconds)
+        """
+        if not self.built:
+            self.build(videos)
+        if self.count and self._longest is None:
+            self._longest = max(self.duration_counts)
+        if self.count and self._shortest is None:
+            self._shortest = min(self.duration_counts)
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0,
+            'longest': self._longest if self.count else 0,
+            'shortest': self._shortest if self.count else 0,
+        }
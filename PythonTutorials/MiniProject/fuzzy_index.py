@@ -0,0 +1,159 @@
+"""
+Fuzzy (Typo-Tolerant) Search Index for the YouTube Video Manager
+================================================================
+A trigram inverted index over lower-cased video names.
+
+Every name is padded ("  python ") and cut into overlapping 3-letter
+pieces: '  p', ' py', 'pyt', 'yth', 'tho', 'hon', 'on '. A name matches
+when it contains many of the query's trigrams; a typo only breaks the
+few trigrams around it. The score is the fraction of query trigrams
+found in the name, so typing part of a long title still matches; ties
+are broken by overall similarity (shared / all trigrams, as in pg_trgm),
+which prefers names close in length to the query.
+
+To avoid looking at every name, the index keeps, for each trigram, the
+set of names that contain it (the "postings"). A name that reaches the
+similarity threshold must share at least
+    needed = ceil(threshold * number of query trigrams)
+trigrams with the query, so it is sure to appear in at least one of the
+(number of query trigrams - needed + 1) *rarest* postings. Only those
+postings are read to find candidates; the remaining postings are then
+just probed (set lookups) to count each candidate's shared trigrams.
+"""
+
+import math
+from collections import Counter
+
+from video_record import same_video
+
+
+# Minimum score (0..1) for a name to count as a match
+FUZZY_THRESHOLD = 0.5
+
+
+def trigrams(text):
+    """
+    Returns the set of trigrams of a lower-cased, padded string.
+
+    Args:
+        text (str): Name or query
+
+    Returns:
+        set: 3-character strings
+    """
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Trigram index over video names, kept in sync by add/update/delete.
+
+    Like the prefix index it is built on the first fuzzy search and
+    updated incrementally afterwards.
+    """
+
+    def __init__(self):
+        self.built = False
+        self.names = {}     # lower-cased name -> videos with that name
+        self.postings = {}  # trigram -> set of lower-cased names
+
+    def build(self, videos):
+        """
+        Builds the index from the whole collection (first search only).
+
+        Args:
+            videos (list): Video collection to index
+        """
+        self.built = True
+        self.names = {}
+        self.postings = {}
+        for video in videos:
+            self.add(video)
+
+    def add(self, video):
+        """
+        Adds one video to the index.
+
+        Args:
+            video (Video): Video to index
+        """
+        if not self.built:
+            return
+        name = video.name.lower()
+        if name not in self.names:
+            self.names[name] = []
+            for trigram in trigrams(name):
+                self.postings.setdefault(trigram, set()).add(name)
+        self.names[name].append(video)
+
+    def remove(self, video):
+        """
+        Removes one video from the index.
+
+        Args:
+            video (Video): The indexed video (or a record with its ID)
+        """
+        if not self.built:
+            return
+        name = video.name.lower()
+        videos = self.names.get(name, [])
+        # By ID: several videos can share the same name and duration
+        index = next((index for index, indexed in enumerate(videos)
+                      if same_video(indexed, video)), None)
+        if index is None:
+            return
+        del videos[index]
+        if videos:
+            return
+        del self.names[name]
+        for trigram in trigrams(name):
+            names = self.postings[trigram]
+            names.discard(name)
+            if not names:
+                del self.postings[trigram]
+
+    def search(self, videos, query, limit=None, threshold=FUZZY_THRESHOLD):
+        """
+        Finds videos whose names are similar to the query, best first.
+
+        Args:
+            videos (list): Video collection (used to build the index on first use)
+            query (str): Possibly misspelled (part of a) name
+            limit (int): Maximum number of videos to return (None = all)
+            threshold (float): Minimum score between 0 and 1
+
+        Returns:
+            list: (score, Video) pairs, best match first
+        """
+        if not self.built:
+            self.build(videos)
+        query_trigrams = trigrams(query)
+        needed = max(1, math.ceil(threshold * len(query_trigrams)))
+        # Rarest postings first; a match must appear in one of the first few
+        postings = sorted((self.postings.get(trigram, ()) for trigram in query_trigrams), key=len)
+        first = len(postings) - needed + 1
+        counts = Counter()
+        for names in postings[:first]:
+            counts.update(names)
+        # The other postings are only used to count shared trigrams for the
+        # candidates; one that can no longer reach 'needed' is dropped early
+        for position in range(first, len(postings)):
+            names = postings[position]
+            remaining = len(postings) - position
+            counts = {name: count + (name in names) for name, count in counts.items()
+                      if count + remaining >= needed}
+
+        scored = []
+        for name, shared in counts.items():
+            if shared >= needed:
+                overall = shared / (len(query_trigrams) + len(trigrams(name)) - shared)
+                scored.append((shared / len(query_trigrams), overall, name))
+        scored.sort(key=lambda item: (-item[0], -item[1], item[2]))
+
+        matches = []
+        for score, _, name in scored:
+            matches.extend((score, video) for video in self.names[name])
+            if limit is not None and len(matches) >= limit:
+                return matches[:limit]
+        return matches
@@ -0,0 +1,225 @@
+"""
+Operation Metrics for the YouTube Video Manager
+===============================================
+Records, for every instrumented operation (load_data, save_data_helper,
+insert_video, ...):
+
+- how often it ran, and how often it raised an error
+- total, mean and longest time, plus p50 / p90 / p99 over the most
+  recent SAMPLE_SIZE calls
+- how many bytes the storage backend read and wrote meanwhile
+
+Turn it on with YOUTUBE_METRICS=1. When it is off, @metrics.timed hands
+back the function itself, so instrumented functions cost exactly what
+they did before - not even an extra call.
+
+Times are inclusive, like a profiler's cumulative time: the journal
+write of an add counts for insert_video's caller and for record_change.
+When operations overlap (the server), their byte counts can mix.
+
+The numbers can be shown in the menu or dumped as JSON or in the
+Prometheus text format (e.g. for node_exporter's textfile collector).
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+
+# Latency percentiles are computed over this many of the latest calls
+SAMPLE_SIZE = 1000
+
+# Prefix of every Prometheus metric name
+METRIC_PREFIX = 'youtube_manager_operation'
+
+# Percentiles reported (fraction -> name in the summary)
+PERCENTILES = ((0.50, 'p50'), (0.90, 'p90'), (0.99, 'p99'))
+
+
+def percentile(sorted_values, fraction):
+    """Returns the value below which the given fraction of samples fall."""
+    if not sorted_values:
+        return 0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class OperationStats:
+    """Counters of one operation."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.read_bytes = 0
+        self.written_bytes = 0
+        # Only the latest calls are kept, so memory stays constant
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def summary(self):
+        """
+        Returns the counters as plain numbers.
+
+        Returns:
+            dict: calls, errors, total/mean/max seconds, p50/p90/p99
+                seconds and bytes read/written
+        """
+        samples = sorted(self.samples)
+        summary = {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_seconds': self.total_seconds,
+            'mean_seconds': self.total_seconds / self.calls if self.calls else 0,
+            'max_seconds': self.max_seconds,
+        }
+        for fraction, name in PERCENTILES:
+            summary[f"{name}_seconds"] = percentile(samples, fraction)
+        summary['read_bytes'] = self.read_bytes
+        summary['written_bytes'] = self.written_bytes
+        return summary
+
+
+class Metrics:
+    """
+    Collects OperationStats for the functions decorated with timed().
+
+    Args:
+        enabled (bool): Whether timed() instruments anything at all
+        io_counter (callable): Returns the storage's byte counters, e.g.
+            {'read_bytes': 10, 'written_bytes': 20}, or {} if the
+            backend cannot count them
+    """
+
+    def __init__(self, enabled=False, io_counter=None):
+        self.enabled = enabled
+        self.io_counter = io_counter or dict
+        self.operations = {}
+        self.lock = threading.Lock()  # The server records from several threads
+
+    def timed(self, function):
+        """
+        Decorator that records every call of 'function' under its name.
+
+        Args:
+            function (callable): Function to instrument
+
+        Returns:
+            callable: The instrumented function, or 'function' itself
+                when metrics are disabled
+        """
+        if not self.enabled:
+            return function
+        name = function.__name__
+
+        @wraps(function)
+        def instrumented(*args, **kwargs):
+            io_before = self.io_counter()
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = function(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self.observe(name, time.perf_counter() - started, io_before, failed)
+
+        return instrumented
+
+    def observe(self, name, seconds, io_before=None, failed=False):
+        """
+        Records one call of an operation.
+
+        Args:
+            name (str): Operation name
+            seconds (float): How long the call took
+            io_before (dict): io_counter() from before the call
+            failed (bool): Whether the call raised an error
+        """
+        io_after = self.io_counter() if io_before else {}
+        with self.lock:
+            stats = self.operations.get(name)
+            if stats is None:
+                stats = self.operations[name] = OperationStats()
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.samples.append(seconds)
+            if io_after:
+                stats.read_bytes += io_after['read_bytes'] - io_before['read_bytes']
+                stats.written_bytes += io_after['written_bytes'] - io_before['written_bytes']
+
+    def snapshot(self):
+        """
+        Returns every operation's summary.
+
+        Returns:
+            dict: operation name -> OperationStats.summary(), by name
+        """
+        with self.lock:
+            return {name: self.operations[name].summary() for name in sorted(self.operations)}
+
+    def to_json(self):
+        """Returns the summaries as a JSON document."""
+        return json.dumps({
+            'enabled': self.enabled,
+            'io_measured': bool(self.io_counter()),
+            'sample_size': SAMPLE_SIZE,
+            'operations': self.snapshot(),
+        }, indent=2) + '\n'
+
+    def to_prometheus(self):
+        """
+        Returns the summaries in the Prometheus text exposition format.
+
+        Latency is a 'summary' (quantiles plus _sum and _count), the
+        other numbers are counters labelled by operation.
+        """
+        operations = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, key):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for operation, summary in operations.items():
+                lines.append(f'{METRIC_PREFIX}_{name}{{operation="{operation}"}} {summary[key]}')
+
+        metric('calls_total', 'counter', 'Calls per operation.', 'calls')
+        metric('errors_total', 'counter', 'Calls that raised an error.', 'errors')
+        lines.append(f"# HELP {METRIC_PREFIX}_seconds Time per call "
+                     f"(quantiles over the last {SAMPLE_SIZE} calls).")
+        lines.append(f"# TYPE {METRIC_PREFIX}_seconds summary")
+        for operation, summary in operations.items():
+            for fraction, name in PERCENTILES:
+                lines.append(f'{METRIC_PREFIX}_seconds{{operation="{operation}",'
+                             f'quantile="{fraction}"}} {summary[f"{name}_seconds"]}')
+            lines.append(f'{METRIC_PREFIX}_seconds_sum{{operation="{operation}"}} '
+                         f'{summary["total_seconds"]}')
+            lines.append(f'{METRIC_PREFIX}_seconds_count{{operation="{operation}"}} '
+                         f'{summary["calls"]}')
+        if self.io_counter():
+            metric('read_bytes_total', 'counter', 'Bytes read by the storage backend.',
+                   'read_bytes')
+            metric('written_bytes_total', 'counter', 'Bytes written by the storage backend.',
+                   'written_bytes')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        """
+        Writes the metrics to a file, atomically.
+
+        Files ending in '.prom' get the Prometheus text format, all
+        others JSON.
+
+        Args:
+            path (str): Target file
+        """
+        text = self.to_prometheus() if path.endswith('.prom') else self.to_json()
+        with open(path + '.tmp', 'w') as file:
+            file.write(text)
+        os.replace(path + '.tmp', path)
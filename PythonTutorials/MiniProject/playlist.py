@@ -0,0 +1,488 @@
+"""
+Playlist Order and Stable IDs for the YouTube Video Manager
+===========================================================
+Every video gets a stable ID when it joins the collection; the ID never
+changes, whatever happens to the videos around it, and is never given
+to another video - not even after a restart, as every backend remembers
+the largest ID it ever stored (store.last_id()). The order the menu
+shows (video 1, 2, 3 ...) is a separate, user-controlled "playlist"
+order, so videos can be moved or inserted anywhere.
+
+The storage backends keep videos in the order they were added (which
+is also ID order) and never move them. The playlist order lives in the
+videos themselves, with *fractional indexing*: a video's place is its
+order key, and by default that is simply its ID. Moving a video between
+two others gives it a key halfway between theirs - only that one video
+is rewritten, never the ones after it.
+
+Two order-statistic structures make every operation O(log n):
+- a SortedIndex over (order key, ID) turns a video number into a video
+  and back ("show item #N", move-to-position, insert-at)
+- a Fenwick tree over the IDs counts how many live videos have a smaller
+  ID, which is the video's position in the storage backend
+
+A float only has room for about 50 halvings of the same gap. When a key
+cannot be squeezed in any more, the neighbours in a small window around
+it are spread out evenly again (and written with the same change).
+
+Until some video has an explicit order key, the playlist order *is* the
+store order, so none of this is needed: reads go straight to the store
+(the first page of a listing still costs one page, not the collection)
+and a video is found by ID with a binary search over the store. The
+structures are built the first time a key is needed - a move, an
+insert-at, or a collection that already has moved videos.
+"""
+
+from collections.abc import MutableSequence
+
+from sorted_index import SortedIndex
+from video_record import Video
+
+
+# Neighbours re-spaced at first when a gap between order keys is used up
+RESPACE_WINDOW = 8
+
+
+def order_key(video):
+    """Playlist sort key: the explicit order key, or else the ID."""
+    return (video.id if video.order is None else video.order), video.id
+
+
+class LiveIds:
+    """
+    Fenwick tree over video IDs, marking which IDs are still in use.
+
+    count_below(id) is then the storage position of that video, because
+    the backends keep videos in ID order.
+    """
+
+    def __init__(self, ids):
+        size = max(ids, default=0)
+        tree = [0] * (size + 1)
+        for video_id in ids:
+            tree[video_id] = 1
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def _add(self, video_id, delta):
+        i = video_id
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def append(self, video_id):
+        """Marks a new ID (larger than every ID so far) as live."""
+        while len(self.tree) <= video_id:
+            # Extend the tree by one position, as in TombstoneList
+            i = len(self.tree)
+            value = 0
+            j = i - 1
+            stop = i - (i & -i)
+            while j > stop:
+                value += self.tree[j]
+                j -= j & -j
+            self.tree.append(value)
+        self._add(video_id, 1)
+
+    def remove(self, video_id):
+        self._add(video_id, -1)
+
+    def count_below(self, video_id):
+        """Returns the number of live IDs smaller than video_id."""
+        total = 0
+        i = video_id - 1
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class Playlist(MutableSequence):
+    """
+    The collection in playlist order, on top of a storage backend's list.
+
+    Positions (0-based here, 1-based in the menu) follow the playlist
+    order. add(), replace(), remove() and move() change the backend list
+    ('store') and return the journal record for the change, with the
+    position *in the store*, which is what the backends replay.
+
+    Like the indexes, the order structures are built on first use - that
+    first use reads the whole collection once. Until then, and as long
+    as no video has an order key ('ordered', asked from the store once),
+    the Playlist works on the store directly.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.built = False
+        self.ordered = None  # Any order keys in the store? (None = not asked yet)
+        self.next_id = None  # Worked out when the first video is added
+
+    def build(self):
+        """Reads the collection once and builds both structures."""
+        videos = list(self.store)
+        self.by_id = {video.id: video for video in videos}
+        self.live = LiveIds(self.by_id)
+        self.order = SortedIndex(order_key)
+        self.order.build(videos)
+        self.built = True
+
+    def _ensure_built(self):
+        if not self.built:
+            self.build()
+
+    def _in_store_order(self):
+        """True while the playlist order is the store order (nothing built)."""
+        if self.built:
+            return False
+        if self.ordered is None:
+            self.ordered = self.store.has_order_keys()
+        return not self.ordered
+
+    def _find_in_store(self, video_id):
+        """
+        Finds a video's store position by binary search over the IDs
+        (the store is in ID order): O(log n) reads, nothing built.
+
+        Returns:
+            int: Position in the store, or None if there is no such video
+        """
+        low, high = 0, len(self.store)
+        while low < high:
+            middle = (low + high) // 2
+            if self.store[middle].id < video_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.store) and self.store[low].id == video_id:
+            return low
+        return None
+
+    def _new_id(self):
+        """Hands out the next video ID, larger than any ever stored."""
+        if self.next_id is None:
+            last = self.store[-1].id if len(self.store) else 0
+            self.next_id = max(last, self.store.last_id()) + 1
+        video_id = self.next_id
+        self.next_id += 1
+        return video_id
+
+    def _store_position(self, position, video):
+        """Where the video at a (valid) playlist position sits in the store."""
+        if self._in_store_order():
+            return position + len(self.store) if position < 0 else position
+        return self.storage_index(video)
+
+    def _position(self, index):
+        """Validates a 0-based position (negative allowed)."""
+        self._ensure_built()
+        if index < 0:
+            index += len(self.order)
+        if not 0 <= index < len(self.order):
+            raise IndexError('video index out of range')
+        return index
+
+    def storage_index(self, video):
+        """Returns where a video sits in the backend list (O(log n))."""
+        return self.live.count_below(video.id)
+
+    def position_of(self, video_id):
+        """
+        Finds the playlist position of a video by its ID (O(log n)).
+
+        Args:
+            video_id (int): Stable video ID
+
+        Returns:
+            int: 0-based position, or None if there is no such video
+        """
+        if self._in_store_order():
+            return self._find_in_store(video_id)
+        self._ensure_built()
+        video = self.by_id.get(video_id)
+        if video is None:
+            return None
+        return self.order.rank(order_key(video))
+
+    # ------------------------------------------------------------------
+    # Changes (each returns the journal record to persist)
+    # ------------------------------------------------------------------
+
+    def add(self, video, position=None):
+        """
+        Adds a new video at a playlist position (default: the end).
+
+        Args:
+            video (Video): New video; its ID and order key are filled in
+            position (int): 0-based position to insert at
+
+        Returns:
+            dict: Journal record ('add', or a 'batch' if keys were re-spaced)
+        """
+        appending = position is None or position >= len(self.store)
+        if not (appending and self._in_store_order()):
+            # Inserting, or there are order keys already: they need the order
+            self._ensure_built()
+        video.id = self._new_id()
+        updates = []
+        if not appending:
+            video.order, updates = self._key_for(max(position, 0))
+        elif self.built:
+            # Appending: the ID works as the order key unless a video was
+            # moved to the end with a larger key
+            last = next(self.order.iterate(reverse=True), None)
+            if last is not None and order_key(last)[0] >= video.id:
+                video.order = order_key(last)[0] + 1.0
+        self.store.append(video)
+        if self.built:
+            self.live.append(video.id)
+            self.by_id[video.id] = video
+            self.order.add(video)
+        return self._record(updates, {'op': 'add', 'video': video})
+
+    def extend(self, videos):
+        """
+        Appends many new videos with a single store write (bulk imports).
+
+        IDs and order keys are handed out in one pass, exactly as add()
+        would for each video in turn, and the store gets them all in one
+        extend() - one transaction or one file write, not one per video.
+        The journal records are left to the caller, one 'add' per video.
+
+        Args:
+            videos: New videos; their IDs (and order keys) are filled in
+        """
+        videos = list(videos)
+        if not self._in_store_order():
+            self._ensure_built()
+        # Largest order key so far, see add()
+        last = next(self.order.iterate(reverse=True), None) if self.built else None
+        end = None if last is None else order_key(last)[0]
+        for video in videos:
+            video.id = self._new_id()
+            if end is not None and end >= video.id:
+                video.order = end + 1.0
+            end = order_key(video)[0]
+        self.store.extend(videos)
+        if self.built:
+            for video in videos:
+                self.live.append(video.id)
+                self.by_id[video.id] = video
+                self.order.add(video)
+
+    def replace(self, position, video):
+        """
+        Replaces the details of the video at a position (ID and place stay).
+
+        Args:
+            position (int): 0-based playlist position
+            video (Video): New details; gets the old ID and order key
+
+        Returns:
+            dict: Journal record
+        """
+        old = self[position]
+        video.id, video.order = old.id, old.order
+        index = self._store_position(position, old)
+        self.store[index] = video
+        if self.built:
+            self.by_id[video.id] = video
+            self.order.remove(old)
+            self.order.add(video)
+        return {'op': 'update', 'index': index, 'video': video}
+
+    def remove(self, position):
+        """
+        Deletes the video at a position.
+
+        Args:
+            position (int): 0-based playlist position
+
+        Returns:
+            dict: Journal record
+        """
+        old = self[position]
+        index = self._store_position(position, old)
+        del self.store[index]
+        if self.built:
+            self.live.remove(old.id)
+            del self.by_id[old.id]
+            self.order.remove(old)
+        return {'op': 'delete', 'index': index}
+
+    def move(self, position, new_position):
+        """
+        Moves a video to another position; only that video is rewritten.
+
+        Args:
+            position (int): 0-based position of the video
+            new_position (int): 0-based position it should end up at
+
+        Returns:
+            dict: Journal record ('update', or a 'batch' if keys were re-spaced)
+        """
+        self._ensure_built()
+        old = self[position]
+        self.order.remove(old)
+        new_position = min(max(new_position, 0), len(self.order))
+        order, updates = self._key_for(new_position)
+        moved = old.with_order(order)
+        index = self.storage_index(old)
+        self.store[index] = moved
+        self.by_id[moved.id] = moved
+        self.order.add(moved)
+        return self._record(updates, {'op': 'update', 'index': index, 'video': moved})
+
+    def apply(self, record):
+        """
+        Replays a change another process made (see storage changes()).
+
+        Args:
+            record (dict): Journal record, with positions in the store
+
+        Returns:
+            tuple: (removed videos, added videos), to update the indexes
+        """
+        removed, added = [], []
+        match record['op']:
+            case 'add':
+                video = Video.from_dict(record['video'])
+                self.store.append(video)
+                if self.built:
+                    self.live.append(video.id)
+                    self.by_id[video.id] = video
+                    self.order.add(video)
+                elif video.order is not None:
+                    self.ordered = True
+                if self.next_id is not None:
+                    self.next_id = max(self.next_id, video.id + 1)
+                added.append(video)
+            case 'update':
+                video = Video.from_dict(record['video'])
+                old = self.store[record['index']]
+                self.store[record['index']] = video
+                if not self.built and video.order is not None:
+                    self.ordered = True
+                if self.built:
+                    self.by_id[video.id] = video
+                    self.order.remove(old)
+                    self.order.add(video)
+                removed.append(old)
+                added.append(video)
+            case 'delete':
+                old = self.store[record['index']]
+                del self.store[record['index']]
+                if self.built:
+                    self.live.remove(old.id)
+                    del self.by_id[old.id]
+                    self.order.remove(old)
+                removed.append(old)
+            case 'batch':
+                for change in record['records']:
+                    more_removed, more_added = self.apply(change)
+                    removed += more_removed
+                    added += more_added
+        return removed, added
+
+    def reset(self, store):
+        """Switches to a freshly loaded store; the order is rebuilt on next use."""
+        self.store = store
+        self.built = False
+        self.ordered = None
+        self.next_id = None
+
+    def _record(self, updates, record):
+        """Bundles re-spacing updates and the change into one record."""
+        if not updates:
+            return record
+        return {'op': 'batch', 'records': updates + [record]}
+
+    def _key_for(self, position):
+        """
+        Returns an order key that sorts right before the video now at
+        'position' (and after the one before it).
+
+        Returns:
+            tuple: (order key, list of journal records for re-spaced videos)
+        """
+        count = len(self.order)
+        if count == 0:
+            return None, []
+        if position == 0:
+            return order_key(self[0])[0] - 1.0, []
+        if position == count:
+            return order_key(self[count - 1])[0] + 1.0, []
+        low = order_key(self[position - 1])[0]
+        high = order_key(self[position])[0]
+        middle = (low + high) / 2
+        if low < middle < high:
+            return middle, []
+        return self._respace(position)
+
+    def _respace(self, position):
+        """
+        Spreads the order keys around 'position' out evenly, leaving a
+        free key for a video at 'position'. The window doubles until the
+        keys around it leave enough room.
+        """
+        count = len(self.order)
+        window = RESPACE_WINDOW
+        while True:
+            start, stop = max(0, position - window), min(count, position + window)
+            low = order_key(self[start - 1])[0] if start else order_key(self[0])[0] - window
+            high = order_key(self[stop])[0] if stop < count else order_key(self[count - 1])[0] + window
+            # The window's videos plus the free key, evenly spaced in (low, high)
+            step = (high - low) / (stop - start + 2)
+            if step > 1e-9 * max(1.0, abs(low), abs(high)):
+                break
+            window *= 2
+        neighbours = list(self.order.iterate(start, stop))
+        keys = [low + step * slot for slot in range(1, stop - start + 2)]
+        free_key = keys.pop(position - start)
+        updates = []
+        for old, key in zip(neighbours, keys):
+            respaced = old.with_order(key)
+            index = self.storage_index(old)
+            self.store[index] = respaced
+            self.by_id[old.id] = respaced
+            self.order.remove(old)
+            self.order.add(respaced)
+            updates.append({'op': 'update', 'index': index, 'video': respaced})
+        return free_key, updates
+
+    # ------------------------------------------------------------------
+    # List interface (positions in playlist order)
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, index):
+        if self._in_store_order():
+            return self.store[index]
+        if isinstance(index, slice):
+            self._ensure_built()
+            return self.order.view(self.store)[index]
+        index = self._position(index)
+        return next(self.order.iterate(index, index + 1))
+
+    def __setitem__(self, index, video):
+        self.replace(index, video)
+
+    def __delitem__(self, index):
+        self.remove(index)
+
+    def __iter__(self):
+        if self._in_store_order():
+            return iter(self.store)
+        self._ensure_built()
+        return self.order.iterate()
+
+    def insert(self, index, video):
+        self.add(video, index)
+
+    def append(self, video):
+        self.add(video)
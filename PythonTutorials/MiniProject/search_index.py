@@ -0,0 +1,122 @@
+"""
+Prefix Search Index for the YouTube Video Manager
+=================================================
+A trie (prefix tree) over lower-cased video names. Each node stores its
+child nodes by character; the node at the end of a name keeps the videos
+with exactly that name.
+
+Finding all names that start with a prefix means walking down the
+prefix (one step per character) and then collecting the subtree below,
+so the cost depends on the matches, not on the size of the collection.
+"""
+
+from video_record import same_video
+
+
+class TrieNode:
+    """One node of the trie. __slots__ keeps each node small."""
+
+    __slots__ = ('children', 'videos')
+
+    def __init__(self):
+        self.children = {}
+        self.videos = []
+
+
+class PrefixIndex:
+    """
+    Prefix index over video names, kept in sync by add/update/delete.
+
+    The index is built lazily the first time a search runs, so startup
+    never pays for it. Before that, add() and remove() are no-ops; after
+    that they update the trie incrementally.
+    """
+
+    def __init__(self):
+        self.root = TrieNode()
+        self.built = False
+
+    def build(self, videos):
+        """
+        Builds the index from the whole collection (first search only).
+
+        Args:
+            videos (list): Video collection to index
+        """
+        self.root = TrieNode()
+        self.built = True
+        for video in videos:
+            self.add(video)
+
+    def add(self, video):
+        """
+        Adds one video to the index.
+
+        Args:
+            video (Video): Video to index
+        """
+        if not self.built:
+            return
+        node = self.root
+        for char in video.name.lower():
+            node = node.children.setdefault(char, TrieNode())
+        node.videos.append(video)
+
+    def remove(self, video):
+        """
+        Removes one video from the index and prunes empty branches.
+
+        Args:
+            video (Video): The indexed video (or a record with its ID)
+        """
+        if not self.built:
+            return
+        path = [self.root]
+        for char in video.name.lower():
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+        # By ID: several videos can share the same name and duration
+        videos = path[-1].videos
+        for index, indexed in enumerate(videos):
+            if same_video(indexed, video):
+                del videos[index]
+                break
+        # Drop nodes that no longer lead to any video
+        name = video.name.lower()
+        for depth in range(len(name), 0, -1):
+            node = path[depth]
+            if node.videos or node.children:
+                break
+            del path[depth - 1].children[name[depth - 1]]
+
+    def search(self, videos, prefix, limit=None):
+        """
+        Finds videos whose name starts with the prefix (case-insensitive).
+
+        Args:
+            videos (list): Video collection (used to build the index on first use)
+            prefix (str): Beginning of the video name
+            limit (int): Stop after this many matches (None = all)
+
+        Returns:
+            list: Matching videos, in alphabetical order of name
+        """
+        if not self.built:
+            self.build(videos)
+        node = self.root
+        for char in prefix.lower():
+            node = node.children.get(char)
+            if node is None:
+                return []
+        matches = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            matches.extend(node.videos)
+            if limit is not None and len(matches) >= limit:
+                return matches[:limit]
+            # Reversed so that children are visited in alphabetical order
+            stack.extend(node.children[char] for char in sorted(node.children, reverse=True))
+        return matches
@@ -0,0 +1,388 @@
+"""
+Segmented Storage for the YouTube Video Manager
+===============================================
+An optional storage backend that splits the collection into segment
+files by video ID range:
+
+    youtube.segments/segment-000000.dat   IDs 1 .. 10000
+    youtube.segments/segment-000001.dat   IDs 10001 .. 20000
+    ...
+
+Every segment is a small snapshot in one of the serializers.py formats.
+The store keeps videos in ID order (playlist.py turns that into the
+menu order), so the collection is simply the segments one after
+another: a new video, which always has the highest ID so far, goes to
+the end of the last segment or starts the next one, and deleting a
+video never moves any other video to a different segment.
+
+- A write only rewrites the one segment it changed (atomically), never
+  the whole collection.
+- Loading parses the segments in parallel, one per worker process
+  (ProcessPoolExecutor), so startup is no longer limited to one core.
+  The workers send back plain columns and every Video is created once,
+  in the main process. With a single CPU the segments are read in
+  order instead, which saves starting the workers.
+- Deleted IDs leave segments smaller than SEGMENT_SIZE (or empty);
+  that is fine, as a segment is found by position, not by size.
+  save() writes the collection out again, one file per ID range.
+
+Segment files are read in file name order and numbers may be skipped,
+e.g. when a whole ID range was deleted. A small 'last-id' file next to
+them keeps the largest video ID ever stored once that video has been
+deleted, so its ID is never given out again.
+"""
+
+import os
+from bisect import bisect_right
+from collections.abc import MutableSequence
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+from serializers import check_format, read_columns, write_snapshot
+from video_record import MIGRATE_FIX, Video, check_parsed
+
+
+SEGMENT_DIR = 'youtube.segments'
+
+# Maximum number of videos per segment (deletes can make segments smaller)
+SEGMENT_SIZE = 10000
+
+# Holds the largest video ID ever stored, inside the segment directory
+LAST_ID_FILE = 'last-id'
+
+
+def segment_path(directory, number):
+    """Returns the file name of segment number N."""
+    return os.path.join(directory, f"segment-{number:06d}.dat")
+
+
+def segment_numbers(directory):
+    """Returns the numbers of the segment files in a directory, in order."""
+    numbers = []
+    for name in os.listdir(directory):
+        if name.startswith('segment-') and name.endswith('.dat'):
+            numbers.append(int(name[len('segment-'):-len('.dat')]))
+    return sorted(numbers)
+
+
+def segment_of(video, segment_size):
+    """Returns the number of the segment a video's ID belongs in."""
+    return (video.id - 1) // segment_size
+
+
+def load_segment(path):
+    """
+    Parses one segment file (runs in a worker process).
+
+    The fields are read straight into plain lists (see
+    serializers.read_columns), without creating any Video: the lists are
+    much cheaper to pass between processes, and the main process has to
+    create the Videos anyway.
+
+    Args:
+        path (str): Segment file
+
+    Returns:
+        tuple: Lists of names, durations, IDs and order keys
+    """
+    with open(path, 'rb') as file:
+        return read_columns(file)
+
+
+class SegmentedVideoList(MutableSequence):
+    """
+    List-like view over the loaded segments.
+
+    'numbers' holds the file number of every segment and 'starts' the
+    position of its first video, so a position is found with a binary
+    search over the segments. Every change remembers which segment it
+    touched in 'dirty' (an index into 'segments'); the storage writes
+    exactly those segments when the change is recorded. 'highest_id' is
+    the largest video ID ever stored, deleted or not.
+    """
+
+    def __init__(self, segments, numbers, segment_size=SEGMENT_SIZE, last_id=0):
+        self.segments = segments
+        self.numbers = numbers
+        self.segment_size = segment_size
+        self.dirty = set()
+        self._index_segments()
+        self.highest_id = max(last_id, max((video.id or 0 for video in self), default=0))
+
+    def _index_segments(self):
+        """Recomputes the start position of every segment."""
+        self.starts = []
+        self.length = 0
+        for segment in self.segments:
+            self.starts.append(self.length)
+            self.length += len(segment)
+
+    def _locate(self, index):
+        """Converts a list position (negative allowed) into (segment, offset)."""
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('video index out of range')
+        number = bisect_right(self.starts, index) - 1
+        return number, index - self.starts[number]
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if start >= stop:
+                return []
+            # Start in the right segment instead of walking from the first
+            number, offset = self._locate(start)
+            rest = chain(self.segments[number][offset:], *self.segments[number + 1:])
+            return list(islice(rest, stop - start))
+        number, offset = self._locate(index)
+        return self.segments[number][offset]
+
+    def __setitem__(self, index, video):
+        number, offset = self._locate(index)
+        self.segments[number][offset] = video
+        self.dirty.add(number)
+
+    def __delitem__(self, index):
+        number, offset = self._locate(index)
+        del self.segments[number][offset]
+        self.dirty.add(number)
+        # Only the start positions after this segment move
+        for later in range(number + 1, len(self.starts)):
+            self.starts[later] -= 1
+        self.length -= 1
+
+    def __iter__(self):
+        return chain.from_iterable(self.segments)
+
+    def append(self, video):
+        self.extend([video])
+
+    def extend(self, videos):
+        for video in videos:
+            # A video past the last segment's ID range starts a new
+            # segment; anything else (e.g. no ID yet) joins the last one
+            number = -1 if video.id is None else segment_of(video, self.segment_size)
+            if not self.segments or number > self.numbers[-1]:
+                self.segments.append([])
+                self.numbers.append(max(number, 0))
+                self.starts.append(self.length)
+            self.segments[-1].append(video)
+            self.dirty.add(len(self.segments) - 1)
+            self.length += 1
+            self.highest_id = max(self.highest_id, video.id or 0)
+
+    def insert(self, index, video):
+        if index >= self.length:
+            self.append(video)
+            return
+        number, offset = self._locate(max(index, -self.length))
+        # Stays next to its neighbours whatever its ID; save() puts it
+        # in the file of its ID range
+        self.segments[number].insert(offset, video)
+        self.dirty.add(number)
+        for later in range(number + 1, len(self.starts)):
+            self.starts[later] += 1
+        self.length += 1
+        self.highest_id = max(self.highest_id, video.id or 0)
+
+    def last_id(self):
+        """Returns the largest video ID ever stored, even if deleted since."""
+        return self.highest_id
+
+    def has_order_keys(self):
+        """Tells whether any video has an explicit order key."""
+        return any(video.order is not None for video in self)
+
+
+class SegmentedStorage:
+    """
+    Stores the collection as numbered segment files.
+
+    Edits are kept in memory by SegmentedVideoList; record() then writes
+    only the segments they touched. save() re-splits the whole
+    collection by ID range (compaction).
+    """
+
+    def __init__(self, directory=SEGMENT_DIR, snapshot_format='json',
+                 segment_size=SEGMENT_SIZE, migrate_from=None):
+        check_format(snapshot_format)
+        self.directory = directory
+        self.snapshot_format = snapshot_format
+        self.segment_size = segment_size
+        # JSON storage to import from the first time the segments are created
+        self.migrate_from = migrate_from
+        # Largest video ID in the last-id file (0 = no file)
+        self.saved_last_id = 0
+        # Bytes of segment files read and written, see io_stats()
+        self.read_bytes = 0
+        self.written_bytes = 0
+
+    def load(self):
+        """
+        Parses all segments, in parallel when there is more than one
+        (and more than one CPU).
+
+        Returns:
+            SegmentedVideoList: The collection, in segment order
+        """
+        if not os.path.isdir(self.directory) and self.migrate_from is not None:
+            videos = self.migrate_from.load()
+            check_parsed(videos, f"migrate {self.migrate_from.data_file}", MIGRATE_FIX)
+            self.save(videos)
+            print(f"Migrated {len(videos)} videos from {self.migrate_from.data_file}")
+        numbers = segment_numbers(self.directory) if os.path.isdir(self.directory) else []
+        paths = [segment_path(self.directory, number) for number in numbers]
+        self.read_bytes += sum(os.path.getsize(path) for path in paths)
+        if len(paths) > 1 and (os.cpu_count() or 1) > 1:
+            # map() returns the results in segment order, whatever order
+            # the workers finish in, so the numbering stays the same
+            with ProcessPoolExecutor() as pool:
+                results = list(pool.map(load_segment, paths))
+        else:
+            results = [load_segment(path) for path in paths]
+        segments = [list(map(Video, *fields)) for fields in results]
+        try:
+            with open(os.path.join(self.directory, LAST_ID_FILE)) as file:
+                self.saved_last_id = int(file.read())
+        except (FileNotFoundError, ValueError):
+            self.saved_last_id = 0
+        videos = SegmentedVideoList(segments, numbers, self.segment_size, self.saved_last_id)
+        if any(video.id is None for video in videos):
+            # Written before videos had IDs: number them by position, once
+            for number, video in enumerate(videos, start=1):
+                video.id = number
+            self.save(videos)
+        return videos
+
+    def write_segment(self, number, videos):
+        """
+        Atomically replaces one segment file.
+
+        Args:
+            number (int): Segment number
+            videos (list): Videos of that segment
+        """
+        # Imported here: storage.py imports this module
+        from storage import fsync_directory
+
+        path = segment_path(self.directory, number)
+        with open(path + '.tmp', 'wb') as file:
+            write_snapshot(videos, file, self.snapshot_format)
+            file.flush()
+            os.fsync(file.fileno())
+            self.written_bytes += file.tell()
+        os.replace(path + '.tmp', path)
+        fsync_directory(path)
+
+    def write_last_id(self, last_id):
+        """
+        Atomically replaces the last-id file.
+
+        Args:
+            last_id (int): Largest video ID ever stored
+        """
+        from storage import fsync_directory
+
+        path = os.path.join(self.directory, LAST_ID_FILE)
+        with open(path + '.tmp', 'w') as file:
+            file.write(str(last_id))
+            file.flush()
+            os.fsync(file.fileno())
+            self.written_bytes += file.tell()
+        os.replace(path + '.tmp', path)
+        fsync_directory(path)
+        self.saved_last_id = last_id
+
+    def save(self, videos):
+        """
+        Re-splits the collection by ID range and writes every segment.
+
+        The videos stay in the order given: a new segment starts where
+        the ID range goes up (the whole collection is one segment if the
+        videos have no IDs yet).
+
+        Args:
+            videos (list): Video collection to write
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        segments = []
+        numbers = []
+        for video in videos:
+            number = -1 if video.id is None else segment_of(video, self.segment_size)
+            if not segments or number > numbers[-1]:
+                segments.append([])
+                numbers.append(max(number, 0))
+            segments[-1].append(video)
+        for number, segment in zip(numbers, segments):
+            self.write_segment(number, segment)
+        stored = max((video.id or 0 for video in chain.from_iterable(segments)), default=0)
+        if videos.last_id() > max(stored, self.saved_last_id):
+            self.write_last_id(videos.last_id())
+        # Remove segments of ID ranges that are now empty
+        for number in set(segment_numbers(self.directory)) - set(numbers):
+            os.remove(segment_path(self.directory, number))
+        if isinstance(videos, SegmentedVideoList):
+            # Keep the list's segments in line with the files just written
+            videos.segments = segments
+            videos.numbers = numbers
+            videos.dirty.clear()
+            videos._index_segments()
+            videos.highest_id = max(videos.highest_id, stored)
+
+    def record(self, videos, record):
+        """
+        Writes the segments changed since the last record.
+
+        Args:
+            videos (SegmentedVideoList): Collection (already modified)
+            record (dict): Journal record describing the change (unused,
+                the list knows which segments it changed)
+        """
+        # The largest ID only has to be written down once its video is
+        # gone (it is the last one, as the store is in ID order), and
+        # before the segment without it, so a crash cannot lose it
+        stored = videos[-1].id if len(videos) else 0
+        if videos.highest_id > max(stored or 0, self.saved_last_id):
+            self.write_last_id(videos.highest_id)
+        for index in sorted(videos.dirty):
+            self.write_segment(videos.numbers[index], videos.segments[index])
+        videos.dirty.clear()
+
+    def record_batch(self, videos, records):
+        """Writes every segment changed by the batch, each only once."""
+        self.record(videos, None)
+
+    def flush(self):
+        """Nothing to do - record() writes the segments right away."""
+
+    def commit_stats(self):
+        """Segment writes are not batched, so there is nothing to report."""
+        return {}
+
+    def io_stats(self):
+        """
+        Returns how many bytes of segment files were read and written.
+
+        Returns:
+            dict: read_bytes, written_bytes
+        """
+        return {'read_bytes': self.read_bytes, 'written_bytes': self.written_bytes}
+
+    def locked(self):
+        """Only one process at a time should use these files (no lock)."""
+        return nullcontext()
+
+    def has_changes(self):
+        """Other processes' edits are not tracked for this backend."""
+        return False
+
+    def changes(self):
+        """Nothing to merge, see has_changes()."""
+        return []
@@ -0,0 +1,320 @@
+"""
+Snapshot Serializers for the YouTube Video Manager
+==================================================
+The JSON backend keeps the full collection in one snapshot file
+(youtube.txt). This module decides how that file is encoded.
+
+Available formats:
+- 'json'    : compact JSON array of {"name": ..., "time": ...} objects
+              (the default; human-readable and parsed as a stream)
+- 'marshal' : stdlib marshal, the fastest to load and save
+- 'pickle'  : pickle protocol 5
+- any of the above with '+gzip' or '+lzma', e.g. 'json+gzip' or
+  'marshal+lzma', for a smaller file at the cost of extra CPU time
+
+marshal and pickle store the collection as columns - lists of names,
+durations, IDs and order keys - instead of one object per video, which
+is what makes them fast: the C code only has to handle plain strings
+and numbers. Files with only the first two columns still load.
+read_columns() reads a snapshot of any format into such columns
+without creating a Video at all.
+
+Plain JSON files are written without a header, so youtube.txt stays an
+ordinary JSON array. Every other format starts with a one-line header,
+b'YTVS <format>\\n', so load() can tell the format from the file itself;
+changing SNAPSHOT_FORMAT never makes an existing snapshot unreadable.
+
+Note: unpickling can run arbitrary code - only load snapshots you wrote
+yourself.
+"""
+
+import gzip
+import io
+import json
+import lzma
+import marshal
+import pickle
+import sys
+
+from video_record import UnparsedVideo, Video
+
+
+# Header in front of every snapshot that is not plain JSON
+MAGIC = b'YTVS'
+
+# How many characters the streaming JSON loader reads at a time, and how
+# many videos the JSON writer encodes in one go.
+READ_CHUNK_SIZE = 64 * 1024
+ENCODE_BATCH_SIZE = 1000
+
+
+# ============================================================================
+# JSON
+# ============================================================================
+
+def iter_json_array(file, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yields the items of a JSON array one at a time.
+
+    Reads the file in chunks and decodes each item with
+    JSONDecoder.raw_decode(), so only the current chunk is held as text
+    and the first video is available long before the file is fully read.
+
+    Args:
+        file: Open text file containing a JSON array
+        chunk_size (int): Number of characters to read at a time
+
+    Yields:
+        dict: One video dictionary per array item
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+    expect_open = True
+    while True:
+        # Skip whitespace and the commas between items
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError(f"{file.name} ends before the closing ']'")
+            chunk = file.read(chunk_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        if expect_open:
+            if buffer[pos] != '[':
+                raise ValueError(f"{file.name} does not contain a JSON array")
+            pos += 1
+            expect_open = False
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = len(buffer)
+        if end == len(buffer) and not eof:
+            # The item may continue in the next chunk - read more and retry
+            chunk = file.read(chunk_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        yield item
+        pos = end
+
+
+def dump_json(videos, file):
+    """
+    Writes the videos as one compact JSON array.
+
+    Encoded in slices so the C encoder does the work without building
+    one huge string; the output matches a single json.dumps() call.
+    """
+    for start in range(0, max(len(videos), 1), ENCODE_BATCH_SIZE):
+        text = json.dumps(videos[start:start + ENCODE_BATCH_SIZE],
+                          default=Video.to_dict, separators=(',', ':'))
+        if start:
+            text = ',' + text[1:]
+        if start + ENCODE_BATCH_SIZE < len(videos):
+            text = text[:-1]
+        file.write(text.encode('utf-8'))
+
+
+def load_json(file):
+    """
+    Yields the videos of a JSON array while it is being read.
+
+    Files written by the first versions of the app can hold durations
+    as free text ('1.5 hours') that parse_duration() does not accept.
+    Such a video is shown with a duration of 0:00, but keeps the stored
+    text (see video_record.UnparsedVideo), and a warning says so; one
+    old record cannot stop the app from starting.
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8')
+    for data in iter_json_array(text):
+        video = Video.from_dict(data)
+        if type(video) is UnparsedVideo:
+            print(f"Warning: video '{video.name}' has a duration that could not be read "
+                  f"({video.raw_time!r}); it shows as 0:00 and is kept as it is until "
+                  f"you update it", file=sys.stderr)
+        yield video
+
+
+def load_json_columns(file):
+    """Reads a JSON array straight into columns, without creating Videos."""
+    text = io.TextIOWrapper(file, encoding='utf-8')
+    names, times, ids, orders = [], [], [], []
+    for data in iter_json_array(text):
+        names.append(data['name'])
+        times.append(data['time'])
+        ids.append(data.get('id'))
+        orders.append(data.get('order'))
+    return names, times, ids, orders
+
+
+# ============================================================================
+# MARSHAL / PICKLE (columns: names, durations, IDs, order keys)
+# ============================================================================
+
+def columns(videos):
+    """Splits the videos into lists of names, durations, IDs and order keys."""
+    return ([video.name for video in videos], [video.time for video in videos],
+            [video.id for video in videos], [video.order for video in videos])
+
+
+def dump_marshal(videos, file):
+    file.write(marshal.dumps(columns(videos)))
+
+
+def load_marshal_columns(file):
+    # Older snapshots have only the names and durations columns
+    return marshal.loads(file.read())
+
+
+def load_marshal(file):
+    return map(Video, *load_marshal_columns(file))
+
+
+def dump_pickle(videos, file):
+    pickle.dump(columns(videos), file, protocol=5)
+
+
+def load_pickle_columns(file):
+    return pickle.load(file)
+
+
+def load_pickle(file):
+    return map(Video, *load_pickle_columns(file))
+
+
+SERIALIZERS = {
+    'json': (dump_json, load_json),
+    'marshal': (dump_marshal, load_marshal),
+    'pickle': (dump_pickle, load_pickle),
+}
+
+# Same formats, read as columns instead of Videos (see read_columns)
+COLUMN_LOADERS = {
+    'json': load_json_columns,
+    'marshal': load_marshal_columns,
+    'pickle': load_pickle_columns,
+}
+
+# Wrap the snapshot in a compressed stream: function(file, mode) -> file
+COMPRESSORS = {
+    'gzip': lambda file, mode: gzip.GzipFile(fileobj=file, mode=mode, compresslevel=6),
+    'lzma': lambda file, mode: lzma.LZMAFile(file, mode),
+}
+
+SNAPSHOT_FORMATS = tuple(SERIALIZERS) + tuple(
+    f"{serializer}+{compressor}" for serializer in SERIALIZERS for compressor in COMPRESSORS)
+
+
+def check_format(fmt):
+    """
+    Splits a format name like 'json+gzip' into its two parts.
+
+    Args:
+        fmt (str): One of SNAPSHOT_FORMATS
+
+    Returns:
+        tuple: (serializer name, compressor name or None)
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if fmt not in SNAPSHOT_FORMATS:
+        raise ValueError(f"Unknown snapshot format '{fmt}', "
+                         f"choose one of: {', '.join(SNAPSHOT_FORMATS)}")
+    serializer, _, compressor = fmt.partition('+')
+    return serializer, compressor or None
+
+
+def write_snapshot(videos, file, fmt='json'):
+    """
+    Writes the whole collection in the given format.
+
+    Args:
+        videos (list): List of Video records
+        file: Binary file (anything with a write() method)
+        fmt (str): One of SNAPSHOT_FORMATS
+    """
+    serializer, compressor = check_format(fmt)
+    dump = SERIALIZERS[serializer][0]
+    if fmt != 'json':
+        file.write(MAGIC + b' ' + fmt.encode('ascii') + b'\n')
+    if compressor is None:
+        dump(videos, file)
+        return
+    with COMPRESSORS[compressor](file, 'wb') as stream:
+        dump(videos, stream)
+
+
+def snapshot_format(file):
+    """
+    Tells which format a snapshot is in, from its header.
+
+    Args:
+        file: Binary file opened at the start of the snapshot; it is left
+            just after the header (or somewhere in the JSON)
+
+    Returns:
+        str: One of SNAPSHOT_FORMATS ('json' when there is no header)
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        return 'json'
+    return file.readline().strip().decode('ascii')
+
+
+def open_snapshot(file):
+    """
+    Reads the header of a snapshot and opens its data for reading.
+
+    Args:
+        file: Binary file opened at the start of the snapshot
+
+    Returns:
+        tuple: (serializer name, binary stream at the start of the data,
+            decompressed if needed)
+    """
+    fmt = snapshot_format(file)
+    if fmt == 'json':
+        # No header: a plain JSON array
+        file.seek(0)
+        return 'json', file
+    serializer, compressor = check_format(fmt)
+    if compressor is None:
+        return serializer, file
+    return serializer, COMPRESSORS[compressor](file, 'rb')
+
+
+def read_snapshot(file):
+    """
+    Reads a snapshot, detecting its format from the header.
+
+    Args:
+        file: Binary file opened at the start of the snapshot
+
+    Returns:
+        Iterable of Video records (JSON is decoded while it is iterated)
+    """
+    serializer, stream = open_snapshot(file)
+    return SERIALIZERS[serializer][1](stream)
+
+
+def read_columns(file):
+    """
+    Reads a snapshot as columns - lists of names, durations, IDs and
+    order keys (older marshal/pickle files: names and durations only).
+
+    No Video is created, which makes this the cheap way to read a
+    snapshot in another process and send the result back.
+
+    Args:
+        file: Binary file opened at the start of the snapshot
+
+    Returns:
+        tuple: The columns, ready for map(Video, *columns)
+    """
+    serializer, stream = open_snapshot(file)
+    return COLUMN_LOADERS[serializer](stream)
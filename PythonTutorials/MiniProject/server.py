@@ -0,0 +1,269 @@
+"""
+JSON API Server for the YouTube Video Manager
+=============================================
+Serves the video collection to many clients at once over a local TCP
+socket, using asyncio. The protocol is line-delimited JSON: every request
+is one JSON object on its own line, and so is every response.
+
+Requests ('number' is the 1-based video number, as in the menu; update,
+delete and move also accept a stable "id" instead of a "number"):
+    {"op": "list", "page": 1, "page_size": 20}
+    {"op": "search", "prefix": "pyth", "limit": 50}
+    {"op": "fuzzy", "query": "pyhton", "limit": 50}
+    {"op": "stats"}
+    {"op": "analytics"}
+    {"op": "metrics"}
+    {"op": "add", "name": "Intro", "time": "5:30"}
+    {"op": "update", "number": 3, "name": "Intro", "time": "5:30"}
+    {"op": "delete", "number": 3}
+    {"op": "delete", "id": 17}
+    {"op": "move", "number": 3, "to": 1}
+
+Responses look like {"ok": true, ...} or {"ok": false, "error": "..."}.
+
+All clients share one in-memory collection. Reads are answered straight
+away by the event loop, so many of them run concurrently. Writes take a
+lock, so they are applied one at a time in the order they arrive; the
+disk write then happens in a worker thread, so reads keep being served
+while a write is being persisted. Edits made meanwhile by other copies
+of the app (e.g. the menu) are merged in before every request. Waiting
+for the storage lock another copy holds, and reading its edits, also
+happen in a worker thread; only applying them runs on the event loop.
+
+Start it with:
+    python youtube_manager.py serve --port 8765
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from video_record import Video
+from youtube_manager import (PAGE_SIZE, SEARCH_LIMIT, apply_changes, check_duplicate,
+                             collection_stamp, duration_analytics, duration_stats,
+                             flush_data, fuzzy_index, insert_video, load_data, load_store,
+                             metrics, move_video, name_index, record_change, reload_data,
+                             remove_video, replace_video, storage)
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Largest page a client may ask for in one request
+MAX_PAGE_SIZE = 1000
+
+
+class VideoServer:
+    """Handles client connections for one shared video collection."""
+
+    def __init__(self, videos):
+        self.videos = videos
+        self.write_lock = asyncio.Lock()
+
+    async def handle_client(self, reader, writer):
+        """
+        Answers requests from one connection until the client disconnects.
+
+        Args:
+            reader (asyncio.StreamReader): Incoming request lines
+            writer (asyncio.StreamWriter): Outgoing response lines
+        """
+        try:
+            while line := await reader.readline():
+                try:
+                    response = await self.dispatch(json.loads(line))
+                except (ValueError, KeyError, TypeError) as error:
+                    response = {'ok': False, 'error': str(error)}
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request):
+        """
+        Runs one request and builds its response.
+
+        Args:
+            request: Decoded request line (anything but an object is refused)
+
+        Returns:
+            dict: Response to send back
+        """
+        if not isinstance(request, dict):
+            raise TypeError('A request must be a JSON object')
+        if not self.write_lock.locked():
+            # A write in progress merges other processes' edits itself
+            await self.sync()
+        match request.get('op'):
+            case 'list':
+                return self.list_page(int(request.get('page', 1)),
+                                      int(request.get('page_size', PAGE_SIZE)))
+            case 'search':
+                limit = min(int(request.get('limit', SEARCH_LIMIT)), MAX_PAGE_SIZE)
+                matches = name_index.search(self.videos, request['prefix'], limit=limit)
+                return {'ok': True, 'videos': [video.to_dict() for video in matches]}
+            case 'fuzzy':
+                limit = min(int(request.get('limit', SEARCH_LIMIT)), MAX_PAGE_SIZE)
+                matches = fuzzy_index.search(self.videos, request['query'], limit=limit)
+                return {'ok': True, 'videos': [{**video.to_dict(), 'similarity': similarity}
+                                               for similarity, video in matches]}
+            case 'stats':
+                return {'ok': True, **duration_stats.summary(self.videos)}
+            case 'analytics':
+                summary = duration_analytics.summary(self.videos, collection_stamp(self.videos))
+                return {'ok': True, 'count': summary['count'],
+                        'percentiles': {f"p{fraction * 100:g}": round(seconds) for fraction, seconds
+                                        in summary['percentiles'].items()},
+                        'histogram': [{'low': low, 'high': high, 'count': count}
+                                      for low, high, count in summary['histogram']]}
+            case 'metrics':
+                return {'ok': True, 'enabled': metrics.enabled,
+                        'operations': metrics.snapshot()}
+            case 'add':
+                video = Video(request['name'], request['time'])
+                response = await self.write(lambda: self.add(video))
+                return {**response, 'number': response['total'], 'id': video.id}
+            case 'update':
+                video = Video(request['name'], request['time'])
+                return await self.write(
+                    lambda index: replace_video(self.videos, index, video), request)
+            case 'delete':
+                return await self.write(
+                    lambda index: remove_video(self.videos, index), request)
+            case 'move':
+                target = int(request['to'])
+                if not 1 <= target <= len(self.videos):
+                    raise ValueError('Invalid target number')
+                return await self.write(
+                    lambda index: move_video(self.videos, index, target - 1), request)
+            case op:
+                raise ValueError(f"Unknown op {op!r}")
+
+    async def sync(self):
+        """Merges other processes' edits, like sync_data() in the menu."""
+        if storage.has_changes():
+            async with self.write_lock, self.storage_lock():
+                await self.merge()
+
+    @asynccontextmanager
+    async def storage_lock(self):
+        """
+        Holds the cross-process storage lock without blocking the event loop.
+
+        Another process may hold the lock for a while (e.g. during a
+        compaction), so the wait happens in a worker thread.
+        """
+        lock = storage.locked()
+        await asyncio.to_thread(lock.__enter__)
+        try:
+            yield
+        finally:
+            lock.__exit__(None, None, None)
+
+    async def merge(self):
+        """
+        Applies other processes' edits (storage lock held, see merge_changes()).
+
+        Reading them, or the whole collection if it has to be loaded
+        again, runs in a worker thread; the collection itself is only
+        changed on the event loop, so reads never see half of a change.
+        """
+        records = await asyncio.to_thread(storage.changes)
+        if records is None:
+            reload_data(self.videos, await asyncio.to_thread(load_store))
+        else:
+            apply_changes(self.videos, records)
+
+    def add(self, video):
+        """Adds a video unless dedup mode finds it is already there."""
+        check_duplicate(self.videos, video)
+        return insert_video(self.videos, video)
+
+    def list_page(self, page, page_size):
+        """Returns one page of the numbered list."""
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        start = (max(page, 1) - 1) * page_size
+        rows = self.videos[start:start + page_size]
+        return {
+            'ok': True,
+            'total': len(self.videos),
+            'page': page,
+            'videos': [{'number': number, **video.to_dict()}
+                       for number, video in enumerate(rows, start=start + 1)],
+        }
+
+    async def write(self, change, request=None):
+        """
+        Applies one change under the write lock and persists it.
+
+        The in-memory change happens on the event loop; the disk write
+        runs in a worker thread, so readers are not blocked by it. The
+        storage lock keeps other processes out until it is written (and
+        is waited for in a worker thread too).
+
+        Args:
+            change: Function doing the change; gets the 0-based index
+                when a request with a video 'number' or 'id' is given
+            request (dict): Request holding the 1-based 'number' or the
+                video 'id', if any
+
+        Returns:
+            dict: Response to send back, with the new number of videos
+        """
+        async with self.write_lock, self.storage_lock():
+            await self.merge()
+            if request is None:
+                record = change()
+            elif 'id' in request:
+                # Looked up inside the lock, so no other write can move it
+                index = self.videos.position_of(int(request['id']))
+                if index is None:
+                    return {'ok': False, 'error': 'Unknown video id'}
+                record = change(index)
+            else:
+                number = int(request['number'])
+                # Validated inside the lock, so no other write can move it
+                if not 1 <= number <= len(self.videos):
+                    return {'ok': False, 'error': 'Invalid video number'}
+                record = change(number - 1)
+            total = len(self.videos)
+            await asyncio.to_thread(record_change, self.videos, record)
+        return {'ok': True, 'total': total}
+
+
+async def run_server(host=DEFAULT_HOST, port=DEFAULT_PORT, videos=None, ready=None):
+    """
+    Loads the collection and serves it until cancelled.
+
+    Args:
+        host (str): Address to listen on (local only by default)
+        port (int): TCP port (0 picks a free one)
+        videos (list): Collection to serve (default: load_data())
+        ready (asyncio.Future): Receives the bound port once listening
+    """
+    if videos is None:
+        videos = load_data()
+    # Finish loading (and ordering) before accepting clients, so no
+    # request has to wait
+    await asyncio.to_thread(videos.build)
+    server = await asyncio.start_server(VideoServer(videos).handle_client, host, port)
+    bound_port = server.sockets[0].getsockname()[1]
+    if ready is not None:
+        ready.set_result(bound_port)
+    else:
+        print(f"YouTube Manager API listening on {host}:{bound_port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        flush_data(videos)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Runs the server until Ctrl+C, then flushes pending edits."""
+    try:
+        asyncio.run(run_server(host, port))
+    except KeyboardInterrupt:
+        pass
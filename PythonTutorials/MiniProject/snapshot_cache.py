@@ -0,0 +1,131 @@
+"""
+Startup Snapshot Cache for the YouTube Video Manager
+====================================================
+Parsing a large JSON youtube.txt is the slowest part of starting the
+app, and most of the time the file has not changed since the last run.
+The cache keeps a second copy of the snapshot next to it, in the fast
+marshal column format (see serializers.py):
+
+    youtube.txt.cache   b'YTV2 {"mtime_ns": ..., "size": ..., "crc32": ...}\\n'
+                        followed by marshal.dumps(columns(videos))
+
+The header describes the youtube.txt the cache was made from. On startup
+the cache is only used if youtube.txt still has that modification time,
+size and CRC32 - any edit, replacement or copy of youtube.txt makes it
+stale, and the app simply parses youtube.txt again (and refreshes the
+cache). Checking the CRC32 reads youtube.txt once, but that is many
+times faster than parsing it.
+
+The cache is written after a load that had to parse youtube.txt and
+after every save (compaction). It is only a copy: deleting it is always
+safe. Snapshots that are already plain marshal gain nothing and are not
+cached.
+"""
+
+import json
+import marshal
+import os
+import zlib
+
+from serializers import READ_CHUNK_SIZE, columns, snapshot_format
+from video_record import Video
+
+
+# First bytes of a cache file. Caches starting with b'YTVC' may hold 0:00
+# for durations that could not be parsed (see video_record.UnparsedVideo),
+# so they are not used; snapshots with such durations are not cached.
+CACHE_MAGIC = b'YTV2'
+
+
+def source_stamp(file):
+    """
+    Describes the snapshot a cache belongs to.
+
+    Args:
+        file: youtube.txt, opened in binary mode (read to the end)
+
+    Returns:
+        dict: mtime_ns, size and crc32 of the file
+    """
+    stat = os.fstat(file.fileno())
+    file.seek(0)
+    crc = 0
+    while chunk := file.read(READ_CHUNK_SIZE):
+        crc = zlib.crc32(chunk, crc)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'crc32': crc}
+
+
+class SnapshotCache:
+    """
+    Marshal copy of the snapshot file, valid while the snapshot is unchanged.
+
+    Args:
+        data_file (str): The snapshot file (youtube.txt)
+    """
+
+    def __init__(self, data_file):
+        self.data_file = data_file
+        self.cache_file = data_file + '.cache'
+
+    def load(self, file):
+        """
+        Returns the cached videos if the cache matches the open snapshot.
+
+        Args:
+            file: The snapshot, opened in binary mode; it is rewound to
+                the start afterwards, ready to be parsed if needed
+
+        Returns:
+            list: Video records, or None if there is no valid cache
+        """
+        try:
+            with open(self.cache_file, 'rb') as cache:
+                header = cache.readline()
+                if not header.startswith(CACHE_MAGIC + b' '):
+                    return None
+                stamp = json.loads(header[len(CACHE_MAGIC) + 1:])
+                stat = os.fstat(file.fileno())
+                # Cheap checks first, the CRC32 only if they pass
+                if (stamp['mtime_ns'], stamp['size']) != (stat.st_mtime_ns, stat.st_size):
+                    return None
+                if source_stamp(file) != stamp:
+                    return None
+                return list(map(Video, *marshal.loads(cache.read())))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError, EOFError):
+            return None  # Damaged cache - parse the snapshot instead
+        finally:
+            file.seek(0)
+
+    def wanted(self, file):
+        """Tells whether caching the open snapshot would speed up loading."""
+        fmt = snapshot_format(file)
+        file.seek(0)
+        return fmt != 'marshal'
+
+    def save(self, videos, stamp):
+        """
+        Atomically writes the cache for a snapshot.
+
+        Args:
+            videos (list): The videos exactly as stored in the snapshot
+            stamp (dict): source_stamp() of that snapshot
+
+        A cache that cannot be written is simply left out.
+        """
+        temp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(temp_file, 'wb') as cache:
+                cache.write(CACHE_MAGIC + b' ' + json.dumps(stamp).encode() + b'\n')
+                cache.write(marshal.dumps(columns(videos)))
+            os.replace(temp_file, self.cache_file)
+        except OSError:
+            pass  # e.g. a full disk: the app just starts slower next time
+
+    def size(self):
+        """Returns the size of the cache file in bytes (0 if there is none)."""
+        try:
+            return os.path.getsize(self.cache_file)
+        except FileNotFoundError:
+            return 0
@@ -0,0 +1,296 @@
+"""
+Sorted Secondary Indexes for the YouTube Video Manager
+======================================================
+Keeps the videos ordered by a key (duration, or name) without ever
+sorting the whole collection again.
+
+A single sorted Python list would need O(n) to insert into the middle,
+so the videos are kept in sorted *blocks* of at most 2 * BLOCK_SIZE
+items (the idea behind the sortedcontainers package):
+
+- 'maxes' holds the largest key of every block, so the block for a key
+  is found with bisect in O(log n), and so is the place inside it;
+  inserting or removing only shifts items within that one small block
+- a Fenwick tree over the block lengths turns a sorted position (e.g.
+  "the 41st name") into a block in O(log n)
+
+So adding, removing and finding a position are all O(log n) (plus a
+small, bounded shift inside a block), and reading k videos in order
+from there costs O(k): queries are O(log n + k).
+"""
+
+from bisect import bisect_left, insort
+
+from video_record import same_video
+
+
+# Blocks are split once they grow past twice this size
+BLOCK_SIZE = 500
+
+
+class SortedIndex:
+    """
+    Videos kept sorted by key(video), updated on add/update/delete.
+
+    Like the other indexes it is built on first use and then kept in
+    sync incrementally.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.built = False
+        self.blocks = []
+        self.maxes = []
+        self.length = 0
+        self.tree = [0]
+
+    def build(self, videos):
+        """
+        Sorts the whole collection once (first use only).
+
+        Args:
+            videos (list): Video collection to index
+        """
+        ordered = sorted(videos, key=self.key)
+        self.blocks = [ordered[start:start + BLOCK_SIZE]
+                       for start in range(0, len(ordered), BLOCK_SIZE)]
+        self.maxes = [self.key(block[-1]) for block in self.blocks]
+        self.length = len(ordered)
+        self._build_tree()
+        self.built = True
+
+    # ------------------------------------------------------------------
+    # Fenwick tree over block lengths (1-based indexes inside the tree)
+    # ------------------------------------------------------------------
+
+    def _build_tree(self):
+        """Builds the tree in one pass; needed after a block split or removal."""
+        size = len(self.blocks)
+        tree = [0] + [len(block) for block in self.blocks]
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def _tree_add(self, block, delta):
+        """Adds delta to the length of one block."""
+        i = block + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def _tree_prefix(self, block):
+        """Returns the number of videos in the blocks before this one."""
+        total = 0
+        i = block
+        while i:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, position):
+        """Converts a sorted position into (block, offset inside the block)."""
+        block = 0
+        remaining = position
+        step = 1 << (len(self.blocks).bit_length() - 1) if self.blocks else 0
+        while step:
+            candidate = block + step
+            if candidate <= len(self.blocks) and self.tree[candidate] <= remaining:
+                block = candidate
+                remaining -= self.tree[candidate]
+            step >>= 1
+        return block, remaining
+
+    # ------------------------------------------------------------------
+    # Keeping the index in sync
+    # ------------------------------------------------------------------
+
+    def add(self, video):
+        """
+        Inserts one video at its sorted place.
+
+        Args:
+            video (Video): Video to index
+        """
+        if not self.built:
+            return
+        key = self.key(video)
+        if not self.blocks:
+            self.blocks.append([video])
+            self.maxes.append(key)
+            self.length = 1
+            self._build_tree()
+            return
+        block = min(bisect_left(self.maxes, key), len(self.blocks) - 1)
+        insort(self.blocks[block], video, key=self.key)
+        self.maxes[block] = self.key(self.blocks[block][-1])
+        self.length += 1
+        if len(self.blocks[block]) > 2 * BLOCK_SIZE:
+            # Split the full block in two halves
+            half = self.blocks[block][BLOCK_SIZE:]
+            del self.blocks[block][BLOCK_SIZE:]
+            self.blocks.insert(block + 1, half)
+            self.maxes[block] = self.key(self.blocks[block][-1])
+            self.maxes.insert(block + 1, self.key(half[-1]))
+            self._build_tree()
+        else:
+            self._tree_add(block, 1)
+
+    def remove(self, video):
+        """
+        Removes one video. Videos with the same key are told apart by ID,
+        so removing one of several equal videos removes the right one.
+
+        Args:
+            video (Video): The indexed video (or a record with its ID)
+        """
+        if not self.built:
+            return
+        key = self.key(video)
+        block = bisect_left(self.maxes, key)
+        if block == len(self.blocks):
+            return
+        offset = bisect_left(self.blocks[block], key, key=self.key)
+        # Walk the run of equal keys (it can continue in the next blocks)
+        while True:
+            if offset == len(self.blocks[block]):
+                block, offset = block + 1, 0
+                if block == len(self.blocks):
+                    return
+            candidate = self.blocks[block][offset]
+            if self.key(candidate) != key:
+                return
+            if same_video(candidate, video):
+                break
+            offset += 1
+        items = self.blocks[block]
+        del items[offset]
+        self.length -= 1
+        if items:
+            self.maxes[block] = self.key(items[-1])
+            self._tree_add(block, -1)
+        else:
+            del self.blocks[block]
+            del self.maxes[block]
+            self._build_tree()
+
+    # ------------------------------------------------------------------
+    # Queries, each O(log n + k)
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return self.length
+
+    def rank(self, key):
+        """
+        Returns how many videos have a key smaller than the given one.
+
+        Args:
+            key: Key to compare with (same shape as key(video))
+        """
+        block = bisect_left(self.maxes, key)
+        if block == len(self.blocks):
+            return self.length
+        return self._tree_prefix(block) + bisect_left(self.blocks[block], key, key=self.key)
+
+    def iterate(self, start=0, stop=None, reverse=False):
+        """
+        Yields videos by sorted position, from start up to (not incl.) stop.
+
+        Args:
+            start (int): First sorted position
+            stop (int): End position (default: the end)
+            reverse (bool): Walk from stop - 1 down to start instead
+
+        Yields:
+            Video: Videos in key order (or reverse key order)
+        """
+        stop = self.length if stop is None else min(stop, self.length)
+        if start >= stop:
+            return
+        if reverse:
+            block, offset = self._locate(stop - 1)
+            for _ in range(stop - start):
+                yield self.blocks[block][offset]
+                offset -= 1
+                if offset < 0:
+                    block -= 1
+                    offset = len(self.blocks[block]) - 1
+            return
+        block, offset = self._locate(start)
+        for _ in range(stop - start):
+            yield self.blocks[block][offset]
+            offset += 1
+            if offset == len(self.blocks[block]):
+                block, offset = block + 1, 0
+
+    def largest(self, videos, count):
+        """
+        Returns the videos with the largest keys, largest first.
+
+        Args:
+            videos (list): Video collection (used to build on first use)
+            count (int): Number of videos to return
+
+        Returns:
+            list: Up to 'count' videos
+        """
+        if not self.built:
+            self.build(videos)
+        return list(self.iterate(max(0, self.length - count), reverse=True))
+
+    def between(self, videos, low, high, limit=None):
+        """
+        Finds the videos with low <= key < high, in key order.
+
+        Args:
+            videos (list): Video collection (used to build on first use)
+            low: Smallest key to include
+            high: First key to exclude
+            limit (int): Maximum number of videos to return (None = all)
+
+        Returns:
+            tuple: (number of matching videos, list of the first 'limit')
+        """
+        if not self.built:
+            self.build(videos)
+        start, stop = self.rank(low), self.rank(high)
+        shown = stop if limit is None else min(stop, start + limit)
+        return max(0, stop - start), list(self.iterate(start, shown))
+
+    def view(self, videos):
+        """
+        Returns the index as a read-only sequence in sorted order.
+
+        Args:
+            videos (list): Video collection (used to build on first use)
+        """
+        if not self.built:
+            self.build(videos)
+        return SortedView(self)
+
+
+class SortedView:
+    """Sequence over a SortedIndex: len(), iteration and slices like a list."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return self.index.iterate()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self.index))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return list(self.index.iterate(start, stop))
+        if index < 0:
+            index += len(self.index)
+        if not 0 <= index < len(self.index):
+            raise IndexError('video index out of range')
+        return next(self.index.iterate(index, index + 1))
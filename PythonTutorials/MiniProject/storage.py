@@ -0,0 +1,1310 @@
+"""
+Storage Backends for the YouTube Video Manager
+==============================================
+Every backend offers the same three methods, so youtube_manager.py does
+not care where the videos actually live:
+
+- load()                 -> returns the video collection (list-like)
+- save(videos)           -> writes the whole collection (compaction)
+- record(videos, record) -> persists one add/update/delete operation
+- record_batch(videos, records) -> persists many operations in one write
+- flush()                -> makes edits still held for group commit durable
+- commit_stats()         -> number of commits, batched edits and latency
+- locked()               -> context manager holding the cross-process lock
+- has_changes() / changes() -> edits other processes made meanwhile
+
+Available backends:
+- 'json'   : youtube.txt snapshot plus an append-only journal, streamed
+             in the background so the menu appears immediately; the
+             snapshot encoding is pluggable (see serializers.py)
+- 'sqlite' : embedded SQLite database (stdlib sqlite3), one statement per edit
+- 'binary' : memory-mapped fixed-size slots plus a string heap
+             (see binary_storage.py), edits touch only their own slot
+- 'segmented' : the collection split into segment files by position
+             range (see segmented_storage.py), loaded in parallel
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections.abc import MutableSequence
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, one process at a time
+    fcntl = None
+
+from binary_storage import BinaryStorage
+from segmented_storage import SegmentedStorage
+from serializers import READ_CHUNK_SIZE, check_format, read_snapshot, write_snapshot
+from snapshot_cache import SnapshotCache, source_stamp
+from tombstone_list import TombstoneList
+from video_record import MIGRATE_FIX, UnparsedVideo, Video, check_parsed
+
+
+# Files used for persistence. The snapshot holds the full collection (a
+# JSON array by default, see serializers.py), the journal holds one JSON
+# operation per line.
+DATA_FILE = 'youtube.txt'
+JOURNAL_FILE = 'youtube.journal'
+DATABASE_FILE = 'youtube.db'
+
+# Once the journal grows past this many bytes it is folded back into the
+# snapshot, so replaying it at startup stays cheap.
+JOURNAL_COMPACT_THRESHOLD = 1024 * 1024
+
+# How many parsed videos the streaming loader hands over to readers in one go
+LOAD_BATCH_SIZE = 1000
+
+
+def apply_operation(videos, record):
+    """
+    Applies a single journal record to the video list.
+
+    Indexes in the record are 0-based positions in the list.
+
+    Args:
+        videos (list): List of Video records to modify in place
+        record (dict): Journal record with an 'op' key
+    """
+    match record['op']:
+        case 'add':
+            videos.append(Video.from_dict(record['video']))
+        case 'update':
+            videos[record['index']] = Video.from_dict(record['video'])
+        case 'delete':
+            del videos[record['index']]
+        case 'batch':
+            # Several changes that must be applied together (e.g. a move
+            # that also renumbers its neighbours), written as one line
+            for change in record['records']:
+                apply_operation(videos, change)
+
+
+def journal_default(video):
+    """
+    Encodes the Videos in a journal record (json.dumps default).
+
+    Calls the video's own to_dict(), so an UnparsedVideo - e.g. moved -
+    is journaled with the duration text it was stored with.
+    """
+    return video.to_dict()
+
+
+def highest_added_id(records, last_id=0):
+    """
+    Returns the largest video ID the journal records add, or last_id if
+    that is larger (batches are looked into).
+
+    Args:
+        records (list): Journal records (videos as Video or dict)
+        last_id (int): Largest ID known so far
+
+    Returns:
+        int: The larger of the two
+    """
+    for record in records:
+        if record['op'] == 'add':
+            video = record['video']
+            video_id = video.get('id') if isinstance(video, dict) else video.id
+            last_id = max(last_id, video_id or 0)
+        elif record['op'] == 'batch':
+            last_id = highest_added_id(record['records'], last_id)
+    return last_id
+
+
+# ============================================================================
+# STREAMING LOADER
+# ============================================================================
+
+class StreamingVideoList(MutableSequence):
+    """
+    A video list that fills itself in a background thread.
+
+    load() returns this right away, so the menu appears immediately while
+    the snapshot is still being parsed. Iterating yields videos as soon as
+    they are parsed (that is how list_all_videos prints its first rows
+    early). Anything that depends on positions - len(), indexing,
+    update, delete - waits until the snapshot and journal are fully loaded.
+
+    If the journal has pending entries, early videos might still be
+    changed by it, so iteration waits for the full load in that case too.
+
+    The videos are kept in a TombstoneList, so deleting one is O(log n)
+    instead of shifting every later video.
+    """
+
+    def __init__(self, storage):
+        self._storage = storage
+        self._videos = TombstoneList()
+        self._ready = threading.Condition()
+        self._done = False
+        self._error = None
+        self._stream_early = not storage.journal_has_edits()
+        # Videos with an order key in the snapshot, from the journal header
+        # (None = unknown). Only save() writes order keys into a snapshot,
+        # and it always writes the header too: no journal means none.
+        header = storage.journal_header()
+        self._ordered = 0 if header is None else header.get('ordered')
+        threading.Thread(target=self._load, args=(storage,), daemon=True).start()
+
+    def _load(self, storage):
+        """
+        Background thread: read the snapshot (from the cache if it is still
+        valid, see snapshot_cache.py), then replay the journal.
+        """
+        try:
+            loaded_id = None
+            try:
+                with open(storage.data_file, 'rb') as file:
+                    loaded_id = snapshot_id(file.fileno())
+                    cached = storage.cache.load(file) if storage.cache is not None else None
+                    if cached is None:
+                        self._parse(file, storage.cache)
+                    else:
+                        # Complete already (IDs included): hand it over in slices
+                        for start in range(0, len(cached), LOAD_BATCH_SIZE):
+                            self._publish(cached[start:start + LOAD_BATCH_SIZE])
+            except FileNotFoundError:
+                # Start with an empty list if file doesn't exist (first time running)
+                pass
+            with self._ready:
+                storage.replay_journal(self._videos, loaded_id)
+        except Exception as error:
+            self._error = error
+        finally:
+            storage.loaded.set()
+            with self._ready:
+                self._done = True
+                self._ready.notify_all()
+
+    def _parse(self, file, cache):
+        """
+        Parses the snapshot file, and refreshes the cache if there is one.
+
+        Args:
+            file: The snapshot, opened in binary mode
+            cache (SnapshotCache): Cache to write afterwards, or None
+        """
+        stamp = None
+        if cache is not None and cache.wanted(file):
+            # Stamped first: parsing may close the file when it is done
+            stamp = source_stamp(file)
+            file.seek(0)
+        parsed = []
+        batch = []
+        for number, video in enumerate(read_snapshot(file), start=1):
+            if video.id is None:
+                # Saved before videos had IDs: the position in the
+                # snapshot is stable until the next save stores IDs
+                video.id = number
+            if stamp is not None and type(video) is UnparsedVideo:
+                stamp = None  # The cache's columns would only hold 0:00
+            batch.append(video)
+            if len(batch) >= LOAD_BATCH_SIZE:
+                self._publish(batch)
+                if stamp is not None:
+                    parsed += batch
+                batch = []
+        self._publish(batch)
+        if stamp is not None:
+            cache.save(parsed + batch, stamp)
+
+    def _publish(self, batch):
+        """Makes a batch of parsed videos visible to waiting readers."""
+        with self._ready:
+            self._videos.extend(batch)
+            self._ready.notify_all()
+
+    def wait(self):
+        """
+        Blocks until the whole collection is loaded.
+
+        Returns:
+            TombstoneList: The fully loaded list of videos
+        """
+        with self._ready:
+            self._ready.wait_for(lambda: self._done)
+        if self._error is not None:
+            raise self._error
+        return self._videos
+
+    def __len__(self):
+        return len(self.wait())
+
+    def __getitem__(self, index):
+        return self.wait()[index]
+
+    def __setitem__(self, index, video):
+        self.wait()[index] = video
+
+    def __delitem__(self, index):
+        del self.wait()[index]
+
+    def insert(self, index, video):
+        self.wait().insert(index, video)
+
+    def append(self, video):
+        self.wait().append(video)
+
+    def extend(self, videos):
+        self.wait().extend(videos)
+
+    def last_id(self):
+        """Returns the largest video ID ever stored, even if deleted since."""
+        self.wait()
+        return self._storage.last_id
+
+    def has_order_keys(self):
+        """
+        Tells whether any video has an explicit order key (see playlist.py).
+
+        While the snapshot is still streaming in, the journal header can
+        answer that; otherwise this waits for the load and looks.
+        """
+        if self._stream_early and self._ordered == 0:
+            return False
+        return any(video.order is not None for video in self.wait())
+
+    def __iter__(self):
+        if not self._stream_early:
+            yield from self.wait()
+            return
+        position = 0
+        while True:
+            with self._ready:
+                self._ready.wait_for(
+                    lambda: position < len(self._videos) or self._done)
+                batch = self._videos[position:]
+                done = self._done
+            if self._error is not None:
+                raise self._error
+            if not batch and done:
+                return
+            yield from batch
+            position += len(batch)
+
+
+# ============================================================================
+# JSON SNAPSHOT + JOURNAL
+# ============================================================================
+
+def fsync_directory(path):
+    """
+    Makes a rename inside the directory durable (POSIX only).
+
+    Args:
+        path (str): File whose directory should be synced
+    """
+    if not hasattr(os, 'O_DIRECTORY'):
+        return  # Windows has no directory handles to fsync
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def file_id(target):
+    """
+    Returns (device, inode) of a file, or None if it does not exist.
+
+    A file renamed over another one (an atomic replace) has a new id,
+    which is how a process notices that another one replaced a file -
+    unless the new file reuses a freed inode, see snapshot_id() and
+    journal_id().
+
+    Args:
+        target: Path, or descriptor of an open file
+    """
+    try:
+        stat = os.stat(target)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def snapshot_id(target):
+    """
+    Returns what identifies one snapshot: file_id() plus size and mtime.
+
+    Compaction replaces the snapshot often, and the file system may give
+    the new file the inode of one replaced earlier, so the inode alone
+    can mistake a newer snapshot for an old one. A snapshot is never
+    written in place, so size and mtime tell them apart.
+
+    Args:
+        target: Path, or descriptor of an open file
+    """
+    try:
+        stat = os.stat(target)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def journal_id(journal):
+    """
+    Returns what identifies one journal: file_id() plus its first line.
+
+    Like the snapshot, a new journal may get the inode of an old one.
+    The journal grows in place, but its first line - the version header,
+    which differs for every compaction - never changes.
+
+    Args:
+        journal (file): Journal opened for reading in binary mode; it is
+            left at its start
+    """
+    journal.seek(0)
+    first = journal.readline()
+    journal.seek(0)
+    return file_id(journal.fileno()), first if first.endswith(b'\n') else b''
+
+
+def file_checksum(path):
+    """
+    Returns (size, crc32) of a file, or None if it does not exist.
+
+    Args:
+        path (str): File to check
+    """
+    crc = 0
+    try:
+        with open(path, 'rb') as file:
+            while chunk := file.read(READ_CHUNK_SIZE):
+                crc = zlib.crc32(chunk, crc)
+    except FileNotFoundError:
+        return None
+    return os.path.getsize(path), crc
+
+
+class ChecksumWriter:
+    """Wraps a binary file and keeps the size and CRC32 of what is written."""
+
+    def __init__(self, file):
+        self.file = file
+        self.size = 0
+        self.crc = 0
+
+    def write(self, data):
+        self.size += len(data)
+        self.crc = zlib.crc32(data, self.crc)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+
+class JSONStorage:
+    """
+    Stores the collection as a snapshot plus an append-only journal.
+
+    Single edits are appended to the journal (O(1) I/O). The full JSON
+    snapshot is only rewritten when the journal is compacted, and it is
+    parsed incrementally in the background on startup.
+
+    Writes are crash-safe:
+    - every journal write is fsync'ed before it counts as committed
+    - the snapshot is written to a temp file, fsync'ed and renamed over
+      youtube.txt, so a crash leaves either the old or the new file
+    - before the rename a 'checkpoint' record with the new snapshot's
+      size, CRC32 and version is journaled; if the app dies between the
+      rename and replacing the journal, load() sees the checkpoint
+      matches the snapshot and does not apply those entries a second time
+
+    With group_commit_window > 0, edits arriving within that many seconds
+    are fsync'ed together (group commit). flush() forces pending edits
+    out, e.g. on exit.
+
+    snapshot_format picks how save() encodes the snapshot ('json',
+    'marshal', 'pickle', optionally '+gzip'/'+lzma'). load() reads any of
+    them, because the format is detected from the file header.
+
+    Several processes can share the files safely:
+    - edits are made under locked(), an advisory fcntl lock, after
+      changes() has read what other processes journaled in the meantime
+    - the journal starts with a version header; the version counts every
+      edit ever made, so each process knows exactly how much it has seen
+    - the header also holds the largest video ID handed out so far, so
+      an ID stays used after its video is deleted and compacted away
+    - the lock is only held to read the new journal lines and append one;
+      a compaction writes the new snapshot before taking it, and keeps
+      any lines other processes appended meanwhile
+    """
+
+    def __init__(self, data_file=DATA_FILE, journal_file=JOURNAL_FILE,
+                 group_commit_window=0, snapshot_format='json', snapshot_cache=False):
+        check_format(snapshot_format)
+        self.data_file = data_file
+        self.journal_file = journal_file
+        # Marshal copy of the snapshot for a faster startup (None = off)
+        self.cache = SnapshotCache(data_file) if snapshot_cache else None
+        self.lock_file = data_file + '.lock'
+        self.group_commit_window = group_commit_window
+        self.snapshot_format = snapshot_format
+        self.pending_edits = 0  # Written, but not fsync'ed yet (group commit)
+        self.lock = threading.Lock()
+        self.timer = None
+        self.loaded = threading.Event()  # Set once load() has read the journal
+        self.journal_size = os.path.getsize(journal_file) if os.path.exists(journal_file) else 0
+        # Cross-process state: the lock while held, and how far this
+        # process has read the journal (file id, byte offset, versions)
+        self.lock_handle = None
+        self.lock_depth = 0
+        self.journal_id = None
+        self.offset = 0
+        self.base_version = 0  # Version the snapshot was written at (None = unknown)
+        self.version = 0       # Edits seen so far, snapshot included
+        self.last_id = 0       # Largest video ID seen in any file or edit
+        self.unparsed_warned = False  # See save()
+        # Commit statistics, see commit_stats()
+        self.commits = 0
+        self.committed_edits = 0
+        self.commit_seconds = 0.0
+        self.last_commit_seconds = 0.0
+        # Bytes read and written so far, see io_stats()
+        self.read_bytes = 0
+        self.written_bytes = 0
+
+    def load(self):
+        """
+        Starts loading the snapshot and journal in the background.
+
+        If the files don't exist, the list simply ends up empty, so the
+        app works even on first run without errors.
+
+        Returns:
+            StreamingVideoList: List of Video records, filled lazily
+        """
+        self.loaded.clear()
+        # Counted up front: the files are read in the background
+        for path in (self.data_file, self.journal_file):
+            if os.path.exists(path):
+                self.read_bytes += os.path.getsize(path)
+        if self.cache is not None:
+            self.read_bytes += self.cache.size()
+        return StreamingVideoList(self)
+
+    def journal_header(self):
+        """
+        Reads the version header the journal starts with.
+
+        Returns:
+            dict: The header ({} if the journal has none), or None if
+                there is no journal at all
+        """
+        try:
+            with open(self.journal_file, 'rb') as journal:
+                first = json.loads(journal.readline())
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            return {}
+        return first if first.get('op') == 'version' else {}
+
+    def journal_has_edits(self):
+        """Tells whether the journal holds anything besides its version header."""
+        try:
+            with open(self.journal_file, 'rb') as journal:
+                first = journal.readline()
+                try:
+                    if json.loads(first)['op'] == 'version':
+                        return bool(journal.read(1))
+                except json.JSONDecodeError:
+                    pass
+                return bool(first)
+        except FileNotFoundError:
+            return False
+
+    def replay_journal(self, videos, loaded_id=None):
+        """
+        Applies every operation from the journal file to the video list.
+
+        Each line of the journal is one JSON record such as
+        {"op": "add", "video": {...}} or {"op": "delete", "index": 3}.
+        A half-written last line (e.g. the app crashed mid-write) is skipped.
+        If the journal ends with a checkpoint that matches the current
+        snapshot, the snapshot already contains the entries up to the
+        checkpoint's version and only later ones are replayed.
+
+        Args:
+            videos (list): List of Video records to modify in place
+            loaded_id (tuple): snapshot_id() of the snapshot that was read;
+                if another process has replaced it since, the journal may
+                not belong to it, and the next changes() asks for a reload
+        """
+        try:
+            with open(self.journal_file, 'rb') as journal:
+                current = journal_id(journal)
+                entries = self._read_entries(journal)
+        except FileNotFoundError:
+            current, entries = None, []
+        header = entries[0][1] if entries and entries[0][1]['op'] == 'version' else {}
+        base = header.get('version', 0)
+        edits = [record for _, record in entries if record['op'] not in ('version', 'checkpoint')]
+        # Headers written before the field existed: the IDs in the files will do
+        self.last_id = highest_added_id(edits, max(self.last_id, header.get('last_id', 0)))
+        skip = 0
+        if entries and entries[-1][1]['op'] == 'checkpoint':
+            checkpoint = entries[-1][1]
+            if file_checksum(self.data_file) == (checkpoint['size'], checkpoint['crc32']):
+                # Older checkpoints have no version: they cover the whole journal
+                skip = checkpoint.get('version', base + len(edits)) - base
+        for record in edits[skip:]:
+            apply_operation(videos, record)
+        self.journal_id = current
+        self.offset = entries[-1][0] if entries else 0
+        self.version = base + len(edits)
+        self.base_version = base if snapshot_id(self.data_file) == loaded_id else None
+
+    def _read_entries(self, journal):
+        """
+        Reads the complete journal lines from the current position.
+
+        Args:
+            journal (file): Journal opened in binary mode
+
+        Returns:
+            list: (offset just after the line, record) pairs
+        """
+        entries = []
+        offset = journal.tell()
+        for line in journal:
+            if not line.endswith(b'\n'):
+                break  # Torn write at the end of the journal - ignore it
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            offset += len(line)
+            entries.append((offset, record))
+        return entries
+
+    @contextmanager
+    def locked(self):
+        """
+        Holds the cross-process lock on the collection (context manager).
+
+        An advisory fcntl lock on youtube.txt.lock, so it only keeps out
+        other copies of this app. Nested use - e.g. a compaction during
+        an edit - shares the outer lock. Without fcntl (Windows) this
+        does nothing, and only one process should use the files.
+        """
+        if self.lock_depth == 0 and fcntl is not None:
+            self.lock_handle = open(self.lock_file, 'a')
+            fcntl.flock(self.lock_handle, fcntl.LOCK_EX)
+        self.lock_depth += 1
+        try:
+            yield
+        finally:
+            self.lock_depth -= 1
+            if self.lock_depth == 0 and self.lock_handle is not None:
+                self.lock_handle.close()  # Closing the file releases the lock
+                self.lock_handle = None
+
+    def has_changes(self):
+        """
+        Cheap check (no lock, no reading) whether changes() has anything new.
+
+        Returns:
+            bool: True if the journal grew or was replaced
+        """
+        if not self.loaded.is_set():
+            return False  # Still loading, which reads the journal anyway
+        try:
+            stat = os.stat(self.journal_file)
+        except FileNotFoundError:
+            return False
+        # A new journal on an old inode usually differs in size too;
+        # changes() compares the header, which settles it
+        return (self.journal_id is None or (stat.st_dev, stat.st_ino) != self.journal_id[0]
+                or stat.st_size != self.offset)
+
+    def changes(self):
+        """
+        Reads the edits other processes journaled since this one last looked.
+
+        The lock must be held, and the records must be applied before
+        this process makes its own edit.
+
+        Returns:
+            list: Journal records to apply in order, or None if another
+                process compacted edits this one has not seen into the
+                snapshot - the collection must then be loaded again
+        """
+        self.loaded.wait()  # Only what load() has not read is new
+        if self.base_version is None:
+            # load() read the snapshot of one compaction and the journal
+            # of the next: edits are missing even if the journal is the same
+            return None
+        try:
+            journal = open(self.journal_file, 'rb')
+        except FileNotFoundError:
+            return []
+        with journal:
+            current = journal_id(journal)
+            if current != self.journal_id:
+                # A new journal: another process compacted (or wrote the
+                # first edit). Fine only if its snapshot is what we have.
+                header = journal.readline()
+                base = 0
+                try:
+                    first = json.loads(header)
+                    if first['op'] == 'version':
+                        base = first['version']
+                        self.last_id = max(self.last_id, first.get('last_id', 0))
+                    else:
+                        header = b''
+                except json.JSONDecodeError:
+                    header = b''
+                if base != self.version:
+                    return None
+                self.journal_id, self.offset, self.base_version = current, len(header), base
+            journal.seek(self.offset)
+            entries = self._read_entries(journal)
+        if entries:
+            self.read_bytes += entries[-1][0] - self.offset
+        records = [record for _, record in entries if record['op'] not in ('version', 'checkpoint')]
+        if entries:
+            self.offset = entries[-1][0]
+        self.version += len(records)
+        self.last_id = highest_added_id(records, self.last_id)
+        return records
+
+    def save(self, videos):
+        """
+        Atomically writes the full collection and starts a new journal.
+
+        Nothing is written while a video still has a duration that could
+        not be parsed (see video_record.check_parsed()): the snapshot
+        would store 0:00 instead of the original text.
+
+        The snapshot is written to a temp file before taking the lock, so
+        other processes can keep editing meanwhile. Under the lock, the
+        lines they appended since are carried over into the new journal.
+        If another process compacted in the meantime (or this process
+        loaded a snapshot and journal that do not belong together), its
+        snapshot is kept and this one is thrown away. Otherwise the snapshot cache is
+        refreshed too, so the next start does not parse the new snapshot.
+
+        Args:
+            videos (list): List of Video records to save
+        """
+        videos = list(videos)
+        try:
+            check_parsed(videos, f"compact {self.journal_file} into {self.data_file}")
+        except ValueError as error:
+            # The journal keeps growing instead; said once per run
+            if not self.unparsed_warned:
+                print(f"Warning: {error}", file=sys.stderr)
+                self.unparsed_warned = True
+            return
+        version = self.version
+        last_id = max(self.last_id, max((video.id or 0 for video in videos), default=0))
+        ordered = sum(video.order is not None for video in videos)
+        temp_file = f"{self.data_file}.{os.getpid()}.tmp"
+        with open(temp_file, 'wb') as file:
+            writer = ChecksumWriter(file)
+            write_snapshot(videos, writer, self.snapshot_format)
+            file.flush()
+            os.fsync(file.fileno())
+        with self.locked(), self.lock:
+            try:
+                with open(self.journal_file, 'rb') as journal:
+                    current = journal_id(journal)
+                    journal.seek(self.offset)
+                    newer = journal.read()
+            except FileNotFoundError:
+                current, newer = None, b''
+            if current != self.journal_id or self.version != version or self.base_version is None:
+                os.remove(temp_file)
+                return
+            self._cancel_timer()
+            self._append([json.dumps({'op': 'checkpoint', 'size': writer.size,
+                                      'crc32': writer.crc, 'version': version}) + '\n'], edits=0)
+            os.replace(temp_file, self.data_file)
+            fsync_directory(self.data_file)
+            stamp = {'mtime_ns': os.stat(self.data_file).st_mtime_ns,
+                     'size': writer.size, 'crc32': writer.crc}
+            # Snapshot is complete: the new journal starts at its version
+            header = (json.dumps({'op': 'version', 'version': version, 'last_id': last_id,
+                                  'ordered': ordered}) + '\n').encode()
+            with open(self.journal_file + '.tmp', 'wb') as journal:
+                journal.write(header + newer)
+                journal.flush()
+                os.fsync(journal.fileno())
+                self.journal_id = file_id(journal.fileno()), header
+            os.replace(self.journal_file + '.tmp', self.journal_file)
+            fsync_directory(self.journal_file)
+            self.offset = len(header)
+            self.base_version = version
+            self.journal_size = len(header) + len(newer)
+            self.read_bytes += len(newer)
+            self.written_bytes += writer.size + self.journal_size
+            self.pending_edits = 0
+        if self.cache is not None and self.snapshot_format != 'marshal':
+            # Outside the lock: if another process replaces the snapshot
+            # first, the stamp no longer matches and the cache is ignored
+            self.cache.save(videos, stamp)
+            self.written_bytes += self.cache.size()
+
+    def record(self, videos, record):
+        """
+        Appends one operation to the journal instead of rewriting the file.
+
+        Without group commit the entry is written and fsync'ed right away.
+        With group commit it is written right away (so other processes
+        see it) but fsync'ed together with other edits, at most
+        group_commit_window seconds later. When the journal passes
+        JOURNAL_COMPACT_THRESHOLD bytes it is compacted into the snapshot.
+
+        Args:
+            videos (list): Current list of Video records (already modified)
+            record (dict): Journal record describing the change
+        """
+        line = json.dumps(record, default=journal_default) + '\n'
+        with self.lock:
+            if self.group_commit_window > 0:
+                self._append([line], sync=False)
+                self.pending_edits += 1
+                if self.timer is None:
+                    self.timer = threading.Timer(self.group_commit_window, self.flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+            else:
+                self._append([line])
+            self.version += 1
+            self.last_id = highest_added_id([record], self.last_id)
+        if self.journal_size > JOURNAL_COMPACT_THRESHOLD:
+            self.save(videos)
+
+    def record_batch(self, videos, records):
+        """
+        Appends many operations to the journal with a single write.
+
+        Used by bulk imports. It never compacts on its own - the caller
+        calls save() once at the end, instead of compacting again and
+        again while the journal grows.
+
+        Args:
+            videos (list): Current list of Video records (already modified)
+            records (list): Journal records describing the changes
+        """
+        lines = [json.dumps(record, default=journal_default) + '\n' for record in records]
+        with self.lock:
+            self._append(lines, edits=len(lines) + self.pending_edits)
+            self.pending_edits = 0
+            self.version += len(lines)
+            self.last_id = highest_added_id(records, self.last_id)
+
+    def flush(self):
+        """Commits any edits still waiting for the group-commit window."""
+        with self.lock:
+            self._cancel_timer()
+            if self.pending_edits:
+                # The lines are written already, only the fsync is missing
+                started = time.perf_counter()
+                with open(self.journal_file, 'ab') as journal:
+                    os.fsync(journal.fileno())
+                self._count_commit(started, self.pending_edits)
+                self.pending_edits = 0
+
+    def commit_stats(self):
+        """
+        Returns how the journal commits went so far.
+
+        Returns:
+            dict: commits, edits, edits_per_commit, avg/last latency (ms)
+        """
+        return {
+            'commits': self.commits,
+            'edits': self.committed_edits,
+            'edits_per_commit': self.committed_edits / self.commits if self.commits else 0,
+            'avg_latency_ms': 1000 * self.commit_seconds / self.commits if self.commits else 0,
+            'last_latency_ms': 1000 * self.last_commit_seconds,
+        }
+
+    def io_stats(self):
+        """
+        Returns how many bytes of the snapshot and journal were read and
+        written so far (see metrics.py).
+
+        Returns:
+            dict: read_bytes, written_bytes
+        """
+        return {'read_bytes': self.read_bytes, 'written_bytes': self.written_bytes}
+
+    def _cancel_timer(self):
+        """Stops the pending group-commit timer (lock must be held)."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _append(self, lines, edits=None, sync=True):
+        """
+        Writes journal lines in one call and fsyncs them (lock must be held).
+
+        This process has seen everything up to the end of what it wrote,
+        because edits are only made after reading changes().
+
+        Args:
+            lines (list): Journal lines, each ending in a newline
+            edits (int): Number of edits the fsync commits (default: len(lines))
+            sync (bool): False to write now and fsync later (group commit)
+        """
+        started = time.perf_counter()
+        data = ''.join(lines).encode()
+        self.written_bytes += len(data)
+        with open(self.journal_file, 'a+b') as journal:
+            journal.write(data)
+            journal.flush()
+            self.journal_size = self.offset = journal.tell()
+            self.journal_id = journal_id(journal)
+            if not sync:
+                return
+            os.fsync(journal.fileno())
+        self._count_commit(started, len(lines) if edits is None else edits)
+
+    def _count_commit(self, started, edits):
+        """Adds one commit (an fsync) that started at 'started' to the stats."""
+        self.last_commit_seconds = time.perf_counter() - started
+        self.commit_seconds += self.last_commit_seconds
+        self.commits += 1
+        self.committed_edits += edits
+
+
+# ============================================================================
+# SQLITE
+# ============================================================================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    time INTEGER NOT NULL,
+    sort_key REAL,
+    position REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('count', 0);
+CREATE TRIGGER IF NOT EXISTS videos_count_insert AFTER INSERT ON videos
+BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'count';
+END;
+CREATE TRIGGER IF NOT EXISTS videos_count_delete AFTER DELETE ON videos
+BEGIN
+    UPDATE meta SET value = value - 1 WHERE key = 'count';
+END;
+"""
+
+
+# Created after the 'position' column exists (older databases get it on load)
+POSITION_INDEX = "CREATE INDEX IF NOT EXISTS videos_position ON videos (position, id)"
+
+# Only rows with an order key are in it, so has_order_keys() is one lookup
+SORT_KEY_INDEX = ("CREATE INDEX IF NOT EXISTS videos_sort_key ON videos (sort_key) "
+                  "WHERE sort_key IS NOT NULL")
+
+
+@contextmanager
+def transaction(connection, begin='BEGIN'):
+    """
+    Runs a block of statements as one transaction (context manager).
+
+    Inside SQLiteStorage.locked() the lock's transaction is already
+    open, and the statements simply become part of it.
+
+    Args:
+        connection (sqlite3.Connection): Connection in autocommit mode
+        begin (str): Statement that starts the transaction
+    """
+    if connection.in_transaction:
+        yield
+        return
+    connection.execute(begin)
+    try:
+        yield
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+def insert_rows(connection, videos):
+    """
+    Inserts videos at the end, keeping their IDs as row ids (SQLite picks
+    one if None). Their positions follow the largest one in the table.
+    Durations fit the INTEGER column: parse_duration() refuses anything
+    above video_record.MAX_DURATION, long before SQLite's 64-bit limit.
+
+    Args:
+        connection (sqlite3.Connection): Open database connection
+        videos: Iterable of Video records
+    """
+    last = connection.execute("SELECT COALESCE(MAX(position), 0) FROM videos").fetchone()[0]
+    connection.executemany(
+        "INSERT INTO videos (id, name, time, sort_key, position) VALUES (?, ?, ?, ?, ?)",
+        ((video.id, video.name, video.time, video.order, last + number)
+         for number, video in enumerate(videos, start=1)))
+
+
+class SQLiteVideoList(MutableSequence):
+    """
+    A list-like view over the 'videos' table.
+
+    Behaves like the plain list the menu functions expect (len, indexing,
+    iteration, append, del), but every operation runs directly against
+    SQLite, so nothing is loaded into memory up front.
+
+    Positions are 0-based like a list and follow the 'position' column:
+    appended rows get the next whole number, a row inserted between two
+    others a number halfway between theirs (fractional indexing, as for
+    the playlist order), so an insert never renumbers the rows after it.
+    The number of rows is kept in the 'meta' table by triggers, so len()
+    never has to count the table.
+
+    Going from a position to a row uses 'ids', the row ids in position
+    order (8 bytes per video), read with one query the first time a
+    position past the first page is used and then kept up to date. Every
+    access after that is a single statement on the primary key.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.ids = None  # array of row ids in position order, once read
+
+    def __len__(self):
+        if self.ids is not None:
+            return len(self.ids)
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'count'").fetchone()
+        return row[0]
+
+    def _load_ids(self):
+        """Reads the row ids in position order (once)."""
+        if self.ids is None:
+            cursor = self.connection.execute("SELECT id FROM videos ORDER BY position, id")
+            self.ids = array('q', (row[0] for row in cursor))
+        return self.ids
+
+    def _row_id(self, index):
+        """Converts a list position (negative allowed) into a row id."""
+        try:
+            return self._load_ids()[index]
+        except IndexError:
+            raise IndexError('video index out of range') from None
+
+    def _position(self, row_id):
+        """Returns the 'position' value of a row."""
+        return self.connection.execute(
+            "SELECT position FROM videos WHERE id = ?", (row_id,)).fetchone()[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if stop <= start:
+                return []
+            if start == 0:
+                # The first page needs no ids: the index is already in order
+                rows = self.connection.execute(
+                    "SELECT name, time, id, sort_key FROM videos ORDER BY position, id LIMIT ?",
+                    (stop,))
+            else:
+                # One range query from the first row on, e.g. a page of the listing
+                first = self._row_id(start)
+                rows = self.connection.execute(
+                    "SELECT name, time, id, sort_key FROM videos WHERE (position, id) >= (?, ?) "
+                    "ORDER BY position, id LIMIT ?", (self._position(first), first, stop - start))
+            return [Video(*row) for row in rows]
+        row = self.connection.execute(
+            "SELECT name, time, id, sort_key FROM videos WHERE id = ?",
+            (self._row_id(index),)).fetchone()
+        return Video(*row)
+
+    def __setitem__(self, index, video):
+        # The row id is the video's stable ID, so it never changes
+        self.connection.execute(
+            "UPDATE videos SET name = ?, time = ?, sort_key = ? WHERE id = ?",
+            (video.name, video.time, video.order, self._row_id(index)))
+
+    def __delitem__(self, index):
+        row_id = self._row_id(index)
+        self.connection.execute("DELETE FROM videos WHERE id = ?", (row_id,))
+        del self.ids[index]
+
+    def __iter__(self):
+        # Streams rows from a cursor instead of building a list
+        for row in self.connection.execute(
+                "SELECT name, time, id, sort_key FROM videos ORDER BY position, id"):
+            yield Video(*row)
+
+    def last_id(self):
+        """
+        Returns the largest video ID ever stored, even if deleted since:
+        with AUTOINCREMENT, SQLite keeps it in sqlite_sequence.
+        """
+        row = self.connection.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'videos'").fetchone()
+        return row[0] if row else 0
+
+    def has_order_keys(self):
+        """Tells whether any video has an explicit order key (one index lookup)."""
+        return self.connection.execute(
+            "SELECT 1 FROM videos WHERE sort_key IS NOT NULL LIMIT 1").fetchone() is not None
+
+    def append(self, video):
+        self.extend([video])
+
+    def extend(self, videos):
+        videos = list(videos)
+        # One transaction for the whole batch instead of one per row
+        with transaction(self.connection):
+            insert_rows(self.connection, videos)
+        if self.ids is not None:
+            if all(video.id is not None for video in videos):
+                self.ids.extend(video.id for video in videos)
+            else:
+                self.ids = None  # SQLite picked some ids; read them again when needed
+
+    def insert(self, index, video):
+        """
+        Inserts a video before the one at 'index', with a position halfway
+        between its neighbours'. When two positions are too close to
+        split, the rows from there on are moved up by one first (rare).
+        """
+        ids = self._load_ids()
+        if index < 0:
+            index = max(0, index + len(ids))
+        if index >= len(ids):
+            self.append(video)
+            return
+        with transaction(self.connection):
+            high = self._position(ids[index])
+            low = self._position(ids[index - 1]) if index else high - 1
+            position = (low + high) / 2
+            if not low < position < high:
+                self.connection.execute(
+                    "UPDATE videos SET position = position + 1 WHERE position >= ?", (high,))
+                position = (low + high + 1) / 2
+            cursor = self.connection.execute(
+                "INSERT INTO videos (id, name, time, sort_key, position) VALUES (?, ?, ?, ?, ?)",
+                (video.id, video.name, video.time, video.order, position))
+        ids.insert(index, cursor.lastrowid)
+
+
+class SQLiteStorage:
+    """
+    Stores the collection in an embedded SQLite database.
+
+    Startup only opens the database; no rows are read until they are
+    needed. Each add/update/delete is a single SQL statement on the
+    primary key, committed immediately, so record() and save() have
+    nothing left to do.
+
+    Several processes can share the database:
+    - locked() is a write transaction (BEGIN IMMEDIATE), so only one
+      process at a time edits, and its edit is committed when the lock
+      is released
+    - PRAGMA data_version changes whenever another connection commits;
+      changes() then asks for a reload, which reads the row ids and the
+      next free video ID from the database again
+    """
+
+    def __init__(self, database_file=DATABASE_FILE, migrate_from=None):
+        self.database_file = database_file
+        # JSON storage to import from the first time the database is created
+        self.migrate_from = migrate_from
+        self.connection = None
+        self.lock_depth = 0
+        self.data_version = None  # Last PRAGMA data_version seen (None = reload)
+
+    def load(self):
+        """
+        Opens (and if needed creates) the database.
+
+        Loading again (another process changed the database) keeps the
+        open connection and only starts a fresh view over it.
+
+        Returns:
+            SQLiteVideoList: List-like view over the stored videos
+        """
+        if self.connection is not None:
+            self.data_version = self._data_version()
+            return SQLiteVideoList(self.connection)
+        # isolation_level=None -> autocommit, every statement is durable.
+        # The API server takes the lock from a worker thread (one at a time).
+        connection = sqlite3.connect(self.database_file, isolation_level=None,
+                                     check_same_thread=False)
+        connection.executescript(SCHEMA)
+        if not {'sort_key', 'position'} <= self._columns(connection):
+            # Checked again under the write lock: another process starting
+            # at the same time may have upgraded the table meanwhile
+            with transaction(connection, 'BEGIN IMMEDIATE'):
+                columns = self._columns(connection)
+                if 'sort_key' not in columns:
+                    # Databases created before videos could be reordered
+                    connection.execute("ALTER TABLE videos ADD COLUMN sort_key REAL")
+                if 'position' not in columns:
+                    # Databases created before videos could be inserted in
+                    # the middle: the rows keep their order (by id)
+                    connection.execute("ALTER TABLE videos ADD COLUMN position REAL")
+                    connection.execute("UPDATE videos SET position = id")
+        connection.execute(POSITION_INDEX)
+        connection.execute(SORT_KEY_INDEX)
+        self.migrate(connection)
+        self.connection = connection
+        self.data_version = self._data_version()
+        return SQLiteVideoList(connection)
+
+    @staticmethod
+    def _columns(connection):
+        """Returns the column names of the 'videos' table."""
+        return {row[1] for row in connection.execute("PRAGMA table_info(videos)")}
+
+    @staticmethod
+    def _migrated(connection):
+        return connection.execute(
+            "SELECT value FROM meta WHERE key = 'migrated'").fetchone() is not None
+
+    def migrate(self, connection):
+        """
+        One-time import of the existing JSON collection into the database.
+
+        Runs in a single write transaction and records 'migrated' in the
+        meta table, so it never runs twice, even if several processes
+        start at once. The JSON files are left untouched.
+
+        Args:
+            connection (sqlite3.Connection): Open database connection
+        """
+        if self.migrate_from is None or self._migrated(connection):
+            return
+        with transaction(connection, 'BEGIN IMMEDIATE'):
+            if self._migrated(connection):
+                return  # Another process was first
+            videos = self.migrate_from.load()
+            check_parsed(videos, f"migrate {self.migrate_from.data_file}", MIGRATE_FIX)
+            insert_rows(connection, videos)
+            # IDs of videos deleted before the migration stay used too
+            connection.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'videos'",
+                (videos.last_id(),))
+            connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('migrated', 1)")
+        print(f"Migrated {len(videos)} videos from {self.migrate_from.data_file}")
+
+    def save(self, videos):
+        """Nothing to do - every change is already committed."""
+
+    def record(self, videos, record):
+        """Nothing to do - the list operation already ran the SQL statement."""
+
+    def record_batch(self, videos, records):
+        """Nothing to do - extend() already committed the batch."""
+
+    def flush(self):
+        """Nothing to do - SQLite commits every statement itself."""
+
+    def commit_stats(self):
+        """SQLite does its own commits, so there is nothing to report."""
+        return {}
+
+    def io_stats(self):
+        """SQLite reads and writes pages itself; they are not counted."""
+        return {}
+
+    def _data_version(self):
+        """Returns PRAGMA data_version, which other connections' commits change."""
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def locked(self):
+        """
+        Holds the database's write lock (context manager).
+
+        A BEGIN IMMEDIATE transaction: other processes wait for it (up to
+        sqlite3's default 5 second timeout) before they can edit, and
+        every statement of the edit commits together when it ends. If
+        the edit fails, it is rolled back and the next changes() asks
+        for a reload, as the collection in memory may no longer match.
+        Nested use shares the outer transaction.
+        """
+        if self.connection is None or self.lock_depth:
+            self.lock_depth += 1
+            try:
+                yield
+            finally:
+                self.lock_depth -= 1
+            return
+        self.lock_depth = 1
+        try:
+            with transaction(self.connection, 'BEGIN IMMEDIATE'):
+                yield
+        except BaseException:
+            self.data_version = None
+            raise
+        finally:
+            self.lock_depth = 0
+
+    def has_changes(self):
+        """
+        Cheap check (one PRAGMA) whether another process committed edits.
+
+        Returns:
+            bool: True if changes() would ask for a reload
+        """
+        return self.connection is not None and self._data_version() != self.data_version
+
+    def changes(self):
+        """
+        Tells whether another process edited the database (lock held).
+
+        The rows themselves are always read from the database, but the
+        row ids and the next free video ID kept in memory are not, so
+        any edit by another process means loading the collection again.
+
+        Returns:
+            list: [] if nothing changed, or None - load the collection again
+        """
+        if self.connection is None or self._data_version() == self.data_version:
+            return []
+        return None
+
+
+BACKENDS = {
+    'json': JSONStorage,
+    # SQLite and binary storage write every edit themselves, so they take no options
+    'sqlite': lambda **options: SQLiteStorage(migrate_from=JSONStorage()),
+    'binary': lambda **options: BinaryStorage(migrate_from=JSONStorage()),
+    'segmented': lambda snapshot_format='json', **options: SegmentedStorage(
+        snapshot_format=snapshot_format, migrate_from=JSONStorage()),
+}
+
+
+def get_storage(name, **options):
+    """
+    Creates the storage backend registered under the given name.
+
+    Args:
+        name (str): Backend name, one of BACKENDS
+        **options: Backend settings, e.g. group_commit_window or
+            snapshot_format for JSON
+
+    Returns:
+        Storage backend instance
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend '{name}', "
+                         f"choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
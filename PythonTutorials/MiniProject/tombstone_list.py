@@ -0,0 +1,160 @@
+"""
+Tombstone List for the YouTube Video Manager
+============================================
+A list replacement where deleting does not shift the following items.
+
+`del videos[i]` on a plain list moves every later element one step to
+the left, so deleting thousands of videos one by one is quadratic.
+TombstoneList instead overwrites the deleted slot with None (a
+"tombstone") and skips tombstones when counting, indexing and iterating.
+
+To turn a video number into a slot quickly it keeps a Fenwick tree
+(binary indexed tree) of live slots: finding the slot of the N-th live
+video, and marking a slot deleted, both take O(log n). The tree is only
+built after the first delete - until then position N is simply slot N.
+
+Once tombstones make up more than TOMBSTONE_COMPACT_RATIO of the slots,
+they are compacted away in one O(n) pass, so the cost per delete stays
+O(log n) on average. Video numbers are always counted over live videos
+only, so compaction never changes what number a video has.
+"""
+
+from collections.abc import MutableSequence
+
+
+# Compact once this fraction of all slots are tombstones
+TOMBSTONE_COMPACT_RATIO = 0.25
+
+
+class TombstoneList(MutableSequence):
+    """List of videos with O(log n) deletes and lazy compaction."""
+
+    def __init__(self, items=()):
+        self.slots = list(items)
+        self.tombstones = 0
+        self.tree = None  # Fenwick tree over live slots, built on first delete
+
+    # ------------------------------------------------------------------
+    # Fenwick tree helpers (1-based indexes inside the tree)
+    # ------------------------------------------------------------------
+
+    def _build_tree(self):
+        """Builds the Fenwick tree in one linear pass."""
+        size = len(self.slots)
+        tree = [0] + [0 if item is None else 1 for item in self.slots]
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def _tree_add(self, slot, delta):
+        """Adds delta to the live count of one slot."""
+        i = slot + 1
+        size = len(self.slots)
+        while i <= size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def _tree_append(self, live):
+        """Extends the tree by one slot (the slot was already appended)."""
+        i = len(self.slots)
+        value = 1 if live else 0
+        j = i - 1
+        stop = i - (i & -i)
+        while j > stop:
+            value += self.tree[j]
+            j -= j & -j
+        self.tree.append(value)
+
+    def _slot(self, index):
+        """Returns the slot holding the live item at a 0-based position."""
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('video index out of range')
+        if self.tree is None:
+            return index
+        # Walk down the tree looking for the (index + 1)-th live slot
+        position = 0
+        remaining = index + 1
+        step = 1 << (len(self.slots).bit_length() - 1)
+        while step:
+            candidate = position + step
+            if candidate <= len(self.slots) and self.tree[candidate] < remaining:
+                position = candidate
+                remaining -= self.tree[candidate]
+            step >>= 1
+        return position
+
+    # ------------------------------------------------------------------
+    # List interface
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.slots) - self.tombstones
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if start >= stop:
+                return []
+            # Find the first slot once, then walk forward skipping tombstones
+            items = []
+            slot = self._slot(start)
+            while len(items) < stop - start:
+                item = self.slots[slot]
+                if item is not None:
+                    items.append(item)
+                slot += 1
+            return items
+        return self.slots[self._slot(index)]
+
+    def __setitem__(self, index, item):
+        self.slots[self._slot(index)] = item
+
+    def __delitem__(self, index):
+        slot = self._slot(index)
+        if self.tree is None:
+            self._build_tree()
+        self.slots[slot] = None
+        self._tree_add(slot, -1)
+        self.tombstones += 1
+        if self.tombstones > TOMBSTONE_COMPACT_RATIO * len(self.slots):
+            self.compact()
+
+    def __iter__(self):
+        for item in self.slots:
+            if item is not None:
+                yield item
+
+    def append(self, item):
+        self.slots.append(item)
+        if self.tree is not None:
+            self._tree_append(True)
+
+    def extend(self, items):
+        if self.tree is None:
+            self.slots.extend(items)
+        else:
+            for item in items:
+                self.append(item)
+
+    def insert(self, index, item):
+        if index >= len(self):
+            self.append(item)
+            return
+        # Shifts the following slots like list.insert, so this is O(n)
+        # (and so is rebuilding the tree, if there is one)
+        self.slots.insert(self._slot(max(index, -len(self))), item)
+        if self.tree is not None:
+            self._build_tree()
+
+    def compact(self):
+        """Drops all tombstones in one pass (numbers of live items stay the same)."""
+        self.slots = [item for item in self.slots if item is not None]
+        self.tombstones = 0
+        self.tree = None
@@ -0,0 +1,230 @@
+"""
+Compact Video Record
+====================
+A small class that replaces the {'name': ..., 'time': ...} dictionaries.
+
+A dictionary carries a hash table for every single video. With
+__slots__ the object only stores two fixed fields, which makes each video
+several times smaller once the collection holds millions of entries.
+Names are interned and durations shared, so repeated values are stored
+only once.
+
+Durations are normalized to whole seconds (an int) as soon as a video is
+created, so nothing has to re-parse them later. parse_duration() accepts
+'1:02:03', '5:30', '45m', '1h 30m', '90s' or a plain number of seconds.
+
+The JSON files keep the same format: to_dict()/from_dict() convert
+between the record and the {'name': ..., 'time': ...} object. Two
+optional fields are added once they are known: 'id', the video's stable
+ID, and 'order', its place in a user-chosen order (see playlist.py).
+
+Two records are equal when name and duration match, which says nothing
+about *which* video they are: same_video() compares IDs for that.
+
+Files written by the first versions of the app can hold durations that
+parse_duration() does not accept, as free text ('1.5 hours') or longer
+than MAX_DURATION. from_dict() turns such a record into an
+UnparsedVideo: it counts as 0:00, but keeps the stored value and writes
+it back unchanged, and nothing that would store the 0:00 instead
+(compaction, the snapshot cache, a migration) runs while one is left -
+see check_parsed(). Updating or deleting the video resolves it.
+"""
+
+import re
+import sys
+
+
+# Seconds per unit, keyed by the first letter of the unit ('h', 'm', 's')
+UNIT_SECONDS = {'h': 3600, 'm': 60, 's': 1}
+
+# '1h 30m', '45m', '90 sec', '2 hours' ...
+UNIT_PATTERN = re.compile(
+    r'(?:\s*\d+\s*(?:h|hrs?|hours?|m|mins?|minutes?|s|secs?|seconds?)\s*)+')
+UNIT_PART = re.compile(r'(\d+)\s*([a-z]+)')
+
+# Longest duration accepted, in seconds (about 136 years): binary slots
+# store the duration in 4 bytes, and every backend has to hold every video
+MAX_DURATION = 2 ** 32 - 1
+
+# What to do when migrating to another backend finds such durations
+# (see check_parsed()): only the JSON files can keep them as they are
+MIGRATE_FIX = 'update or delete them with YOUTUBE_STORAGE=json first'
+
+# One shared int object per distinct duration (like sys.intern for strings)
+_durations = {}
+
+
+def parse_duration(value):
+    """
+    Converts a duration into whole seconds.
+
+    Accepts an int, a plain number ('300'), clock format ('5:30',
+    '1:02:03') or units ('45m', '1h 30m', '90s').
+
+    Args:
+        value (int or str): Duration to parse
+
+    Returns:
+        int: Duration in seconds
+
+    Raises:
+        ValueError: If the text is not a duration, or it is negative or
+            longer than MAX_DURATION
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        seconds = value
+    else:
+        text = str(value).strip().lower()
+        if text.isdigit():
+            seconds = int(text)
+        elif re.fullmatch(r'\d+(:\d{1,2}){1,2}', text):
+            seconds = 0
+            for part in text.split(':'):
+                seconds = seconds * 60 + int(part)
+        elif UNIT_PATTERN.fullmatch(text):
+            seconds = sum(int(amount) * UNIT_SECONDS[unit[0]]
+                          for amount, unit in UNIT_PART.findall(text))
+        else:
+            raise ValueError(f"Invalid duration '{value}' (try 1:02:03, 45m or 300)")
+    if seconds < 0:
+        raise ValueError(f"Invalid duration '{value}' (must not be negative)")
+    if seconds > MAX_DURATION:
+        raise ValueError(f"Invalid duration '{value}' (at most {MAX_DURATION} seconds)")
+    return _durations.setdefault(seconds, seconds)
+
+
+def format_duration(seconds):
+    """
+    Formats seconds for display, e.g. 3723 -> '1:02:03', 330 -> '5:30'.
+
+    Args:
+        seconds (int or float): Duration in seconds
+
+    Returns:
+        str: H:MM:SS, or M:SS for durations under an hour
+    """
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def same_video(video, other):
+    """
+    Tells whether two records describe the same video, not just equal ones.
+
+    Videos with IDs are the same when their IDs match; two copies of the
+    same name and duration are still different videos. Without IDs
+    (lists outside a Playlist) only equality is left to compare.
+
+    Args:
+        video (Video): One record
+        other (Video): The other record
+
+    Returns:
+        bool: True if both are the same video
+    """
+    if video.id is not None or other.id is not None:
+        return video.id == other.id
+    return video == other
+
+
+class Video:
+    """
+    One video in the collection.
+
+    'time' is the duration in seconds. 'id' is the stable ID and 'order'
+    the explicit sort key of a moved video (None = ordered by ID); both
+    are assigned when the video joins the collection. Records are
+    treated as immutable after that: updating a video replaces the
+    record instead of changing it, so they can be hashed and compared.
+    Equality looks at name and duration only.
+    """
+
+    __slots__ = ('name', 'time', 'id', 'order')
+
+    def __init__(self, name, time, id=None, order=None):
+        self.name = sys.intern(name)
+        self.time = parse_duration(time)
+        self.id = id
+        self.order = order
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates a Video from a {'name': ..., 'time': ...} dictionary.
+
+        Reads stored records, so a duration that parse_duration() does
+        not accept gives an UnparsedVideo instead of an error.
+        """
+        try:
+            return cls(data['name'], data['time'], data.get('id'), data.get('order'))
+        except ValueError:
+            return UnparsedVideo(data['name'], data['time'], data.get('id'), data.get('order'))
+
+    def with_order(self, order):
+        """Returns a copy of the record with another order key (a move)."""
+        return Video(self.name, self.time, self.id, order)
+
+    def to_dict(self):
+        """Returns the {'name': ..., 'time': ...} dictionary used in JSON files."""
+        data = {'name': self.name, 'time': self.time}
+        if self.id is not None:
+            data['id'] = self.id
+        if self.order is not None:
+            data['order'] = self.order
+        return data
+
+    def __eq__(self, other):
+        if not isinstance(other, Video):
+            return NotImplemented
+        return self.name == other.name and self.time == other.time
+
+    def __hash__(self):
+        return hash((self.name, self.time))
+
+    def __repr__(self):
+        return f"Video(name={self.name!r}, time={self.time!r})"
+
+
+class UnparsedVideo(Video):
+    """
+    A stored video whose duration parse_duration() does not accept.
+
+    'time' is 0 so listings, sorting and statistics work as usual;
+    'raw_time' is the value as it was stored, and to_dict() writes it
+    back, so journal records and moves keep it.
+    """
+
+    __slots__ = ('raw_time',)
+
+    def __init__(self, name, raw_time, id=None, order=None):
+        super().__init__(name, 0, id, order)
+        self.raw_time = raw_time
+
+    def to_dict(self):
+        return {**super().to_dict(), 'time': self.raw_time}
+
+    def with_order(self, order):
+        return UnparsedVideo(self.name, self.raw_time, self.id, order)
+
+
+def check_parsed(videos, action, fix='update or delete them first'):
+    """
+    Refuses to write out videos whose stored duration could not be parsed.
+
+    Args:
+        videos: Video collection about to be written (iterated once)
+        action (str): What is refused, for the message, e.g. 'compact youtube.txt'
+        fix (str): What the user should do about it
+
+    Raises:
+        ValueError: If any video is an UnparsedVideo
+    """
+    unparsed = [video for video in videos if type(video) is UnparsedVideo]
+    if unparsed:
+        examples = ', '.join(f"'{video.name}' ({video.raw_time!r})" for video in unparsed[:3])
+        count = '1 video has' if len(unparsed) == 1 else f"{len(unparsed)} videos have"
+        raise ValueError(f"Cannot {action}: {count} a duration that could not be read, "
+                         f"e.g. {examples}; {fix}")
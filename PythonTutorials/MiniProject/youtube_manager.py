@@ -1,178 +1,1255 @@
-"""
-YouTube Video Manager - Mini Project
-=====================================
-A command-line application to manage your YouTube video collection.
-This project demonstrates:
-- JSON file handling for data persistence
-- List enumeration for user-friendly display
-- CRUD operations (Create, Read, Update, Delete)
-- User-friendly menu-driven interface
-"""
-
-import json
-
-
-def load_data():
-    """
-    Loads video data from JSON file.
-    
-    Uses JSON to read stored video information from 'youtube.txt'.
-    If the file doesn't exist, returns an empty list to start fresh.
-    This ensures the app works even on first run without errors.
-    
-    Returns:
-        list: List of video dictionaries, or empty list if file not found
-    """
-    try:
-        with open('youtube.txt', 'r') as file:
-            videos = json.load(file)
-            return videos
-    except FileNotFoundError:
-        # Return empty list if file doesn't exist (first time running)
-        return []
-    
-
-def save_data_helper(videos):
-    """
-    Saves video data to JSON file.
-    
-    Persists the current video list to 'youtube.txt' using JSON format.
-    This ensures data is saved after every modification (add, update, delete).
-    
-    Args:
-        videos (list): List of video dictionaries to save
-    """
-    with open('youtube.txt', 'w') as file:
-        json.dump(videos, file)
-
-
-def list_all_videos(videos):
-    """
-    Displays all videos in a user-friendly numbered format.
-    
-    Uses enumerate() to create numbered list starting from 1,
-    making it easy for users to select videos by number.
-    Each video shows its name and duration.
-    
-    Args:
-        videos (list): List of video dictionaries to display
-    """
-    print("\n")
-    print("*" * 70)
-    # Using enumerate with start=1 for user-friendly numbering (1, 2, 3...)
-    for index, video in enumerate(videos, start=1):
-        print(f"{index}. {video['name']}, Duration: {video['time']} ")
-    print("\n")
-    print("*" * 70)
-
-
-def add_video(videos):
-    """
-    Adds a new video to the collection.
-    
-    Prompts user for video name and duration, then adds it to the list.
-    Automatically saves the updated list to JSON file for persistence.
-    
-    Args:
-        videos (list): List of video dictionaries to modify
-    """
-    name = input("Enter video name: ")
-    time = input("Enter video time: ")
-    videos.append({'name': name, 'time': time})
-    save_data_helper(videos)  # Save immediately after adding
-
-
-def update_video(videos):
-    """
-    Updates an existing video's details.
-    
-    First displays all videos with numbers, then allows user to select
-    which video to update by entering its number. Validates the index
-    to prevent errors and provides clear feedback.
-    
-    Args:
-        videos (list): List of video dictionaries to modify
-    """
-    list_all_videos(videos)  # Show numbered list for easy selection
-    index = int(input("Enter the video number to update: "))
-    
-    # Validate index is within valid range (1 to length of list)
-    if 1 <= index <= len(videos):
-        name = input("Enter the new video name: ")
-        time = input("Enter the new video time: ")
-        videos[index-1] = {'name': name, 'time': time}  # Convert to 0-based index
-        print('Video updated successfully')
-        save_data_helper(videos)  # Save changes to JSON
-    else:
-        print("Invalid index selected")
-
-
-def delete_video(videos):
-    """
-    Deletes a video from the collection.
-    
-    Displays all videos with numbers, then allows user to select
-    which video to delete by entering its number. Validates the index
-    and provides confirmation feedback.
-    
-    Args:
-        videos (list): List of video dictionaries to modify
-    """
-    list_all_videos(videos)  # Show numbered list for easy selection
-    index = int(input("Enter the video number to be deleted: "))
-    
-    # Validate index is within valid range (1 to length of list)
-    if 1 <= index <= len(videos):
-        del videos[index-1]  # Convert to 0-based index for deletion
-        print('Video deleted successfully')
-        save_data_helper(videos)  # Save changes to JSON
-    else:
-        print("Invalid video index selected")
-
-
-def main():
-    """
-    Main function that runs the YouTube Manager application.
-    
-    Provides a user-friendly menu-driven interface with 5 options:
-    1. List all videos
-    2. Add a video
-    3. Update a video
-    4. Delete a video
-    5. Exit
-    
-    Uses match-case for clean option handling and loads data from JSON
-    at startup, ensuring persistence across sessions.
-    """
-    # Load existing data from JSON file (or empty list if first run)
-    videos = load_data()
-    
-    # Main application loop - runs until user chooses to exit
-    while True:
-        print("\n Youtube Manager | choose an option ")
-        print("1. List all youtube videos ")
-        print("2. Add a youtube video ")
-        print("3. Update a youtube video details ")
-        print("4. Delete a youtube video ")
-        print("5. Exit the app ")
-        choice = input("Enter your choice: ")
-
-        # Match-case statement for clean option handling
-        match choice:
-            case '1':
-                list_all_videos(videos)
-            case '2':
-                add_video(videos)
-            case '3':
-                update_video(videos)
-            case '4':
-                delete_video(videos)
-            case '5':
-                print("Thank you for using YouTube Manager!")
-                break
-            case _:
-                print("Invalid Choice")
-
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+"""
+YouTube Video Manager - Mini Project
+=====================================
+A command-line application to manage your YouTube video collection.
+This project demonstrates:
+- JSON file handling for data persistence
+- Pluggable storage backends (JSON journal, SQLite, binary records or segments)
+- List enumeration for user-friendly display
+- Prefix search with a trie index
+- Typo-tolerant search with a trigram index
+- Duration parsing and running statistics
+- Stable video IDs and a reorderable playlist order
+- Safe sharing of the files between processes (file locks + versions)
+- Optional operation metrics (latency percentiles, bytes read/written)
+- CRUD operations (Create, Read, Update, Delete), one at a time or in batches
+- User-friendly menu-driven interface
+"""
+
+import argparse
+import os
+import re
+import sys
+from contextlib import contextmanager
+from itertools import islice
+from time import perf_counter
+
+from batch_edit import select_videos
+from bulk_io import FORMATS, export_videos, import_videos
+from dedup_index import DuplicateIndex, duplicate_key
+from duration_analytics import DurationAnalytics
+from duration_stats import DurationStats
+from fuzzy_index import TrigramIndex
+from metrics import Metrics
+from playlist import Playlist
+from search_index import PrefixIndex
+from sorted_index import SortedIndex
+from video_record import Video, format_duration, parse_duration
+
+from storage import get_storage
+
+
+# Storage backend: 'json' (youtube.txt + journal), 'sqlite' (youtube.db),
+# 'binary' (youtube.bin + youtube.heap) or 'segmented' (youtube.segments/).
+# Can be chosen per run with the YOUTUBE_STORAGE environment variable.
+STORAGE_BACKEND = os.environ.get('YOUTUBE_STORAGE', 'json')
+
+# Group commit: edits made within this many milliseconds are written to
+# disk together (0 = every edit is written and synced on its own).
+GROUP_COMMIT_MS = int(os.environ.get('YOUTUBE_GROUP_COMMIT_MS', '0'))
+
+# Encoding of the snapshot (and segment) files: 'json', 'marshal' or
+# 'pickle', optionally compressed ('json+gzip', 'marshal+lzma', ...).
+# Existing snapshots in any format are still read (auto-detected).
+SNAPSHOT_FORMAT = os.environ.get('YOUTUBE_SNAPSHOT_FORMAT', 'json')
+
+# Startup cache: a marshal copy of the snapshot (youtube.txt.cache) that
+# is loaded instead of parsing youtube.txt while that file is unchanged.
+# Set YOUTUBE_SNAPSHOT_CACHE=0 to turn it off (JSON backend only).
+SNAPSHOT_CACHE = os.environ.get('YOUTUBE_SNAPSHOT_CACHE', '1') == '1'
+
+storage = get_storage(STORAGE_BACKEND, group_commit_window=GROUP_COMMIT_MS / 1000,
+                      snapshot_format=SNAPSHOT_FORMAT, snapshot_cache=SNAPSHOT_CACHE)
+
+# Operation metrics: calls, latency percentiles and bytes read/written per
+# operation (menu option 15). Off unless YOUTUBE_METRICS=1; when off the
+# @metrics.timed functions below run completely uninstrumented.
+metrics = Metrics(os.environ.get('YOUTUBE_METRICS', '0') == '1', io_counter=storage.io_stats)
+
+# File the metrics are written to on exit, if set: '.prom' for the
+# Prometheus text format, anything else for JSON
+METRICS_FILE = os.environ.get('YOUTUBE_METRICS_FILE')
+
+# Number of videos shown per page when listing
+PAGE_SIZE = 20
+
+# Prefix index over video names, built on the first search
+name_index = PrefixIndex()
+
+# Trigram index for typo-tolerant search, built on the first fuzzy search
+fuzzy_index = TrigramIndex()
+
+# Running total/mean/longest/shortest duration, built on first use
+duration_stats = DurationStats()
+
+# Videos sorted by duration and by name (ignoring case), built on first use
+duration_order = SortedIndex(lambda video: (video.time, video.name.casefold(), video.name))
+name_order = SortedIndex(lambda video: (video.name.casefold(), video.name, video.time))
+
+# Duplicate check (hash index + Bloom filter saved in youtube.bloom)
+duplicate_index = DuplicateIndex()
+
+# Duration percentiles and histogram (saved in youtube.durations)
+duration_analytics = DurationAnalytics()
+
+# Dedup mode: refuse to add a video whose name (ignoring case and extra
+# spaces) and duration match an existing one. Set YOUTUBE_DEDUP=1.
+DEDUP_MODE = os.environ.get('YOUTUBE_DEDUP', '0') == '1'
+
+# Everything that must be told about added and removed videos
+indexes = [name_index, fuzzy_index, duration_stats, duplicate_index,
+           duration_order, name_order, duration_analytics]
+
+# Maximum number of search results shown at once
+SEARCH_LIMIT = 50
+
+# A video can be picked by its number ("3") or by its ID ("id 17", "id:17")
+VIDEO_ID_PATTERN = re.compile(r'id\s*:?\s*(\d+)', re.IGNORECASE)
+
+
+@metrics.timed
+def load_data():
+    """
+    Loads video data from the configured storage backend.
+    
+    With the default JSON backend this reads 'youtube.txt' and replays
+    the journal. With SQLite it only opens 'youtube.db' and the rows are
+    read on demand. Either way the app works on first run without errors.
+    
+    The backend's list is wrapped in a Playlist, which shows the videos
+    in their playlist order (see playlist.py).
+    
+    Returns:
+        Playlist: List-like collection of Video records
+    """
+    return Playlist(storage.load())
+
+
+@metrics.timed
+def save_data_helper(videos):
+    """
+    Saves the full video collection to the storage backend.
+    
+    For JSON this rewrites 'youtube.txt' and clears the journal
+    (compaction). Single edits go through record_change() instead.
+    
+    Args:
+        videos (Playlist): List of Video records to save
+    """
+    storage.save(videos.store)
+
+
+@metrics.timed
+def record_change(videos, record):
+    """
+    Persists one add/update/delete operation.
+    
+    Each edit costs O(1) I/O: a journal append for JSON, a single
+    statement for SQLite.
+    
+    Args:
+        videos (Playlist): Current list of Video records (already modified)
+        record (dict): Operation record, e.g. {'op': 'delete', 'index': 2}
+    """
+    storage.record(videos.store, record)
+
+
+@metrics.timed
+def record_changes(videos, records):
+    """
+    Persists many operations with a single storage write.
+    
+    For JSON this is one journal append (and one fsync) for the whole
+    batch; the journal is compacted by the next single edit once it has
+    grown past the threshold.
+    
+    Args:
+        videos (Playlist): Current list of Video records (already modified)
+        records (list): Operation records, in the order they were made
+    """
+    if records:
+        storage.record_batch(videos.store, records)
+
+
+def flush_data(videos):
+    """
+    Makes sure every edit is safely on disk before the app exits.
+    
+    With group commit enabled, the last edits may still be waiting for
+    their commit window; this writes them out immediately and reports
+    how the commits went. The saved indexes are written too.
+    
+    Args:
+        videos (Playlist): Current list of Video records
+    """
+    storage.flush()
+    duplicate_index.save(collection_stamp(videos))
+    duration_analytics.save(collection_stamp(videos))
+    if metrics.enabled and METRICS_FILE:
+        metrics.dump(METRICS_FILE)
+    stats = storage.commit_stats()
+    if stats.get('commits'):
+        print(f"Saved {stats['edits']} edits in {stats['commits']} commits "
+              f"({stats['edits_per_commit']:.1f} edits per commit, "
+              f"average commit latency {stats['avg_latency_ms']:.1f} ms)")
+
+
+def collection_stamp(videos):
+    """
+    Describes the collection a saved index (the Bloom filter, the
+    duration analytics) belongs to.
+    
+    The JSON backend counts every edit ever made (its version), so any
+    change - also an update that keeps the number of videos - gives a
+    new stamp. The other backends only have the number of videos.
+    
+    Args:
+        videos (Playlist): Current list of Video records
+    
+    Returns:
+        dict: count and version (None if the backend has none)
+    """
+    return {'count': len(videos), 'version': getattr(storage, 'version', None)}
+
+
+@metrics.timed
+def merge_changes(videos):
+    """
+    Applies the edits other processes made since this one last looked.
+    
+    The storage lock must be held. If another process has compacted
+    edits this one never saw into the snapshot, the whole collection is
+    loaded again instead.
+    
+    Args:
+        videos (Playlist): List of Video records to bring up to date
+    """
+    apply_changes(videos, storage.changes())
+
+
+def apply_changes(videos, records):
+    """
+    Applies the records storage.changes() returned (see merge_changes()).
+    
+    Args:
+        videos (Playlist): List of Video records to bring up to date
+        records (list): Journal records, or None to load the collection again
+    """
+    if records is None:
+        reload_data(videos)
+        return
+    for record in records:
+        removed, added = videos.apply(record)
+        for video in removed:
+            index_remove(video)
+        for video in added:
+            index_add(video)
+
+
+def load_store():
+    """
+    Loads the collection from disk and waits until it is fully loaded.
+    
+    Returns:
+        list: The storage backend's list of videos
+    """
+    store = storage.load()
+    len(store)  # Wait until it is fully loaded
+    return store
+
+
+def reload_data(videos, store=None):
+    """
+    Replaces the collection with the one on disk; the indexes are rebuilt
+    on their next use.
+    
+    Args:
+        videos (Playlist): List of Video records to replace
+        store (list): Collection already read with load_store() (default:
+            read it now)
+    """
+    print("The collection was changed by another process, loading it again")
+    videos.reset(load_store() if store is None else store)
+    for index in indexes:
+        index.built = False
+    duplicate_index.bloom = None  # Reloaded or rebuilt on the next check
+
+
+def sync_data(videos):
+    """
+    Shows edits made by other processes, e.g. before the menu is printed.
+    
+    Only takes the lock when the journal actually changed, so this is a
+    single stat() call most of the time.
+    
+    Args:
+        videos (Playlist): List of Video records to bring up to date
+    """
+    if storage.has_changes():
+        with storage.locked():
+            merge_changes(videos)
+
+
+@contextmanager
+def exclusive_access(videos):
+    """
+    Holds the storage lock, with other processes' edits merged in first.
+    
+    Every edit runs inside this, so two copies of the app can never
+    write from a stale collection. The lock is only held for the edit
+    itself (no prompts inside), so other processes wait for milliseconds.
+    
+    Args:
+        videos (Playlist): List of Video records about to be edited
+    """
+    with storage.locked():
+        merge_changes(videos)
+        yield
+
+
+def index_add(video):
+    """
+    Tells every index about a newly added video.
+    
+    Args:
+        video (Video): The added video
+    """
+    for index in indexes:
+        index.add(video)
+
+
+def index_remove(video):
+    """
+    Tells every index that a video was removed (or replaced).
+    
+    Args:
+        video (Video): The removed video
+    """
+    for index in indexes:
+        index.remove(video)
+
+
+@metrics.timed
+def insert_video(videos, video, position=None):
+    """
+    Adds a video to the collection and the indexes (no prompts, no saving).
+    
+    The interactive menu, bulk tools and the server all go through this
+    and the functions below, so the indexes always stay in sync.
+    The video gets the next free ID.
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+        video (Video): Video to add
+        position (int): 0-based position to insert at (default: the end)
+    
+    Returns:
+        dict: The operation record to persist with record_change()
+    """
+    record = videos.add(video, position)
+    index_add(video)  # Keep the search index and statistics in sync
+    return record
+
+
+@metrics.timed
+def replace_video(videos, index, video):
+    """
+    Replaces the video at a 0-based position (no prompts, no saving).
+    
+    The video keeps its ID and its place in the playlist.
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+        index (int): 0-based position of the video
+        video (Video): The new details
+    
+    Returns:
+        dict: The operation record to persist with record_change()
+    """
+    index_remove(videos[index])  # Keep the search index and statistics in sync
+    record = videos.replace(index, video)
+    index_add(video)
+    return record
+
+
+@metrics.timed
+def remove_video(videos, index):
+    """
+    Deletes the video at a 0-based position (no prompts, no saving).
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+        index (int): 0-based position of the video
+    
+    Returns:
+        dict: The operation record to persist with record_change()
+    """
+    index_remove(videos[index])  # Keep the search index and statistics in sync
+    return videos.remove(index)
+
+
+@metrics.timed
+def move_video(videos, index, new_index):
+    """
+    Moves a video to another 0-based position (no prompts, no saving).
+    
+    Only the moved video gets a new order key, so this is O(log n)
+    however far it moves (see playlist.py).
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+        index (int): 0-based position of the video
+        new_index (int): 0-based position it should end up at
+    
+    Returns:
+        dict: The operation record to persist with record_change()
+    """
+    return videos.move(index, new_index)
+
+
+def edit_video(videos, video_id, change):
+    """
+    Applies and persists an edit of one video, found again by its ID.
+    
+    The user picked the video from a list that another process may have
+    changed since, so its position is looked up again under the lock.
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+        video_id (int): Stable ID of the video
+        change: Function taking the 0-based position, returning the record
+    
+    Raises:
+        ValueError: If another process deleted the video in the meantime
+    """
+    with exclusive_access(videos):
+        index = videos.position_of(video_id)
+        if index is None:
+            raise ValueError("That video was deleted by another process")
+        record_change(videos, change(index))
+
+
+@metrics.timed
+def find_video(videos, text):
+    """
+    Turns what the user typed into a 0-based position.
+    
+    Accepts a video number as shown in the list ("3") or a stable video
+    ID ("id 17", "id:17"), which does not change when videos are added,
+    deleted or moved.
+    
+    Args:
+        videos (Playlist): List of Video records
+        text (str): The user's input
+    
+    Returns:
+        int: 0-based position, or None if there is no such video
+    """
+    text = text.strip()
+    match = VIDEO_ID_PATTERN.fullmatch(text)
+    if match:
+        return videos.position_of(int(match.group(1)))
+    if text.isdigit() and 1 <= int(text) <= len(videos):
+        return int(text) - 1
+    return None
+
+
+def describe_video(video):
+    """Returns the one-line description used in every list."""
+    return f"{video.name}, Duration: {format_duration(video.time)} (ID {video.id})"
+
+
+def check_duplicate(videos, video):
+    """
+    In dedup mode, refuses a video that is already in the collection.
+    
+    O(1): see dedup_index.py for the Bloom filter and hash index.
+    
+    Args:
+        videos (list): List of Video records
+        video (Video): Video about to be added
+    
+    Raises:
+        ValueError: If dedup mode is on and the video is a duplicate
+    """
+    if DEDUP_MODE and duplicate_index.is_duplicate(videos, video, collection_stamp(videos)):
+        raise ValueError(f"'{video.name}' with the same duration already exists")
+
+
+def remove_duplicates(videos):
+    """
+    Deletes every video that repeats an earlier one (no prompts, no saving).
+    
+    One pass over the collection finds the duplicates with a set of
+    keys; the first video of each group is kept. Deleting from the back
+    keeps the positions that are still to be deleted valid.
+    
+    Args:
+        videos (list): List of Video records to modify
+    
+    Returns:
+        list: The operation records to persist with storage.record_batch()
+    """
+    seen = set()
+    duplicates = []
+    for position, video in enumerate(videos):
+        key = duplicate_key(video)
+        if key in seen:
+            duplicates.append(position)
+        else:
+            seen.add(key)
+    return [remove_video(videos, position) for position in reversed(duplicates)]
+
+
+def delete_videos(videos, video_ids):
+    """
+    Deletes many videos, given by their IDs (no prompts, no saving).
+    
+    Deleting from the back keeps the positions that are still to be
+    deleted valid. IDs that are no longer in the collection are skipped.
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+        video_ids (list): Stable IDs of the videos to delete
+    
+    Returns:
+        list: The operation records to persist with record_changes()
+    """
+    positions = (videos.position_of(video_id) for video_id in video_ids)
+    positions = sorted((position for position in positions if position is not None), reverse=True)
+    return [remove_video(videos, position) for position in positions]
+
+
+def update_videos(videos, video_ids, time=None, replace=None):
+    """
+    Changes many videos, given by their IDs (no prompts, no saving).
+    
+    Videos that end up unchanged are not written. IDs that are no longer
+    in the collection are skipped.
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+        video_ids (list): Stable IDs of the videos to change
+        time (int): New duration in seconds for all of them (None = keep)
+        replace (tuple): (old text, new text) to replace in every name
+            (None = keep the names)
+    
+    Returns:
+        list: The operation records to persist with record_changes()
+    """
+    records = []
+    for video_id in video_ids:
+        position = videos.position_of(video_id)
+        if position is None:
+            continue
+        old = videos[position]
+        video = Video(old.name.replace(*replace) if replace else old.name,
+                      old.time if time is None else time)
+        if video != old:  # Compares name and duration
+            records.append(replace_video(videos, position, video))
+    return records
+
+
+def apply_batch(videos, change):
+    """
+    Runs a batch change under the storage lock and persists it once.
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+        change: Function returning the list of operation records
+    
+    Returns:
+        tuple: (number of videos changed, seconds the change and its
+            write took)
+    """
+    with exclusive_access(videos):
+        started = perf_counter()
+        records = change()
+        record_changes(videos, records)
+    return len(records), perf_counter() - started
+
+
+@metrics.timed
+def render_page(videos, page, page_size=PAGE_SIZE, numbered=True):
+    """
+    Builds the text for one page of the numbered video list.
+    
+    Only the videos on the requested page are read, so the cost depends
+    on the page size, not on the size of the collection. The first page
+    is taken straight from the iterator, so it can be shown while the
+    rest of the collection is still loading. Both hold while no video
+    has been moved or inserted at a position; after that the playlist
+    order is built from the whole collection once (see playlist.py).
+    
+    Args:
+        videos (list): List of Video records to display
+        page (int): 1-based page number
+        page_size (int): Number of videos per page
+        numbered (bool): Show video numbers (False for a sorted view,
+            where the position is not the video's number)
+    
+    Returns:
+        str: The rendered page, ready to be written in one call
+    """
+    start = (page - 1) * page_size
+    if start == 0:
+        rows = list(islice(videos, page_size))
+    else:
+        rows = videos[start:start + page_size]
+    lines = ["\n", "*" * 70]
+    # Using enumerate with start for user-friendly numbering (1, 2, 3...)
+    for index, video in enumerate(rows, start=start + 1):
+        label = f"{index}." if numbered else "-"
+        lines.append(f"{label} {describe_video(video)} ")
+    lines.append("\n")
+    lines.append("*" * 70)
+    return "\n".join(lines) + "\n"
+
+
+def list_all_videos(videos, page_size=PAGE_SIZE, numbered=True):
+    """
+    Displays the videos in a user-friendly numbered format, page by page.
+    
+    Each page is built into a single string and written with one call
+    instead of one print() per video. When there is more than one page
+    the user can move with 'n' (next), 'p' (previous), a page number
+    (jump) or 'q' (done). Video numbers are the same as in the full list,
+    so they can be used directly by update and delete.
+    
+    Args:
+        videos (list): List of Video records to display
+        page_size (int): Number of videos per page
+        numbered (bool): Show video numbers (see render_page)
+    """
+    page = 1
+    while True:
+        sys.stdout.write(render_page(videos, page, page_size, numbered))
+        total_pages = max(1, -(-len(videos) // page_size))  # Ceiling division
+        if total_pages == 1:
+            return
+        choice = input(f"Page {page}/{total_pages} - "
+                       "n: next, p: previous, number: jump, q: done: ").strip().lower()
+        if choice == 'n' and page < total_pages:
+            page += 1
+        elif choice == 'p' and page > 1:
+            page -= 1
+        elif choice.isdigit() and 1 <= int(choice) <= total_pages:
+            page = int(choice)
+        elif choice in ('q', ''):
+            return
+        else:
+            print("Invalid page selected")
+
+
+def add_video(videos):
+    """
+    Adds a new video to the collection.
+    
+    Prompts user for video name and duration, then adds it to the list.
+    The duration is converted to seconds right away (1:02:03, 45m, 300).
+    The change is appended to the journal for persistence.
+    
+    Args:
+        videos (list): List of Video records to modify
+    """
+    name = input("Enter video name: ")
+    time = input("Enter video time: ")
+    try:
+        video = Video(name, time)
+        with exclusive_access(videos):
+            check_duplicate(videos, video)
+            record_change(videos, insert_video(videos, video))  # Save immediately after adding
+    except ValueError as error:
+        print(error)
+
+
+def update_video(videos):
+    """
+    Updates an existing video's details.
+    
+    First displays all videos with numbers, then allows user to select
+    which video to update by entering its number or its ID. Validates
+    the choice to prevent errors and provides clear feedback.
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+    """
+    list_all_videos(videos)  # Show numbered list for easy selection
+    index = find_video(videos, input("Enter the video number (or 'id 17') to update: "))
+    
+    # find_video returns None for a number out of range or an unknown ID
+    if index is not None:
+        video_id = videos[index].id
+        name = input("Enter the new video name: ")
+        time = input("Enter the new video time: ")
+        try:
+            video = Video(name, time)
+            edit_video(videos, video_id, lambda position: replace_video(videos, position, video))
+        except ValueError as error:
+            print(error)
+            return
+        print('Video updated successfully')
+    else:
+        print("Invalid index selected")
+
+
+def delete_video(videos):
+    """
+    Deletes a video from the collection.
+    
+    Displays all videos with numbers, then allows user to select
+    which video to delete by entering its number or its ID. Validates
+    the choice and provides confirmation feedback.
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+    """
+    list_all_videos(videos)  # Show numbered list for easy selection
+    index = find_video(videos, input("Enter the video number (or 'id 17') to be deleted: "))
+    
+    # find_video returns None for a number out of range or an unknown ID
+    if index is not None:
+        try:
+            edit_video(videos, videos[index].id, lambda position: remove_video(videos, position))
+        except ValueError as error:
+            print(error)
+            return
+        print('Video deleted successfully')
+    else:
+        print("Invalid video index selected")
+
+
+def show_video(videos):
+    """
+    Shows a single video, picked by its number or its ID.
+    
+    Finding video #N (or the number of a video ID) is an O(log n) lookup
+    in the playlist order, no matter how large the collection is.
+    
+    Args:
+        videos (Playlist): List of Video records
+    """
+    index = find_video(videos, input("Enter the video number (or 'id 17'): "))
+    if index is None:
+        print("Invalid video selected")
+        return
+    video = videos[index]
+    lines = ["\n", "*" * 70,
+             f"Number:   {index + 1} of {len(videos)}",
+             f"ID:       {video.id}",
+             f"Name:     {video.name}",
+             f"Duration: {format_duration(video.time)}",
+             "\n", "*" * 70]
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def reorder_video(videos):
+    """
+    Moves a video to another place in the list.
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+    """
+    index = find_video(videos, input("Enter the video number (or 'id 17') to move: "))
+    if index is None:
+        print("Invalid video selected")
+        return
+    target = input(f"Move it to which number (1-{len(videos)}): ").strip()
+    if not target.isdigit() or not 1 <= int(target) <= len(videos):
+        print("Invalid position selected")
+        return
+    try:
+        edit_video(videos, videos[index].id,
+                   lambda position: move_video(videos, position, int(target) - 1))
+    except ValueError as error:
+        print(error)
+        return
+    print('Video moved successfully')
+
+
+def insert_video_at(videos):
+    """
+    Adds a new video at a chosen place in the list instead of the end.
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+    """
+    target = input(f"Insert as number (1-{len(videos) + 1}): ").strip()
+    if not target.isdigit() or not 1 <= int(target) <= len(videos) + 1:
+        print("Invalid position selected")
+        return
+    name = input("Enter video name: ")
+    time = input("Enter video time: ")
+    try:
+        video = Video(name, time)
+        with exclusive_access(videos):
+            check_duplicate(videos, video)
+            record_change(videos, insert_video(videos, video, int(target) - 1))
+    except ValueError as error:
+        print(error)
+
+
+def select_for_batch(videos, action):
+    """
+    Asks which videos a batch command should change (see batch_edit.py).
+    
+    Args:
+        videos (Playlist): List of Video records
+        action (str): Verb for the prompt, e.g. 'delete'
+    
+    Returns:
+        list: IDs of the selected videos (empty if none or invalid)
+    """
+    text = input(f"Which videos to {action}? (e.g. 3-7, 'id 5, 9', "
+                 "'duration < 60', 'name contains draft'): ")
+    try:
+        video_ids = select_videos(videos, text, duration_order)
+    except ValueError as error:
+        print(error)
+        return []
+    if not video_ids:
+        print("No videos match")
+    return video_ids
+
+
+def batch_delete_videos(videos):
+    """
+    Deletes every video matching a selection, with a single save.
+    
+    After a confirmation, all deletes are made in memory and written in
+    one storage write, instead of one write per video.
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+    """
+    video_ids = select_for_batch(videos, 'delete')
+    if not video_ids:
+        return
+    if input(f"Delete {len(video_ids)} videos? (y/n): ").strip().lower() != 'y':
+        print("Nothing deleted")
+        return
+    count, elapsed = apply_batch(videos, lambda: delete_videos(videos, video_ids))
+    print(f"Deleted {count} videos in {elapsed * 1000:.1f} ms")
+
+
+def batch_update_videos(videos):
+    """
+    Changes every video matching a selection, with a single save.
+    
+    All of them can get a new duration, and/or have a text replaced in
+    their names. Videos that stay the same are not written.
+    
+    Args:
+        videos (Playlist): List of Video records to modify
+    """
+    video_ids = select_for_batch(videos, 'update')
+    if not video_ids:
+        return
+    print(f"{len(video_ids)} videos selected")
+    try:
+        text = input("New duration for all of them (Enter to keep): ").strip()
+        time = parse_duration(text) if text else None
+    except ValueError as error:
+        print(error)
+        return
+    old_text = input("Text to replace in the names (Enter to keep the names): ")
+    replace = (old_text, input("Replace it with: ")) if old_text else None
+    if time is None and replace is None:
+        print("Nothing to change")
+        return
+    count, elapsed = apply_batch(videos, lambda: update_videos(videos, video_ids, time, replace))
+    print(f"Updated {count} videos in {elapsed * 1000:.1f} ms")
+
+
+def search_videos(videos):
+    """
+    Finds videos whose name starts with the text the user types.
+    
+    Uses the prefix index, so only the matching videos are visited
+    instead of scanning the whole collection. The search ignores
+    upper/lower case. Results are written in one call like a list page.
+    
+    Args:
+        videos (list): List of Video records to search
+    """
+    prefix = input("Enter the start of the video name: ")
+    matches = name_index.search(videos, prefix, limit=SEARCH_LIMIT + 1)
+    lines = ["\n", "*" * 70]
+    for video in matches[:SEARCH_LIMIT]:
+        lines.append(f"- {describe_video(video)} ")
+    if not matches:
+        lines.append("No videos found")
+    elif len(matches) > SEARCH_LIMIT:
+        lines.append(f"... showing the first {SEARCH_LIMIT} matches, type more letters to narrow down")
+    lines.append("\n")
+    lines.append("*" * 70)
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def fuzzy_search_videos(videos):
+    """
+    Finds videos with names similar to what the user types, typos included.
+    
+    Uses the trigram index: only names that share enough 3-letter pieces
+    with the query are compared, and results are ranked by similarity.
+    
+    Args:
+        videos (list): List of Video records to search
+    """
+    query = input("Enter the video name (typos are fine): ")
+    matches = fuzzy_index.search(videos, query, limit=SEARCH_LIMIT)
+    lines = ["\n", "*" * 70]
+    for similarity, video in matches:
+        lines.append(f"- {describe_video(video)} (match {similarity:.0%})")
+    if not matches:
+        lines.append("No similar videos found")
+    lines.append("\n")
+    lines.append("*" * 70)
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def show_stats(videos):
+    """
+    Shows total, average, longest and shortest duration of the collection.
+    
+    The numbers come from running aggregates that add, update and delete
+    keep up to date, so this does not go through the videos again.
+    
+    Args:
+        videos (list): List of Video records
+    """
+    stats = duration_stats.summary(videos)
+    lines = ["\n", "*" * 70,
+             f"Videos:         {stats['count']}",
+             f"Total duration: {format_duration(stats['total'])}",
+             f"Average:        {format_duration(stats['mean'])}",
+             f"Longest:        {format_duration(stats['longest'])}",
+             f"Shortest:       {format_duration(stats['shortest'])}",
+             "\n", "*" * 70]
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def show_duration_analytics(videos):
+    """
+    Shows duration percentiles (p50/p90/p99) and a histogram.
+    
+    Both come from a quantile sketch and bucket counts that add, update
+    and delete keep up to date (see duration_analytics.py); they are
+    saved on exit, so the next run usually does not read the videos
+    for them at all.
+    
+    Args:
+        videos (list): List of Video records
+    """
+    summary = duration_analytics.summary(videos, collection_stamp(videos))
+    lines = ["\n", "*" * 70, f"Videos: {summary['count']}"]
+    for fraction, seconds in summary['percentiles'].items():
+        label = f"p{fraction * 100:g}:"
+        lines.append(f"{label:<8}{format_duration(seconds)}")
+    lines.append("")
+    largest = max((count for _, _, count in summary['histogram']), default=0)
+    for low, high, count in summary['histogram']:
+        label = (f"{format_duration(low)} - {format_duration(high)}" if high is not None
+                 else f"{format_duration(low)} or more")
+        bar = "#" * round(40 * count / largest) if largest else ""
+        lines.append(f"{label:<18}{count:>9,} {bar}".rstrip())
+    lines += ["\n", "*" * 70]
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def show_longest_videos(videos):
+    """
+    Shows the K longest videos, longest first.
+    
+    They are read from the end of the duration index, so this costs
+    O(log n + k) instead of sorting the whole collection.
+    
+    Args:
+        videos (list): List of Video records
+    """
+    text = input("How many videos? (default 10): ").strip()
+    if text and not text.isdigit():
+        print("Please enter a number")
+        return
+    longest = duration_order.largest(videos, int(text) if text else 10)
+    lines = ["\n", "*" * 70]
+    for rank, video in enumerate(longest, start=1):
+        lines.append(f"{rank}. {describe_video(video)} ")
+    if not longest:
+        lines.append("No videos yet")
+    lines.append("\n")
+    lines.append("*" * 70)
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def videos_by_duration(videos):
+    """
+    Shows the videos whose duration lies between two values, shortest first.
+    
+    Both ends are found with a binary search in the duration index, so
+    this costs O(log n + k) for k shown videos.
+    
+    Args:
+        videos (list): List of Video records
+    """
+    try:
+        low = parse_duration(input("Shortest duration (e.g. 5:00): "))
+        high = parse_duration(input("Longest duration (e.g. 20m): "))
+    except ValueError as error:
+        print(error)
+        return
+    # Keys start with the duration, so (high + 1,) comes after every key of 'high'
+    total, matches = duration_order.between(videos, (low,), (high + 1,), limit=SEARCH_LIMIT)
+    lines = ["\n", "*" * 70]
+    for video in matches:
+        lines.append(f"- {describe_video(video)} ")
+    if not matches:
+        lines.append("No videos found")
+    elif total > len(matches):
+        lines.append(f"... showing the first {len(matches)} of {total} videos")
+    lines.append("\n")
+    lines.append("*" * 70)
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def list_alphabetically(videos):
+    """
+    Lists the videos sorted by name (ignoring case), page by page.
+    
+    Each page is read from the name index at its position, so moving
+    to any page costs O(log n + page size).
+    
+    Args:
+        videos (list): List of Video records
+    """
+    list_all_videos(name_order.view(videos), numbered=False)
+
+
+def show_operation_stats():
+    """
+    Shows the operation metrics and offers to save them to a file.
+    
+    Every instrumented operation gets one row: how often it ran, its
+    mean and percentile latency, and the bytes the storage read and
+    wrote for it. Saving as JSON or Prometheus text lets other tools
+    pick the numbers up.
+    """
+    if not metrics.enabled:
+        print("Operation metrics are off. Start the app with YOUTUBE_METRICS=1 to collect them.")
+        return
+    io_measured = bool(storage.io_stats())
+    lines = ["\n", "*" * 70,
+             f"{'operation':<18}{'calls':>7}{'mean ms':>9}{'p50 ms':>9}{'p99 ms':>9}"
+             f"{'max ms':>9}" + (f"{'read bytes':>13}{'written bytes':>15}" if io_measured else "")]
+    for name, summary in metrics.snapshot().items():
+        line = (f"{name:<18}{summary['calls']:>7}{summary['mean_seconds'] * 1000:>9.2f}"
+                f"{summary['p50_seconds'] * 1000:>9.2f}{summary['p99_seconds'] * 1000:>9.2f}"
+                f"{summary['max_seconds'] * 1000:>9.2f}")
+        if io_measured:
+            line += f"{summary['read_bytes']:>13,}{summary['written_bytes']:>15,}"
+        lines.append(line)
+    lines += ["\n", "*" * 70]
+    sys.stdout.write("\n".join(lines) + "\n")
+    
+    path = input("Save to a file (.json or .prom, Enter to skip): ").strip()
+    if path:
+        try:
+            metrics.dump(path)
+            print(f"Metrics written to {path}")
+        except OSError as error:
+            print(error)
+
+
+def main():
+    """
+    Main function that runs the YouTube Manager application.
+    
+    Provides a user-friendly menu-driven interface with 18 options:
+    1. List all videos
+    2. Add a video
+    3. Update a video
+    4. Delete a video
+    5. Exit
+    6. Search videos by name
+    7. Duration statistics
+    8. Fuzzy (typo-tolerant) search
+    9. Longest videos (top K)
+    10. Videos between two durations
+    11. Alphabetical list
+    12. Show one video (by number or ID)
+    13. Move a video
+    14. Insert a video at a position
+    15. Operation metrics (timings, bytes read/written)
+    16. Delete many videos at once (ranges, IDs or conditions)
+    17. Update many videos at once
+    18. Duration percentiles and histogram
+    
+    Uses match-case for clean option handling and loads data from JSON
+    at startup, ensuring persistence across sessions.
+    """
+    # Load existing data from JSON file (or empty list if first run)
+    videos = load_data()
+    
+    # Main application loop - runs until user chooses to exit
+    while True:
+        sync_data(videos)  # Show what other running copies of the app changed
+        print("\n Youtube Manager | choose an option ")
+        print("1. List all youtube videos ")
+        print("2. Add a youtube video ")
+        print("3. Update a youtube video details ")
+        print("4. Delete a youtube video ")
+        print("5. Exit the app ")
+        print("6. Search youtube videos by name ")
+        print("7. Show duration statistics ")
+        print("8. Fuzzy search youtube videos (typos allowed) ")
+        print("9. Show the longest youtube videos ")
+        print("10. Find youtube videos by duration range ")
+        print("11. List youtube videos alphabetically ")
+        print("12. Show a youtube video (by number or ID) ")
+        print("13. Move a youtube video ")
+        print("14. Insert a youtube video at a position ")
+        print("15. Show operation metrics ")
+        print("16. Delete many youtube videos at once ")
+        print("17. Update many youtube videos at once ")
+        print("18. Show duration percentiles and histogram ")
+        choice = input("Enter your choice: ")
+
+        # Match-case statement for clean option handling
+        match choice:
+            case '1':
+                list_all_videos(videos)
+            case '2':
+                add_video(videos)
+            case '3':
+                update_video(videos)
+            case '4':
+                delete_video(videos)
+            case '5':
+                flush_data(videos)  # Write out edits still waiting for group commit
+                print("Thank you for using YouTube Manager!")
+                break
+            case '6':
+                search_videos(videos)
+            case '7':
+                show_stats(videos)
+            case '8':
+                fuzzy_search_videos(videos)
+            case '9':
+                show_longest_videos(videos)
+            case '10':
+                videos_by_duration(videos)
+            case '11':
+                list_alphabetically(videos)
+            case '12':
+                show_video(videos)
+            case '13':
+                reorder_video(videos)
+            case '14':
+                insert_video_at(videos)
+            case '15':
+                show_operation_stats()
+            case '16':
+                batch_delete_videos(videos)
+            case '17':
+                batch_update_videos(videos)
+            case '18':
+                show_duration_analytics(videos)
+            case _:
+                print("Invalid Choice")
+
+
+def run_cli(argv=None):
+    """
+    Entry point that handles the non-interactive commands.
+    
+    Without arguments the interactive menu (main) is started. Otherwise:
+        python youtube_manager.py import videos.csv
+        python youtube_manager.py export videos.jsonl
+        python youtube_manager.py serve --port 8765
+        python youtube_manager.py dedupe
+        python youtube_manager.py batch-delete "duration < 60"
+        python youtube_manager.py batch-update "name contains draft" --replace draft final
+        python youtube_manager.py analytics
+    
+    Args:
+        argv (list): Command line arguments (defaults to sys.argv[1:])
+    """
+    parser = argparse.ArgumentParser(description='YouTube Video Manager')
+    commands = parser.add_subparsers(dest='command')
+    for command, help_text in (('import', 'bulk-load videos from a file'),
+                               ('export', 'write all videos to a file')):
+        sub = commands.add_parser(command, help=help_text)
+        sub.add_argument('path', help="CSV/JSONL file, or '-' for stdin/stdout")
+        sub.add_argument('--format', choices=FORMATS,
+                         help='file format (default: guessed from the extension)')
+    serve_parser = commands.add_parser('serve', help='run the local JSON API server')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    serve_parser.add_argument('--port', type=int, default=8765, help='TCP port')
+    commands.add_parser('dedupe', help='remove duplicate videos (same name and duration)')
+    selection_help = "numbers ('3-7'), IDs ('id 5, 9') or conditions ('duration < 60')"
+    delete_parser = commands.add_parser('batch-delete', help='delete every matching video')
+    delete_parser.add_argument('selection', help=selection_help)
+    update_parser = commands.add_parser('batch-update', help='change every matching video')
+    update_parser.add_argument('selection', help=selection_help)
+    update_parser.add_argument('--time', type=parse_duration, help='new duration for all of them')
+    update_parser.add_argument('--replace', nargs=2, metavar=('OLD', 'NEW'),
+                               help='replace a text in every name')
+    commands.add_parser('analytics', help='show duration percentiles and a histogram')
+    args = parser.parse_args(argv)
+
+    try:
+        match args.command:
+            case None:
+                main()  # The interactive menu
+            case 'import':
+                videos = load_data()
+                import_videos(videos, storage, args.path, args.format,
+                              exclusive=lambda: exclusive_access(videos))
+                duplicate_index.save(collection_stamp(videos))
+                duration_analytics.save(collection_stamp(videos))
+            case 'export':
+                export_videos(load_data(), args.path, args.format)
+            case 'serve':
+                # Imported here because the server itself imports this module
+                from server import serve
+                serve(args.host, args.port)
+            case 'dedupe':
+                videos = load_data()
+                with exclusive_access(videos):
+                    records = remove_duplicates(videos)
+                    if records:
+                        storage.record_batch(videos.store, records)
+                if records:
+                    save_data_helper(videos)
+                duplicate_index.save(collection_stamp(videos))
+                duration_analytics.save(collection_stamp(videos))
+                print(f"Removed {len(records)} duplicate videos, {len(videos)} left")
+            case 'batch-delete':
+                videos = load_data()
+                video_ids = select_videos(videos, args.selection, duration_order)
+                count, elapsed = apply_batch(videos, lambda: delete_videos(videos, video_ids))
+                duplicate_index.save(collection_stamp(videos))
+                duration_analytics.save(collection_stamp(videos))
+                print(f"Deleted {count} videos in {elapsed * 1000:.1f} ms, {len(videos)} left")
+            case 'batch-update':
+                if args.time is None and args.replace is None:
+                    parser.error('batch-update needs --time and/or --replace')
+                if args.replace is not None and not args.replace[0]:
+                    parser.error('--replace needs a non-empty OLD text')
+                videos = load_data()
+                video_ids = select_videos(videos, args.selection, duration_order)
+                count, elapsed = apply_batch(videos, lambda: update_videos(
+                    videos, video_ids, args.time, args.replace))
+                duplicate_index.save(collection_stamp(videos))
+                duration_analytics.save(collection_stamp(videos))
+                print(f"Updated {count} videos in {elapsed * 1000:.1f} ms")
+            case 'analytics':
+                videos = load_data()
+                show_duration_analytics(videos)
+                duration_analytics.save(collection_stamp(videos))
+    except (ValueError, OSError) as error:
+        parser.exit(1, f"Error: {error}\n")
+
+
+if __name__ == "__main__":
+    run_cli()
\ No newline at end of file